@@ -29,6 +29,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tickets.db_routing.PrimaryStickinessMiddleware',
+    'tickets.profiling.RequestProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -66,6 +68,39 @@ DATABASES = {
     }
 }
 
+# Replica in sola lettura (opzionale): dashboard, export e API list/retrieve leggono da qui.
+# Dopo una scrittura l'utente resta sul primario per DB_REPLICA_STICKY_SECONDS.
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': int(os.getenv('DB_REPLICA_PORT', '5432')),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['tickets.db_routing.PrimaryReplicaRouter']
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', '10'))
+
+# Cache condivisa da tutti i worker/host: revoca token API, versione di reparti/categorie, aggancio al primario,
+# sottoscrizioni webhook. Redis se REDIS_URL è impostato (richiede `pip install redis`), altrimenti tabella su
+# Postgres (creata dalla migrazione tickets 0021). Se un override locale imposta una cache per processo
+# (LocMem/Dummy), tickets/apps.py la accetta solo con DEBUG e altrimenti blocca l'avvio.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.getenv('REDIS_URL')},
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'tickets_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        },
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -80,19 +115,27 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# collectstatic: nomi con hash (cache a lungo termine) + varianti .gz/.br per nginx (tickets/staticfiles.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # nomi con hash solo in produzione (collectstatic obbligatorio); in sviluppo runserver serve i sorgenti
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+                    else 'tickets.staticfiles.CompressedManifestStaticFilesStorage'},
+}
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.SessionAuthentication',   # per UI Django
-        'rest_framework.authentication.TokenAuthentication',     # per client esterni
+        'tickets.authentication.CachedTokenAuthentication',      # per client esterni (token in cache, TTL breve)
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        # token bucket condiviso tra worker/host (tabella UNLOGGED su Postgres)
+        'tickets.throttling.SharedAnonRateThrottle',
+        'tickets.throttling.SharedUserRateThrottle',
     ),
     'DEFAULT_THROTTLE_RATES': {
         'anon': os.getenv('DRF_THROTTLE_RATE_ANON', '60/min'),
@@ -100,6 +143,42 @@ REST_FRAMEWORK = {
     },
 }
 
+# SLA di default per priorità: (minuti presa in carico, minuti risoluzione), in minuti di calendario.
+# Le righe SlaPolicy (admin, per reparto) hanno la precedenza.
+TICKET_SLA_DEFAULTS = {
+    'BLK': (30, 4 * 60),
+    'HIGH': (60, 8 * 60),
+    'MED': (4 * 60, 24 * 60),
+    'LOW': (8 * 60, 72 * 60),
+}
+
+# Assegnazione automatica dei nuovi ticket (AssignmentRule + operatore meno carico)
+TICKET_AUTO_ASSIGN = os.getenv('TICKET_AUTO_ASSIGN', 'True').lower() == 'true'
+
+# Archiviazione: ticket CLO non modificati da N mesi (manage.py archive_closed_tickets)
+TICKET_ARCHIVE_AFTER_MONTHS = int(os.getenv('TICKET_ARCHIVE_AFTER_MONTHS', '12'))
+
+# Sync incrementale API: ignora le modifiche più recenti di N secondi (transazioni non ancora committate)
+TICKET_SYNC_SAFETY_SECONDS = int(os.getenv('TICKET_SYNC_SAFETY_SECONDS', '2'))
+
+# Update API (PUT/PATCH): True = obbligatori If-Match o `version` (428 senza), altrimenti vince l'ultimo che scrive
+TICKET_API_REQUIRE_VERSION = os.getenv('TICKET_API_REQUIRE_VERSION', 'False').lower() == 'true'
+
+# Aggiornamenti live della dashboard team via SSE (LISTEN/NOTIFY).
+# Attivare solo con server ASGI (uvicorn/daphne): con runserver/gunicorn WSGI lo stream terrebbe occupato un worker.
+LIVE_EVENTS = os.getenv('LIVE_EVENTS', 'False').lower() == 'true'
+
+# TTL (secondi) della cache token → utente; revoca/disattivazione invalidano subito via signal
+API_TOKEN_CACHE_TTL = int(os.getenv('API_TOKEN_CACHE_TTL', '60'))
+
+# Renderer JSON veloce per l'API (richiede `pip install orjson`, altrimenti nessun effetto)
+API_FAST_JSON = os.getenv('API_FAST_JSON', 'False').lower() == 'true'
+if API_FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = (
+        'tickets.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    )
+
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/accounts/login/"
@@ -131,6 +210,36 @@ ATTACHMENTS_ALLOWED_EXTENSIONS = os.getenv(
     'pdf,jpg,jpeg,png,xlsx,docx,txt'
 ).split(',')
 
+# Tier COLD allegati (manage.py tier_attachments): età minima, tipi da comprimere, codec (auto = zstd se installato, altrimenti gzip)
+ATTACHMENTS_COLD_AFTER_DAYS = int(os.getenv('ATTACHMENTS_COLD_AFTER_DAYS', '180'))
+ATTACHMENTS_COLD_COMPRESS_EXTENSIONS = os.getenv(
+    'ATTACHMENTS_COLD_COMPRESS_EXTENSIONS',
+    'txt,csv,log,xlsx,docx'
+).split(',')
+ATTACHMENTS_COLD_CODEC = os.getenv('ATTACHMENTS_COLD_CODEC', 'auto')
+
+# Estrazione testo allegati (manage.py extract_attachment_text): file più grandi o più lenti vengono saltati
+ATTACHMENTS_TEXT_MAX_MB = int(os.getenv('ATTACHMENTS_TEXT_MAX_MB', '10'))
+ATTACHMENTS_TEXT_TIMEOUT = int(os.getenv('ATTACHMENTS_TEXT_TIMEOUT', '20'))  # secondi per file
+ATTACHMENTS_TEXT_MAX_CHARS = int(os.getenv('ATTACHMENTS_TEXT_MAX_CHARS', '200000'))
+
+# Profilazione richieste (tickets/profiling.py): richieste oltre PROFILING_SLOW_MS o con l'header (solo staff)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', '1000'))
+PROFILING_HEADER = os.getenv('PROFILING_HEADER', 'X-ATI-Profile')
+PROFILING_SAMPLE_INTERVAL_MS = int(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', '10'))
+PROFILING_DIR = os.getenv('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_KEEP_FILES = int(os.getenv('PROFILING_KEEP_FILES', '500'))
+
+# Webhook (manage.py deliver_webhooks): timeout per POST, eventi per POST, tentativi prima di FAILED
+WEBHOOKS_TIMEOUT = float(os.getenv('WEBHOOKS_TIMEOUT', '10'))
+WEBHOOKS_BATCH_SIZE = int(os.getenv('WEBHOOKS_BATCH_SIZE', '50'))
+WEBHOOKS_MAX_ATTEMPTS = int(os.getenv('WEBHOOKS_MAX_ATTEMPTS', '10'))
+
+# Snapshot NDJSON per la BI (manage.py export_snapshots): cartella di output e orizzonte come per la sync API
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', str(BASE_DIR / 'snapshots'))
+SNAPSHOT_SAFETY_SECONDS = int(os.getenv('SNAPSHOT_SAFETY_SECONDS', '5'))
+
 # URL base per link nelle email
 SITE_BASE_URL = os.getenv("SITE_BASE_URL", "http://127.0.0.1:8000")
 
@@ -10,9 +10,12 @@ from django.shortcuts import render
 
 from tickets.views import (
     TicketViewSet,
+    api_auth_stats,
     landing,
     operator_dashboard,
     team_dashboard,
+    team_events,
+    team_bulk_action,
     new_ticket,
     ticket_detail,
     operator_export_csv,
@@ -32,6 +35,8 @@ urlpatterns = [
     path('', landing, name='landing'),
     path('dash/operator/', operator_dashboard, name='dash_operator'),
     path('dash/team/', team_dashboard, name='dash_team'),
+    path('dash/team/events/', team_events, name='dash_team_events'),
+    path('dash/team/bulk/', team_bulk_action, name='dash_team_bulk'),
 
     # Auth
     path(
@@ -52,6 +57,7 @@ urlpatterns = [
     path('', include('tickets.urls')),
 
     # API DRF (una sola volta)
+    path('api/auth/stats/', api_auth_stats, name='api_auth_stats'),
     path('api/', include(router.urls)),
 
 
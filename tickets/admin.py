@@ -1,11 +1,20 @@
 from django.contrib import admin
-from .models import Department, Counter, Ticket, Comment, Attachment, AuditLog
+from .models import (Department, Category, Counter, Ticket, Comment, Attachment, AttachmentText, AuditLog,
+                     SlaPolicy, AssignmentRule, OperatorLoad, FieldValueStat, WebhookSubscription,
+                     WebhookDelivery, SnapshotWatermark)
 
 @admin.register(Department)
 class DepartmentAdmin(admin.ModelAdmin):
     list_display = ('code', 'name')
     search_fields = ('code', 'name')
 
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('department', 'code', 'label', 'sort_order', 'is_active')
+    list_filter = ('department', 'is_active')
+    list_editable = ('label', 'sort_order', 'is_active')
+    search_fields = ('code', 'label')
+
 @admin.register(Counter)
 class CounterAdmin(admin.ModelAdmin):
     list_display = ('dept_code', 'iso_year', 'iso_week', 'last_number')
@@ -16,7 +25,26 @@ class TicketAdmin(admin.ModelAdmin):
     list_display = ('protocol', 'title', 'department', 'status', 'priority', 'created_by', 'assignee', 'created_at')
     list_filter = ('department', 'status', 'priority', 'created_at')
     search_fields = ('protocol', 'title', 'description')
-    readonly_fields = ('protocol', 'created_at', 'updated_at')
+    readonly_fields = ('protocol', 'category_ref', 'created_at', 'updated_at',
+                       'response_due_at', 'resolve_due_at', 'first_response_at',
+                       'sla_paused_at', 'response_breached_at', 'resolve_breached_at')
+
+@admin.register(SlaPolicy)
+class SlaPolicyAdmin(admin.ModelAdmin):
+    list_display = ('department', 'priority', 'response_minutes', 'resolve_minutes')
+    list_filter = ('department', 'priority')
+
+@admin.register(AssignmentRule)
+class AssignmentRuleAdmin(admin.ModelAdmin):
+    list_display = ('department', 'category', 'user', 'is_active')
+    list_filter = ('department', 'is_active')
+    search_fields = ('user__username', 'category')
+
+@admin.register(OperatorLoad)
+class OperatorLoadAdmin(admin.ModelAdmin):
+    list_display = ('user', 'open_tickets', 'last_assigned_at')
+    ordering = ('open_tickets', 'last_assigned_at')
+    readonly_fields = ('user', 'open_tickets', 'last_assigned_at')
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
@@ -26,12 +54,44 @@ class CommentAdmin(admin.ModelAdmin):
 
 @admin.register(Attachment)
 class AttachmentAdmin(admin.ModelAdmin):
-    list_display = ('ticket', 'original_name', 'mime_type', 'size', 'uploaded_by', 'uploaded_at')
+    list_display = ('ticket', 'original_name', 'mime_type', 'size', 'storage_tier', 'compression', 'stored_size',
+                    'uploaded_by', 'uploaded_at')
     search_fields = ('original_name', 'ticket__protocol', 'uploaded_by__username')
-    list_filter = ('mime_type', 'uploaded_at')
+    list_filter = ('mime_type', 'storage_tier', 'compression', 'uploaded_at')
+
+@admin.register(AttachmentText)
+class AttachmentTextAdmin(admin.ModelAdmin):
+    list_display = ('attachment', 'ticket', 'status', 'detail', 'extracted_at')
+    list_filter = ('status',)
+    search_fields = ('ticket__protocol', 'attachment__original_name')
+    raw_id_fields = ('attachment', 'ticket')
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
     list_display = ('ticket', 'action', 'actor', 'created_at')
     list_filter = ('action', 'created_at')
     search_fields = ('ticket__protocol', 'actor__username', 'note')
+
+@admin.register(FieldValueStat)
+class FieldValueStatAdmin(admin.ModelAdmin):
+    list_display = ('field', 'value', 'uses', 'last_used_at')
+    list_filter = ('field',)
+    search_fields = ('value', 'normalized')
+    ordering = ('field', '-uses')
+
+@admin.register(WebhookSubscription)
+class WebhookSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'url', 'department', 'events', 'is_active', 'created_at')
+    list_filter = ('is_active', 'department')
+    search_fields = ('name', 'url')
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subscription', 'event', 'status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at')
+    list_filter = ('status', 'event', 'subscription')
+    readonly_fields = ('subscription', 'event', 'payload', 'created_at', 'sent_at')
+
+@admin.register(SnapshotWatermark)
+class SnapshotWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('stream', 'department', 'last_ts', 'last_id', 'run_id', 'updated_at')
+    list_filter = ('stream', 'department')
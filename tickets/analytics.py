@@ -0,0 +1,155 @@
+# tickets/analytics.py
+"""
+Statistiche di presa in carico / risoluzione per reparto, categoria e settimana.
+
+- `record_status_changes()` aggiorna TicketMetric (una riga per ticket) a ogni
+  cambio stato: 2 query anche per un'azione massiva.
+- `weekly_report()` calcola conteggi, medie e percentili (p50/p90, nearest-rank
+  con cume_dist()) direttamente su TicketMetric: nessuna scansione dell'audit.
+  Niente tabella di totali settimanali: i percentili non si sommano tra righe
+  pre-aggregate, e l'indice (week, department, category) limita la lettura alle
+  settimane richieste. Gira sul DB scelto dal router (replica nelle view di report).
+- `manage.py rebuild_ticket_metrics` ricostruisce la tabella dallo storico audit.
+"""
+from datetime import timedelta
+
+from django.db import connections, router
+from django.utils import timezone
+
+from .assignment import OPEN_STATUSES
+from .models import Department, TicketMetric
+from .sla import RESPONSE_PENDING_STATUS
+
+RESOLVED_STATUSES = ('RES', 'CLO')
+
+
+def week_start(dt):
+    """Lunedì (data locale) della settimana di `dt`."""
+    return monday_of(timezone.localtime(dt).date())
+
+
+def monday_of(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _apply(metric, ticket, old_status, new_status, when):
+    """Applica una transizione old → new alla riga (in memoria)."""
+    metric.department_id = ticket.department_id
+    metric.category = ticket.category or ""
+    if old_status == RESPONSE_PENDING_STATUS and metric.first_response_seconds is None:
+        metric.first_response_seconds = max(0, int((when - metric.created_at).total_seconds()))
+    if old_status in OPEN_STATUSES and new_status in RESOLVED_STATUSES:
+        metric.resolved_at = when
+        metric.resolution_seconds = max(0, int((when - metric.created_at).total_seconds()))
+    elif old_status in RESOLVED_STATUSES and new_status in OPEN_STATUSES:
+        # riaperto: la risoluzione verrà ricalcolata alla prossima chiusura
+        metric.resolved_at = None
+        metric.resolution_seconds = None
+
+
+def _new_metric(ticket):
+    return TicketMetric(
+        ticket_id=ticket.pk,
+        department_id=ticket.department_id,
+        category=ticket.category or "",
+        week=week_start(ticket.created_at),
+        created_at=ticket.created_at,
+    )
+
+
+def record_created(ticket):
+    _new_metric(ticket).save(force_insert=True)
+
+
+def record_status_changes(changes, when=None):
+    """changes: [(ticket, vecchio stato)] con il nuovo stato già in ticket.status."""
+    changes = [(t, old) for t, old in changes if old != t.status]
+    if not changes:
+        return
+    when = when or timezone.now()
+    existing = {m.ticket_id: m for m in TicketMetric.objects.filter(ticket_id__in=[t.pk for t, _ in changes])}
+    rows = []
+    for ticket, old_status in changes:
+        # riga assente: ticket aperto prima dell'introduzione delle statistiche
+        metric = existing.get(ticket.pk) or _new_metric(ticket)
+        _apply(metric, ticket, old_status, ticket.status, when)
+        rows.append(metric)
+    TicketMetric.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['ticket_id'],
+        update_fields=['department', 'category', 'first_response_seconds', 'resolved_at', 'resolution_seconds'],
+    )
+
+
+def replay(ticket, transitions):
+    """Ricostruisce la riga di un ticket da [(vecchio stato, nuovo stato, quando)] in ordine cronologico."""
+    metric = _new_metric(ticket)
+    for old_status, new_status, when in transitions:
+        if old_status != new_status:
+            _apply(metric, ticket, old_status, new_status, when)
+    return metric
+
+
+# --- report ---
+
+_PERCENTILE_SQL = """
+WITH samples AS (
+    SELECT week, department_id, category, 'response' AS metric, first_response_seconds AS v
+      FROM tickets_ticketmetric
+     WHERE week BETWEEN %(start)s AND %(end)s AND first_response_seconds IS NOT NULL {dep_filter}
+    UNION ALL
+    SELECT week, department_id, category, 'resolution' AS metric, resolution_seconds AS v
+      FROM tickets_ticketmetric
+     WHERE week BETWEEN %(start)s AND %(end)s AND resolution_seconds IS NOT NULL {dep_filter}
+), ranked AS (
+    SELECT *, cume_dist() OVER (PARTITION BY week, department_id, category, metric ORDER BY v) AS cd
+      FROM samples
+)
+SELECT week, department_id, category, metric,
+       COUNT(*), AVG(v),
+       MIN(v) FILTER (WHERE cd >= 0.5),
+       MIN(v) FILTER (WHERE cd >= 0.9)
+  FROM ranked
+ GROUP BY week, department_id, category, metric
+"""
+
+_OPENED_SQL = """
+SELECT week, department_id, category, COUNT(*)
+  FROM tickets_ticketmetric
+ WHERE week BETWEEN %(start)s AND %(end)s {dep_filter}
+ GROUP BY week, department_id, category
+"""
+
+
+def weekly_report(start, end, department_id=None):
+    """
+    Righe (una per settimana × reparto × categoria) con ticket tracciati, presi in carico,
+    risolti e, per presa in carico e risoluzione, media / p50 / p90 in secondi.
+    """
+    params = {'start': monday_of(start), 'end': end}
+    dep_filter = ""
+    if department_id:
+        dep_filter = "AND department_id = %(dep)s"
+        params['dep'] = department_id
+
+    rows = {}
+    with connections[router.db_for_read(TicketMetric)].cursor() as cur:
+        cur.execute(_OPENED_SQL.format(dep_filter=dep_filter), params)
+        for week, dep_id, category, n in cur.fetchall():
+            rows[(week, dep_id, category)] = {
+                'week': week, 'department_id': dep_id, 'category': category, 'tickets': n,
+                'response': None, 'resolution': None,
+            }
+        cur.execute(_PERCENTILE_SQL.format(dep_filter=dep_filter), params)
+        for week, dep_id, category, metric, n, avg, p50, p90 in cur.fetchall():
+            row = rows.get((week, dep_id, category))
+            if row is not None:
+                row[metric] = {'count': n, 'avg': int(avg) if avg is not None else None, 'p50': p50, 'p90': p90}
+
+    codes = dict(Department.objects.values_list('id', 'code'))
+    out = sorted(rows.values(), key=lambda r: (r['week'], codes.get(r['department_id'], ''), r['category']))
+    for row in out:
+        row['department'] = codes.get(row['department_id'], '')
+    return out
+
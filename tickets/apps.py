@@ -1,5 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# cache visibili a un solo processo: revoche e invalidazioni non raggiungerebbero gli altri worker
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
 
 class TicketsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tickets'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registra i receiver)
+
+        backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+        if backend in PROCESS_LOCAL_CACHES and not settings.DEBUG:
+            raise ImproperlyConfigured(
+                f"CACHES['default'] = {backend}: serve una cache condivisa tra i worker "
+                "(DatabaseCache o Redis), altrimenti la revoca dei token non è immediata."
+            )
@@ -0,0 +1,90 @@
+# tickets/archive.py
+"""
+Archiviazione dei ticket chiusi (hot → cold).
+
+- Candidati: status CLO e nessuna modifica da più di N mesi (updated_at).
+- Ogni batch è una transazione breve: righe bloccate con SKIP LOCKED, documento
+  JSON (ticket + commenti + audit + metadati allegati) in ArchivedTicket, poi
+  cancellazione dalle tabelle calde. La cancellazione passa dai signal:
+  tombstone per la sync API; i file degli allegati restano su disco.
+- Le statistiche (TicketMetric) non dipendono dal ticket e restano.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedTicket, AuditLog, Attachment, Comment, Ticket
+
+ARCHIVE_STATUS = 'CLO'
+# campi ricalcolabili dal contenuto del ticket: non servono nel documento d'archivio
+DERIVED_FIELDS = ('dup_bands',)
+
+
+def cutoff_for(months, now=None):
+    return (now or timezone.now()) - timedelta(days=30 * months)
+
+
+def candidates(cutoff):
+    return Ticket.objects.filter(status=ARCHIVE_STATUS, updated_at__lt=cutoff)
+
+
+def _group(rows):
+    out = {}
+    for row in rows:
+        out.setdefault(row.pop('ticket_id'), []).append(row)
+    return out
+
+
+def build_documents(tickets):
+    """Documenti d'archivio per i ticket dati: 3 query in tutto, non per ticket."""
+    ids = [t['id'] for t in tickets]
+    comments = _group(Comment.objects.filter(ticket_id__in=ids).order_by('created_at', 'id').values(
+        'ticket_id', 'id', 'author_id', 'author__username', 'body', 'is_internal', 'created_at'))
+    audits = _group(AuditLog.objects.filter(ticket_id__in=ids).order_by('created_at', 'id').values(
+        'ticket_id', 'id', 'action', 'actor_id', 'actor__username', 'note', 'meta', 'created_at'))
+    attachments = _group(Attachment.objects.filter(ticket_id__in=ids).order_by('uploaded_at', 'id').values(
+        'ticket_id', 'id', 'file', 'original_name', 'mime_type', 'size', 'compression',
+        'uploaded_by__username', 'uploaded_at'))
+    return [
+        {
+            'ticket': t,
+            'comments': comments.get(t['id'], []),
+            'audits': audits.get(t['id'], []),
+            'attachments': attachments.get(t['id'], []),
+        }
+        for t in tickets
+    ]
+
+
+def archive_batch(cutoff, batch_size):
+    """Archivia al più `batch_size` ticket; ritorna quanti ne ha spostati."""
+    with transaction.atomic():
+        ids = list(candidates(cutoff)
+                   .order_by('id')
+                   .select_for_update(skip_locked=True)
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+
+        tickets = list(Ticket.objects.filter(id__in=ids).values(
+            *[f.attname for f in Ticket._meta.concrete_fields if f.attname not in DERIVED_FIELDS],
+            'department__code', 'created_by__username', 'assignee__username',
+        ))
+        docs = build_documents(tickets)
+        ArchivedTicket.objects.bulk_create([
+            ArchivedTicket(
+                ticket_id=t['id'],
+                protocol=t['protocol'],
+                title=t['title'],
+                department_code=t['department__code'],
+                created_by_id=t['created_by_id'],
+                created_at=t['created_at'],
+                closed_at=t['updated_at'],
+                document=doc,
+            )
+            for t, doc in zip(tickets, docs)
+        ])
+        # commenti, audit e allegati seguono in CASCADE; i signal creano le tombstone
+        Ticket.objects.filter(id__in=ids).delete()
+    return len(ids)
@@ -0,0 +1,118 @@
+# tickets/assignment.py
+"""
+Assegnazione automatica dei nuovi ticket all'operatore idoneo meno carico.
+
+- Idoneità: AssignmentRule attive per reparto e categoria (categoria vuota = tutte).
+- Carico: OperatorLoad.open_tickets, aggiornato in modo incrementale a ogni
+  assegnazione / cambio stato / cancellazione. Scegliere l'assegnatario costa
+  una sola query ordinata sull'indice (open_tickets, last_assigned_at), non un
+  COUNT per candidato. `manage.py rebuild_operator_load` riallinea i contatori.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .audit import log_assigned
+from .models import OperatorLoad, Ticket
+
+OPEN_STATUSES = ('NEW', 'INP', 'WAI')
+
+
+def adjust_load(user_id, delta, assigned_at=None):
+    if not user_id or not delta:
+        return
+    updates = {'open_tickets': F('open_tickets') + delta}
+    if assigned_at:
+        updates['last_assigned_at'] = assigned_at
+    if not OperatorLoad.objects.filter(user_id=user_id).update(**updates):
+        # operatore mai visto: parte dal conteggio reale
+        OperatorLoad.objects.get_or_create(user_id=user_id, defaults={
+            'open_tickets': open_ticket_count(user_id),
+            'last_assigned_at': assigned_at,
+        })
+
+
+def ensure_load(user_id):
+    """Crea (se manca) la riga di carico di un operatore, dal conteggio reale."""
+    OperatorLoad.objects.get_or_create(user_id=user_id, defaults={'open_tickets': open_ticket_count(user_id)})
+
+
+def open_ticket_count(user_id):
+    return Ticket.objects.filter(assignee_id=user_id, status__in=OPEN_STATUSES).count()
+
+
+def pick_assignee(department_id, category):
+    """OperatorLoad dell'operatore idoneo meno carico (riga bloccata fino a fine transazione) o None."""
+    rule_match = Q(user__assignment_rules__department_id=department_id,
+                   user__assignment_rules__is_active=True) & (
+        Q(user__assignment_rules__category='') | Q(user__assignment_rules__category=category or '')
+    )
+    return (OperatorLoad.objects
+            .filter(rule_match, user__is_active=True)
+            .select_related('user')
+            .order_by('open_tickets', F('last_assigned_at').asc(nulls_first=True), 'user_id')
+            .select_for_update(skip_locked=True, of=('self',))
+            .first())
+
+
+def auto_assign(ticket):
+    """Assegna un ticket appena creato; ritorna l'utente assegnato o None."""
+    if ticket.assignee_id or not getattr(settings, 'TICKET_AUTO_ASSIGN', True):
+        return None
+    load = pick_assignee(ticket.department_id, ticket.category)
+    if load is None:
+        return None
+
+    now = timezone.now()
+    previous_load = load.open_tickets
+    ticket.assignee = load.user
+    ticket.claim_version()
+    ticket.save(update_fields=['assignee', 'updated_at', 'version'])
+    adjust_load(load.user_id, +1, assigned_at=now)
+
+    log_assigned(ticket, actor=None, assignee=load.user, meta={
+        'auto': True,
+        'open_tickets_before': previous_load,
+        'category': ticket.category or '',
+    })
+    return load.user
+
+
+def on_status_change(ticket, old_status, new_status):
+    """Il ticket entra/esce dagli stati aperti: aggiorna il carico dell'assegnatario."""
+    was_open, is_open = old_status in OPEN_STATUSES, new_status in OPEN_STATUSES
+    if ticket.assignee_id and was_open != is_open:
+        adjust_load(ticket.assignee_id, +1 if is_open else -1)
+
+
+def on_reassign(ticket, old_assignee_id, new_assignee_id):
+    if ticket.status not in OPEN_STATUSES or old_assignee_id == new_assignee_id:
+        return
+    adjust_load(old_assignee_id, -1)
+    adjust_load(new_assignee_id, +1, assigned_at=timezone.now())
+
+
+def on_bulk_status_change(changes, new_status):
+    """changes: [(assignee_id, vecchio stato)]. Una UPDATE per operatore, non per ticket."""
+    is_open = new_status in OPEN_STATUSES
+    deltas = Counter()
+    for assignee_id, old_status in changes:
+        if assignee_id and (old_status in OPEN_STATUSES) != is_open:
+            deltas[assignee_id] += 1 if is_open else -1
+    for user_id, delta in deltas.items():
+        adjust_load(user_id, delta)
+
+
+def on_bulk_reassign(changes, new_assignee_id):
+    """changes: [(vecchio assignee_id, stato)] dei ticket passati a `new_assignee_id`."""
+    deltas = Counter()
+    for old_assignee_id, status in changes:
+        if status in OPEN_STATUSES and old_assignee_id != new_assignee_id:
+            if old_assignee_id:
+                deltas[old_assignee_id] -= 1
+            deltas[new_assignee_id] += 1
+    now = timezone.now()
+    for user_id, delta in deltas.items():
+        adjust_load(user_id, delta, assigned_at=now if user_id == new_assignee_id else None)
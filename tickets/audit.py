@@ -1,25 +1,35 @@
+from . import webhooks
 from .models import AuditLog
 
+# Ogni evento di audit rilevante alimenta anche l'outbox dei webhook (stessa transazione)
+
 def log_created(ticket, actor):
     AuditLog.objects.create(ticket=ticket, action=AuditLog.Action.CREATED, actor=actor)
+    webhooks.enqueue_ticket('ticket.created', ticket)
 
-def log_status_change(ticket, actor, old_status, new_status):
+def log_status_change(ticket, actor, old_status, new_status, old_code=None, new_code=None):
+    # old/new: etichette (storico); old_code/new_code: codici, usati dalle statistiche
     AuditLog.objects.create(
         ticket=ticket,
         action=AuditLog.Action.STATUS_CHANGED,
         actor=actor,
-        meta={'old': old_status, 'new': new_status},
+        meta={'old': old_status, 'new': new_status, 'old_code': old_code, 'new_code': new_code},
         note=f"{old_status} → {new_status}"
     )
+    webhooks.enqueue_ticket('ticket.status_changed', ticket, old_status=old_code)
 
-def log_comment(ticket, actor, is_internal):
-    AuditLog.objects.create(
-        ticket=ticket,
-        action=AuditLog.Action.COMMENT_ADDED,
-        actor=actor,
-        meta={'internal': bool(is_internal)},
-        note="Commento interno" if is_internal else "Commento pubblico"
-    )
+def log_comments(ticket, actor, comments):
+    """Uno o più commenti (UI e API): un solo INSERT, unico punto di audit dei commenti."""
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            ticket=ticket,
+            action=AuditLog.Action.COMMENT_ADDED,
+            actor=actor,
+            meta={'internal': bool(c.is_internal), 'comment_id': c.pk},
+            note="Commento interno" if c.is_internal else "Commento pubblico",
+        )
+        for c in comments
+    ])
 
 def log_attachments(ticket, actor, filenames):
     AuditLog.objects.create(
@@ -29,3 +39,56 @@ def log_attachments(ticket, actor, filenames):
         meta={'files': filenames},
         note=f"{len(filenames)} allegato/i"
     )
+
+def log_assigned(ticket, actor, assignee, meta=None):
+    AuditLog.objects.create(
+        ticket=ticket,
+        action=AuditLog.Action.ASSIGNED,
+        actor=actor,
+        meta={'assignee': assignee.username, **(meta or {})},
+        note=f"Assegnato a {assignee.username}" + (" (automatico)" if (meta or {}).get('auto') else "")
+    )
+    webhooks.enqueue_ticket('ticket.assigned', ticket, assignee=assignee.username,
+                            auto=bool((meta or {}).get('auto')))
+
+def log_sla_breaches(tickets, kind, when):
+    """Un solo INSERT per tutti i ticket in violazione (scanner SLA)."""
+    label = "presa in carico" if kind == 'response' else "risoluzione"
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            ticket_id=t.pk,
+            action=AuditLog.Action.SLA_BREACHED,
+            actor=None,
+            meta={'kind': kind, 'due': getattr(t, f'{kind}_due_at').isoformat(), 'detected': when.isoformat()},
+            note=f"SLA {label} superato",
+        )
+        for t in tickets
+    ])
+
+def log_bulk_status_change(tickets, actor, old_statuses):
+    """Cambio stato massivo: un solo INSERT. old_statuses: {ticket_id: (codice, etichetta) vecchio stato}."""
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            ticket_id=t.pk,
+            action=AuditLog.Action.STATUS_CHANGED,
+            actor=actor,
+            meta={'old': old_statuses[t.pk][1], 'new': t.get_status_display(),
+                  'old_code': old_statuses[t.pk][0], 'new_code': t.status, 'bulk': True},
+            note=f"{old_statuses[t.pk][1]} → {t.get_status_display()}",
+        )
+        for t in tickets
+    ])
+    webhooks.enqueue('ticket.status_changed', [(t, {'old_status': old_statuses[t.pk][0]}) for t in tickets])
+
+def log_bulk_assigned(tickets, actor, assignee):
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            ticket_id=t.pk,
+            action=AuditLog.Action.ASSIGNED,
+            actor=actor,
+            meta={'assignee': assignee.username, 'bulk': True},
+            note=f"Assegnato a {assignee.username}",
+        )
+        for t in tickets
+    ])
+    webhooks.enqueue('ticket.assigned', [(t, {'assignee': assignee.username, 'auto': False}) for t in tickets])
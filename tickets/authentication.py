@@ -0,0 +1,118 @@
+# tickets/authentication.py
+"""
+TokenAuthentication con cache in-process token → utente (TTL breve).
+
+- Revoca: i signal su Token (cancellazione), su User (disattivazione, superuser,
+  password...) e sui suoi gruppi incrementano la versione *di quell'utente* nella
+  cache Django condivisa (CACHES, mai LocMem in produzione: vedi apps.py); le voci
+  degli altri utenti restano valide. `evict_all()` (gruppo svuotato dal lato gruppo)
+  incrementa un'epoca globale.
+- Una voce in cache ricontrolla le versioni al più ogni VERSION_CHECK_SECONDS: senza
+  Redis la cache è una tabella Postgres e leggerla a ogni richiesta rifarebbe la
+  query che la cache deve evitare. La revoca arriva agli altri worker entro quel ritardo.
+- `stats()` espone hit ratio e latenza media delle lookup del processo.
+"""
+import copy
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+EPOCH_KEY = 'authtoken:epoch'
+USER_VERSION_KEY = 'authtoken:user:{}'
+VERSION_CHECK_SECONDS = 2
+MAX_ENTRIES = 10000
+
+_entries = {}  # key -> [user, token, expires_at, version, checked_at]
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'hit_seconds': 0.0, 'miss_seconds': 0.0}
+
+
+def _ttl():
+    return getattr(settings, 'API_TOKEN_CACHE_TTL', 60)
+
+
+def _version(user_id):
+    """(epoca globale, versione dell'utente): una sola lettura della cache condivisa."""
+    user_key = USER_VERSION_KEY.format(user_id)
+    values = cache.get_many([EPOCH_KEY, user_key])
+    # chiave assente (primo uso, cache svuotata o potata): un valore mai visto invalida le voci vecchie
+    for key in (EPOCH_KEY, user_key):
+        if key not in values:
+            cache.add(key, time.time_ns(), timeout=None)
+            values[key] = cache.get(key)
+    return values[EPOCH_KEY], values[user_key]
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def evict_user(user_id):
+    with _lock:
+        for key in [k for k, entry in _entries.items() if entry[0].pk == user_id]:
+            _entries.pop(key, None)
+    _bump(USER_VERSION_KEY.format(user_id))
+
+
+def evict_token(key, user_id):
+    _entries.pop(key, None)
+    _bump(USER_VERSION_KEY.format(user_id))
+
+
+def evict_all():
+    with _lock:
+        _entries.clear()
+    _bump(EPOCH_KEY)
+
+
+def stats():
+    hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'pid': os.getpid(),
+        'entries': len(_entries),
+        'ttl_seconds': _ttl(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+        'avg_hit_us': round(_stats['hit_seconds'] / hits * 1e6, 1) if hits else None,
+        'avg_miss_ms': round(_stats['miss_seconds'] / misses * 1e3, 3) if misses else None,
+    }
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        t0 = time.perf_counter()
+        entry = _entries.get(key)
+        if entry is not None:
+            user, token, expires_at, version, checked_at = entry
+            now = time.monotonic()
+            valid = expires_at > now
+            if valid and now - checked_at >= VERSION_CHECK_SECONDS:
+                valid = _version(user.pk) == version
+                entry[4] = now
+            if valid:
+                with _lock:
+                    _stats['hits'] += 1
+                    _stats['hit_seconds'] += time.perf_counter() - t0
+                # copia: attributi impostati durante una richiesta non finiscono nelle successive
+                return copy.copy(user), token
+
+        # miss: lookup standard (query Token JOIN User, controlla is_active)
+        user, token = super().authenticate_credentials(key)
+        version = _version(user.pk)
+        now = time.monotonic()
+        with _lock:
+            if len(_entries) >= MAX_ENTRIES:
+                _entries.clear()
+            _entries[key] = [user, token, now + _ttl(), version, now]
+            _stats['misses'] += 1
+            _stats['miss_seconds'] += time.perf_counter() - t0
+        return copy.copy(user), token
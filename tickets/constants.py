@@ -27,3 +27,10 @@ SP_CATEGORY_CHOICES = [
     ("CAMBIO_TURNO", "Cambio turno"),
     (OTHER_CODE, "Permessi specifici (altro)"),
 ]
+
+# Seed iniziale della tabella Category (manage.py seed_initial); poi le categorie si gestiscono da admin
+CATEGORY_CHOICES_BY_DEPARTMENT = {
+    "ICT": ICT_CATEGORY_CHOICES,
+    "WH": WH_CATEGORY_CHOICES,
+    "SP": SP_CATEGORY_CHOICES,
+}
@@ -0,0 +1,112 @@
+# tickets/db_routing.py
+"""
+Instradamento letture su replica Postgres (opzionale).
+
+- Le view in sola lettura (dashboard, export, audit CSV, API list/retrieve)
+  leggono dalla replica solo se marcate con `replica_reads` / `read_from_replica`.
+- Dopo una scrittura (POST/PUT/PATCH/DELETE) l'utente resta "agganciato" al
+  primario per DB_REPLICA_STICKY_SECONDS, così rilegge subito ciò che ha scritto.
+- Se 'replica' non è configurato in DATABASES tutto va su 'default'.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA_ALIAS = 'replica'
+PIN_COOKIE = 'ati_primary_until'
+
+_read_alias = ContextVar('ati_read_alias', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _sticky_seconds():
+    return int(getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 10))
+
+
+def _pin_cache_key(user_id):
+    return f"db_routing:pin:{user_id}"
+
+
+def is_pinned_to_primary(request):
+    """True se l'utente ha scritto di recente (cookie per il browser, cache per i client API)."""
+    now = time.time()
+    try:
+        if float(request.COOKIES.get(PIN_COOKIE) or 0) > now:
+            return True
+    except ValueError:
+        pass
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return (cache.get(_pin_cache_key(user.pk)) or 0) > now
+    return False
+
+
+def pin_to_primary(request, response):
+    seconds = _sticky_seconds()
+    if seconds <= 0:
+        return
+    until = time.time() + seconds
+    response.set_cookie(PIN_COOKIE, f"{until:.3f}", max_age=seconds, httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_cache_key(user.pk), until, timeout=seconds)
+
+
+@contextmanager
+def read_from_replica(request):
+    """Le letture nel blocco vanno sulla replica (se configurata e l'utente non è agganciato)."""
+    alias = REPLICA_ALIAS if replica_configured() and not is_pinned_to_primary(request) else None
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+def replica_reads(view_func):
+    """Decoratore per view in sola lettura. Le richieste non-GET restano sul primario."""
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+        with read_from_replica(request):
+            return view_func(request, *args, **kwargs)
+    return _wrapped
+
+
+class PrimaryReplicaRouter:
+    """Letture sulla replica solo dentro `read_from_replica`; scritture sempre su default."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'django_cache':
+            return 'default'  # DatabaseCache: revoche e versioni vanno lette dove vengono scritte
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # primario e replica contengono gli stessi dati
+        return True
+
+
+class PrimaryStickinessMiddleware:
+    """Dopo ogni richiesta di scrittura aggancia l'utente al primario per qualche secondo."""
+
+    UNSAFE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method in self.UNSAFE_METHODS and replica_configured() and response.status_code < 500:
+            pin_to_primary(request, response)
+        return response
@@ -0,0 +1,122 @@
+# tickets/duplicates.py
+"""
+Possibili duplicati di un ticket in apertura (es. cinquanta segnalazioni della stessa stampante).
+
+- Firma MinHash delle parole di titolo + descrizione, spezzata in bande (LSH):
+  `Ticket.dup_bands` è un bigint[] con indice GIN parziale sui soli ticket aperti.
+  Due testi con similarità di Jaccard 0.5 condividono almeno una banda ~90% delle volte.
+- Query: ticket aperti dello stesso reparto che condividono una banda (operatore &&),
+  al più MAX_CANDIDATES; poi Jaccard esatto in Python (testo intero o solo titolo, il
+  migliore dei due) e bonus per stessa categoria/asset.
+- Budget di latenza: statement_timeout locale; se scade si risponde senza suggerimenti.
+- Nessuna estensione Postgres richiesta (GIN su array è nel core).
+"""
+import hashlib
+import random
+import re
+import unicodedata
+
+from django.db import DatabaseError, connection, transaction
+
+NUM_BANDS = 8
+ROWS_PER_BAND = 2
+MAX_CANDIDATES = 50
+MIN_SIMILARITY = 0.25
+STATEMENT_TIMEOUT_MS = 50
+DESCRIPTION_CHARS = 1000  # solo l'inizio della descrizione: lì c'è il sintomo
+
+OPEN_STATUSES = ('NEW', 'INP', 'WAI')
+
+STOPWORDS = frozenset("""
+a ad al alla alle allo ai agli c ci che chi con da dal dalla dai dei del della delle dello di e ed
+gli ha hanno ho i il in la le lo ma mi ne nel nella non o per piu po qui se si sono su sul sulla
+ti tra fra un una uno va vi
+""".split())
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20250701)  # costanti fisse: le firme salvate restano confrontabili
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+                 for _ in range(NUM_BANDS * ROWS_PER_BAND)]
+_WORD_RE = re.compile(r'\w+')
+
+
+def tokens(title, description=''):
+    """Parole significative (minuscolo, senza accenti) di titolo e inizio descrizione."""
+    text = f"{title or ''} {(description or '')[:DESCRIPTION_CHARS]}".lower()
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return {w for w in _WORD_RE.findall(text) if len(w) > 1 and w not in STOPWORDS}
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def bands(words):
+    """Bande LSH (bigint con segno) della firma MinHash delle parole; [] se non ci sono parole."""
+    if not words:
+        return []
+    hashes = [_hash64(w) for w in words]
+    signature = [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+    out = []
+    for i in range(NUM_BANDS):
+        rows = signature[i * ROWS_PER_BAND:(i + 1) * ROWS_PER_BAND]
+        digest = _hash64(f"{i}:" + ':'.join(map(str, rows)))
+        out.append(digest - (1 << 63))  # nel range di bigint
+    return out
+
+
+def bands_for(title, description=''):
+    return bands(tokens(title, description))
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def find_duplicates(department_id, title, description='', category='', asset_code='',
+                    exclude_id=None, limit=5):
+    """
+    Ticket aperti simili nello stesso reparto: [{'ticket': {...}, 'score': 0..1}] dal più simile.
+    Lista vuota se il testo è troppo povero o se la query supera il budget di latenza.
+    """
+    from .models import Ticket
+
+    words = tokens(title, description)
+    title_words = tokens(title)
+    query_bands = bands(words)
+    if not department_id or not query_bands:
+        return []
+
+    qs = (Ticket.objects
+          .filter(department_id=department_id, status__in=OPEN_STATUSES, dup_bands__overlap=query_bands)
+          .exclude(pk=exclude_id)
+          .order_by('-created_at')
+          .values('id', 'protocol', 'title', 'description', 'status', 'category', 'asset_code',
+                  'created_by_id', 'created_at')[:MAX_CANDIDATES])
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s", [STATEMENT_TIMEOUT_MS])
+            candidates = list(qs)
+            with connection.cursor() as cur:
+                # il timeout vale fino a fine transazione: se siamo dentro un atomic esterno va ripristinato
+                cur.execute("SET LOCAL statement_timeout TO DEFAULT")
+    except DatabaseError:
+        return []  # timeout: meglio nessun suggerimento che una creazione lenta
+
+    asset = (asset_code or '').strip().lower()
+    results = []
+    for row in candidates:
+        # titoli brevi ("Eureka down" / "Eureka non risponde"): conta anche il solo titolo
+        score = max(jaccard(words, tokens(row['title'], row['description'])),
+                    jaccard(title_words, tokens(row['title'])))
+        if score < MIN_SIMILARITY:
+            continue
+        if category and row['category'] == category:
+            score += 0.1
+        if asset and (row['asset_code'] or '').strip().lower() == asset:
+            score += 0.2
+        row.pop('description')
+        results.append({'ticket': row, 'score': round(min(score, 1.0), 2)})
+    results.sort(key=lambda r: (-r['score'], -r['ticket']['id']))
+    return results[:limit]
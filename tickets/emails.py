@@ -79,14 +79,15 @@ def send_ticket_status_changed(ticket, old_status_display, actor):
         ctx, to
     )
 
-def send_new_public_comment(comment):
-    # Invia solo per commenti NON interni
-    if getattr(comment, 'is_internal', False):
+def send_new_public_comments(ticket, comments):
+    # Invia solo per commenti NON interni; più commenti insieme (API bulk) = una sola email
+    comments = [c for c in comments if not getattr(c, 'is_internal', False)]
+    if not comments:
         return
-    ticket = comment.ticket
     ctx = {
         'ticket': ticket,
-        'comment': comment,
+        'comment': comments[0],
+        'comments': comments,
         'base_url': getattr(settings, 'SITE_BASE_URL', 'http://127.0.0.1:8000'),
         'ticket_url': _ticket_url(ticket),
     }
@@ -115,3 +116,58 @@ def send_new_attachments(ticket, attachments, actor):
         'emails/new_attachment.html',
         ctx, to
     )
+
+def send_sla_breach_digest(breaches):
+    """
+    breaches: lista di (ticket, kind). Una sola email per destinatario
+    (reparto / assegnatario) con l'elenco dei ticket in violazione.
+    """
+    by_recipient = {}
+    for ticket, kind in breaches:
+        for email in _recipients(ticket, include_department=True, include_creator=False, include_assignee=True):
+            by_recipient.setdefault(email, []).append({
+                'ticket': ticket,
+                'kind': kind,
+                'ticket_url': _ticket_url(ticket),
+            })
+    for email, items in by_recipient.items():
+        ctx = {
+            'items': items,
+            'base_url': getattr(settings, 'SITE_BASE_URL', 'http://127.0.0.1:8000'),
+        }
+        _send_templated(
+            'emails/sla_breach_subject.txt',
+            'emails/sla_breach.txt',
+            'emails/sla_breach.html',
+            ctx, [email]
+        )
+
+def _send_bulk_digest(items_by_recipient, ctx):
+    for email, items in items_by_recipient.items():
+        _send_templated(
+            'emails/bulk_update_subject.txt',
+            'emails/bulk_update.txt',
+            'emails/bulk_update.html',
+            {**ctx, 'items': items, 'base_url': getattr(settings, 'SITE_BASE_URL', 'http://127.0.0.1:8000')},
+            [email]
+        )
+
+def send_bulk_status_changed(tickets, old_statuses, actor):
+    """Cambio stato massivo: una sola email per destinatario con l'elenco dei suoi ticket."""
+    by_recipient = {}
+    for ticket in tickets:
+        for email in _recipients(ticket, include_department=True, include_creator=True, include_assignee=True):
+            by_recipient.setdefault(email, []).append({
+                'ticket': ticket,
+                'old_status_display': old_statuses[ticket.pk],
+                'ticket_url': _ticket_url(ticket),
+            })
+    _send_bulk_digest(by_recipient, {'kind': 'status', 'actor': actor})
+
+def send_bulk_assigned(tickets, assignee, actor):
+    """Assegnazione massiva: una email al nuovo assegnatario (e una per casella di reparto)."""
+    by_recipient = {}
+    for ticket in tickets:
+        for email in _recipients(ticket, include_department=True, include_creator=False, include_assignee=True):
+            by_recipient.setdefault(email, []).append({'ticket': ticket, 'ticket_url': _ticket_url(ticket)})
+    _send_bulk_digest(by_recipient, {'kind': 'assign', 'actor': actor, 'assignee': assignee})
@@ -0,0 +1,138 @@
+# tickets/events.py
+"""
+Eventi live per la dashboard team (Server-Sent Events).
+
+- `publish_ticket_event()` invia un NOTIFY Postgres dopo il commit della transazione.
+- `broker` (uno per processo ASGI) tiene UNA connessione in LISTEN e smista ogni
+  evento alle code dei client SSE collegati.
+"""
+import asyncio
+import json
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateformat import format as date_format
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'aticketing_events'
+NOTIFY_MAX_BYTES = 7900  # limite payload NOTIFY: 8000 byte
+
+
+def ticket_event_payload(event, ticket):
+    return {
+        'event': event,
+        'id': ticket.pk,
+        'protocol': ticket.protocol,
+        'title': ticket.title,
+        'department': ticket.department.code,
+        'priority': ticket.priority,
+        'priority_display': ticket.get_priority_display(),
+        'status': ticket.status,
+        'status_display': ticket.get_status_display(),
+        'created_by': getattr(ticket.created_by, 'username', ''),
+        'created_at': date_format(timezone.localtime(ticket.created_at), 'd/m/Y H:i'),
+        'url': f"/tickets/{ticket.pk}/",
+    }
+
+
+def _encode(payload):
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    if len(data.encode('utf-8')) > NOTIFY_MAX_BYTES:
+        payload = {k: payload[k] for k in ('event', 'id', 'protocol', 'status', 'status_display')}
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return data
+
+
+def _notify(*payloads):
+    if connection.vendor != 'postgresql' or not payloads:
+        return
+    try:
+        with connection.cursor() as cur:
+            # un solo statement anche per N eventi (azioni massive)
+            cur.execute("SELECT pg_notify(%s, data) FROM unnest(%s::text[]) AS data",
+                        [CHANNEL, [_encode(p) for p in payloads]])
+    except Exception:
+        # gli eventi live sono "best effort": mai far fallire la richiesta
+        logger.exception("pg_notify fallito")
+
+
+def publish_ticket_event(event, ticket):
+    payload = ticket_event_payload(event, ticket)
+    transaction.on_commit(lambda: _notify(payload))
+
+
+def publish_ticket_events(event, tickets):
+    payloads = [ticket_event_payload(event, t) for t in tickets]
+    transaction.on_commit(lambda: _notify(*payloads))
+
+
+# ---------------------- listener (lato ASGI) ----------------------
+def _conninfo():
+    from psycopg.conninfo import make_conninfo
+
+    db = settings.DATABASES['default']
+    return make_conninfo(
+        dbname=db.get('NAME') or '',
+        user=db.get('USER') or None,
+        password=db.get('PASSWORD') or None,
+        host=db.get('HOST') or None,
+        port=db.get('PORT') or None,
+    )
+
+
+class EventBroker:
+    """Una connessione LISTEN per processo, fan-out verso tutte le code dei subscriber."""
+
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._subscribers = set()
+        self._task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def _dispatch(self, raw):
+        try:
+            event = json.loads(raw)
+        except ValueError:
+            return
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # client troppo lento: perde l'evento, al prossimo refresh si riallinea
+                pass
+
+    async def _listen(self):
+        import psycopg
+
+        backoff = 1
+        while self._subscribers:
+            try:
+                async with await psycopg.AsyncConnection.connect(_conninfo(), autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    backoff = 1
+                    async for notify in conn.notifies():
+                        self._dispatch(notify.payload)
+                        if not self._subscribers:
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Listener eventi disconnesso, nuovo tentativo tra %ss", backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+broker = EventBroker()
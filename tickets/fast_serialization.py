@@ -0,0 +1,69 @@
+# tickets/fast_serialization.py
+"""
+Percorso veloce per le liste API: `values_list()` sulle sole colonne richieste
+e costruzione dei dict in un unico passaggio, senza istanziare modelli né
+passare dai field del serializer riga per riga.
+
+L'output deve restare IDENTICO a TicketSerializer(many=True).data
+(verifica: `python manage.py bench_ticket_list --check`).
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from .serializers import TicketSerializer
+
+# campo serializer → colonna per values_list (le FK escono come pk)
+_COLUMNS = {
+    'department': 'department_id',
+    'created_by': 'created_by_id',
+    'assignee': 'assignee_id',
+}
+_DATETIME_FIELDS = {'created_at', 'updated_at'}
+
+
+def _datetime_converter():
+    """Replica DateTimeField.to_representation di DRF per il formato ISO 8601."""
+    if (api_settings.DATETIME_FORMAT or '').lower() != ISO_8601:
+        return serializers.DateTimeField().to_representation
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def convert(value):
+        if not value:
+            return None
+        if tz is not None:
+            value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+        out = value.isoformat()
+        if out.endswith('+00:00'):
+            out = out[:-6] + 'Z'
+        return out
+    return convert
+
+
+def ticket_list_fields(requested=None):
+    """Campi nell'ordine del serializer (come fa DynamicFieldsMixin)."""
+    fields = list(TicketSerializer.Meta.fields)
+    if requested:
+        fields = [f for f in fields if f in requested]
+    return fields
+
+
+def serialize_ticket_rows(queryset, requested=None):
+    fields = ticket_list_fields(requested)
+    columns = [_COLUMNS.get(f, f) for f in fields]
+    rows = queryset.values_list(*columns)
+
+    dt_idx = [i for i, f in enumerate(fields) if f in _DATETIME_FIELDS]
+    if not dt_idx:
+        return [dict(zip(fields, row)) for row in rows]
+
+    convert = _datetime_converter()
+    out = []
+    for row in rows:
+        row = list(row)
+        for i in dt_idx:
+            row[i] = convert(row[i])
+        out.append(dict(zip(fields, row)))
+    return out
@@ -1,22 +1,16 @@
 from django import forms
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
 import os
 
-from .models import Ticket, Department
-from .constants import (
-    ICT_CATEGORY_CHOICES, WH_CATEGORY_CHOICES, SP_CATEGORY_CHOICES, OTHER_CODE
-)
-
-# Mappa reparto → scelte categoria
-CATEGORY_CHOICES_BY_DEPARTMENT = {
-    "ICT": ICT_CATEGORY_CHOICES,
-    "WH":  WH_CATEGORY_CHOICES,
-    "SP":  SP_CATEGORY_CHOICES,
-}
-
-# Unione di tutte le scelte categoria, così il POST inviato dal JS è sempre valido lato form
-ALL_CATEGORY_CHOICES = [("", "— seleziona —")] + ICT_CATEGORY_CHOICES + WH_CATEGORY_CHOICES + SP_CATEGORY_CHOICES
+from .models import Ticket
+from .permissions import ADMIN_GROUPS
+from . import taxonomy
+from .constants import OTHER_CODE
 
 ALLOWED_EXTS = set(ext.strip().lower() for ext in settings.ATTACHMENTS_ALLOWED_EXTENSIONS)
 MAX_SIZE_BYTES = settings.ATTACHMENTS_MAX_SIZE_MB * 1024 * 1024
@@ -57,7 +51,6 @@ class NewTicketForm(forms.ModelForm):
     # Campi categoria (form-only: category_other)
     category = forms.ChoiceField(
         label="Categoria",
-        choices=ALL_CATEGORY_CHOICES,
         required=False,
     )
     category_other = forms.CharField(
@@ -104,10 +97,12 @@ class NewTicketForm(forms.ModelForm):
         if 'location' in self.fields:
             self.fields['location'].widget.attrs.update({
                 'class': 'validate', 'placeholder': 'es. Ufficio 2B', 'autocomplete': 'off',
+                'list': 'dl_location', 'data-autocomplete': 'location',
             })
         if 'asset_code' in self.fields:
             self.fields['asset_code'].widget.attrs.update({
                 'class': 'validate', 'placeholder': 'es. PC-123', 'autocomplete': 'off',
+                'list': 'dl_asset_code', 'data-autocomplete': 'asset_code',
             })
 
         try:
@@ -117,6 +112,8 @@ class NewTicketForm(forms.ModelForm):
             pass
 
         # nuovi campi
+        # unione delle categorie di tutti i reparti (dalla cache), così il POST inviato dal JS è sempre valido
+        self.fields['category'].choices = [("", "— seleziona —")] + taxonomy.all_category_choices()
         self.fields['category'].widget.attrs.update({'class': 'browser-default'})
         self.fields['category_other'].widget.attrs.update({
             'class': 'validate',
@@ -135,13 +132,15 @@ class NewTicketForm(forms.ModelForm):
         cat = (cleaned.get('category') or "").strip()
         other = (cleaned.get('category_other') or "").strip()
 
-        # Reparti che hanno categorie
-        dep_has_categories = dep_code in ("ICT", "WH", "SP")
+        # Reparti che hanno categorie (tabella Category, via cache)
+        dep_categories = {code for code, _ in taxonomy.category_choices(dep_code)}
 
-        if dep_has_categories:
-            # categoria richiesta
+        if dep_categories:
+            # categoria richiesta, e del reparto scelto
             if not cat:
                 self.add_error('category', "Seleziona una categoria.")
+            elif cat not in dep_categories:
+                self.add_error('category', "Categoria non valida per il reparto.")
             # se 'Altro', obbliga specifica
             if cat == OTHER_CODE and not other:
                 self.add_error('category_other', "Specifica la categoria se hai scelto 'Altro'.")
@@ -257,7 +256,7 @@ class TicketFilterForm(forms.Form):
         # Scelte dinamiche base
         self.fields['status'].choices = [('', 'Tutti')] + list(Ticket.STATUS_CHOICES)
         self.fields['priority'].choices = [('', 'Tutte')] + list(Ticket.PRIORITY_CHOICES)
-        deps = Department.objects.all().order_by('code').values_list('id', 'code')
+        deps = taxonomy.department_choices()
         self.fields['department'].choices = [('', 'Tutti')] + [(str(i), c) for i, c in deps]
 
         # Style Materialize per select
@@ -283,9 +282,74 @@ class TicketFilterForm(forms.Form):
         cat_choices = [('', 'Tutte')]
         if dep_choice_id:
             try:
-                dep_code = Department.objects.filter(id=int(dep_choice_id)).values_list('code', flat=True).first()
+                dep_code = taxonomy.dep_code_by_id().get(int(dep_choice_id))
             except (ValueError, TypeError):
                 dep_code = None
-            if dep_code and dep_code in CATEGORY_CHOICES_BY_DEPARTMENT:
-                cat_choices += CATEGORY_CHOICES_BY_DEPARTMENT[dep_code]
+            if dep_code:
+                cat_choices += taxonomy.category_choices(dep_code)
         self.fields['category'].choices = cat_choices
+
+
+# --- Azioni massive (dashboard team) ---
+class TicketIdsField(forms.Field):
+    """Lista di id ticket dai checkbox `ticket_ids` della tabella."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return sorted({int(v) for v in (value or [])})
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Selezione non valida.")
+
+
+class BulkActionForm(forms.Form):
+    MAX_TICKETS = 1000
+
+    action = forms.ChoiceField(choices=[('status', 'Cambia stato'), ('assign', 'Assegna a')])
+    ticket_ids = TicketIdsField(error_messages={'required': "Seleziona almeno un ticket."})
+    status = forms.ChoiceField(label="Nuovo stato", choices=[('', '—')] + Ticket.STATUS_CHOICES, required=False)
+    assignee = forms.ModelChoiceField(label="Assegnatario", queryset=User.objects.none(), required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # staff + operatori con regole di assegnazione attive
+        self.fields['assignee'].queryset = (
+            User.objects.filter(is_active=True)
+            .filter(Q(is_superuser=True) | Q(groups__name__in=ADMIN_GROUPS) | Q(assignment_rules__is_active=True))
+            .distinct().order_by('username')
+        )
+        for name in ('action', 'status', 'assignee'):
+            self.fields[name].widget.attrs.update({'class': 'browser-default'})
+
+    def clean(self):
+        cleaned = super().clean()
+        ids = cleaned.get('ticket_ids') or []
+        if len(ids) > self.MAX_TICKETS:
+            self.add_error('ticket_ids', f"Massimo {self.MAX_TICKETS} ticket per operazione.")
+        if cleaned.get('action') == 'status' and not cleaned.get('status'):
+            self.add_error('status', "Seleziona il nuovo stato.")
+        if cleaned.get('action') == 'assign' and not cleaned.get('assignee'):
+            self.add_error('assignee', "Seleziona l'assegnatario.")
+        return cleaned
+
+
+# --- Report tempi di presa in carico / risoluzione ---
+class ReportFilterForm(forms.Form):
+    WEEKS_DEFAULT = 12
+
+    date_from = forms.DateField(label="Dal", required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(label="Al", required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    department = forms.ChoiceField(label="Comparto", required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        deps = taxonomy.department_choices()
+        self.fields['department'].choices = [('', 'Tutti')] + [(str(i), c) for i, c in deps]
+        self.fields['department'].widget.attrs['class'] = 'browser-default'
+
+    def period(self):
+        """(dal, al) richiesti o, in mancanza, le ultime WEEKS_DEFAULT settimane."""
+        cd = self.cleaned_data if self.is_valid() else {}
+        date_to = cd.get('date_to') or timezone.localdate()
+        date_from = cd.get('date_from') or date_to - timedelta(weeks=self.WEEKS_DEFAULT)
+        return date_from, date_to
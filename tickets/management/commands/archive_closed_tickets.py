@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tickets import archive
+
+
+class Command(BaseCommand):
+    help = "Sposta nell'archivio i ticket chiusi da più di N mesi (a batch, transazioni brevi)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=getattr(settings, 'TICKET_ARCHIVE_AFTER_MONTHS', 12))
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0.2,
+                            help="Pausa (secondi) tra un batch e l'altro, per non saturare il DB")
+        parser.add_argument('--max-batches', type=int, default=0, help="0 = fino a esaurimento")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **opts):
+        cutoff = archive.cutoff_for(opts['months'])
+        if opts['dry_run']:
+            n = archive.candidates(cutoff).count()
+            self.stdout.write(f"{n} ticket chiusi prima del {cutoff:%d/%m/%Y} da archiviare (dry-run).")
+            return
+
+        total = batches = 0
+        while True:
+            moved = archive.archive_batch(cutoff, opts['batch_size'])
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            self.stdout.write(f"batch {batches}: {moved} ticket archiviati (totale {total})")
+            if opts['max_batches'] and batches >= opts['max_batches']:
+                break
+            time.sleep(opts['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Archiviazione completata: {total} ticket."))
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from tickets.fast_serialization import serialize_ticket_rows
+from tickets.models import Ticket
+from tickets.renderers import FastJSONRenderer, orjson
+from tickets.serializers import TicketSerializer
+
+
+class Command(BaseCommand):
+    help = "Benchmark e verifica di parità: lista ticket via TicketSerializer vs percorso veloce"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=5000, help="Numero massimo di ticket")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--fields', default='', help="Sparse fieldset, es. id,protocol,status")
+        parser.add_argument('--check', action='store_true', help="Esce con errore se l'output differisce")
+
+    def _best(self, fn, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **opts):
+        fields = [f.strip() for f in opts['fields'].split(',') if f.strip()] or None
+        qs = Ticket.objects.select_related('department', 'created_by', 'assignee').order_by('-created_at')
+        ids = list(qs.values_list('id', flat=True)[:opts['limit']])
+        qs = qs.filter(id__in=ids)
+        repeat = max(1, opts['repeat'])
+        renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+
+        t_ser, slow = self._best(
+            lambda: renderer.render(TicketSerializer(qs, many=True, fields=fields).data), repeat)
+        t_fast, fast = self._best(lambda: renderer.render(serialize_ticket_rows(qs, fields)), repeat)
+        t_fast_json, fast_json = self._best(
+            lambda: fast_renderer.render(serialize_ticket_rows(qs, fields)), repeat)
+
+        self.stdout.write(f"Ticket: {len(ids)}  (best of {repeat})")
+        self.stdout.write(f"  TicketSerializer + JSONRenderer : {t_ser * 1000:8.1f} ms")
+        self.stdout.write(f"  values_list     + JSONRenderer : {t_fast * 1000:8.1f} ms")
+        label = "FastJSONRenderer" if orjson else "FastJSONRenderer (orjson assente)"
+        self.stdout.write(f"  values_list     + {label}: {t_fast_json * 1000:8.1f} ms")
+
+        ok = slow == fast == fast_json
+        if ok:
+            self.stdout.write(self.style.SUCCESS(f"Parità OK ({len(slow)} byte)"))
+        else:
+            msg = "Output diverso tra serializer e percorso veloce!"
+            if opts['check']:
+                raise CommandError(msg)
+            self.stdout.write(self.style.ERROR(msg))
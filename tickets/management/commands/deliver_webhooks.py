@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tickets import webhooks
+
+
+class Command(BaseCommand):
+    help = "Worker di consegna dei webhook: batch per endpoint, connessioni keep-alive, retry con backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Un solo giro sulla coda, poi esce (cron)")
+        parser.add_argument('--interval', type=float, default=2.0, help="Secondi di attesa a coda vuota")
+        parser.add_argument('--limit', type=int, default=500, help="Consegne prese per giro")
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'WEBHOOKS_BATCH_SIZE', 50),
+                            help="Eventi per POST verso lo stesso endpoint")
+        parser.add_argument('--workers', type=int, default=8, help="Endpoint serviti in parallelo")
+        parser.add_argument('--purge-days', type=int, default=7, help="Cancella le consegne riuscite più vecchie")
+
+    def handle(self, *args, **opts):
+        self.endpoints = {}  # subscription_id → Endpoint (connessione riusata tra i giri)
+        self.batch_size = opts['batch_size']
+        totals = {'sent': 0, 'failed': 0}
+        last_purge = 0.0
+        try:
+            with ThreadPoolExecutor(max_workers=opts['workers']) as pool:
+                while True:
+                    if time.monotonic() - last_purge > 3600:
+                        webhooks.purge_sent(opts['purge_days'])
+                        webhooks.fail_inactive()  # accodate mentre la sottoscrizione veniva disattivata
+                        last_purge = time.monotonic()
+                    sent, failed = self._run(pool, opts['limit'])
+                    totals['sent'] += sent
+                    totals['failed'] += failed
+                    if opts['once']:
+                        break
+                    if not sent and not failed:
+                        close_old_connections()
+                        time.sleep(opts['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for endpoint in self.endpoints.values():
+                endpoint.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Webhook: {totals['sent']} consegnati, {totals['failed']} da ritentare o falliti."))
+
+    def _endpoint(self, subscription):
+        endpoint = self.endpoints.get(subscription.pk)
+        if endpoint is None or endpoint.url != subscription.url:
+            if endpoint is not None:
+                endpoint.close()
+            endpoint = webhooks.Endpoint(subscription.url, settings.WEBHOOKS_TIMEOUT)
+            self.endpoints[subscription.pk] = endpoint
+        return endpoint
+
+    def _deliver(self, endpoint, subscription, deliveries):
+        # solo HTTP nei thread: l'ORM resta nel thread principale
+        sent, failed = [], []
+        for i in range(0, len(deliveries), self.batch_size):
+            batch = deliveries[i:i + self.batch_size]
+            error = webhooks.send_batch(endpoint, subscription, batch)
+            if error:
+                # endpoint in difficoltà: il resto del giro si ritenta più tardi, senza altri timeout
+                failed += [(d, error) for d in deliveries[i:]]
+                break
+            sent += batch
+        return sent, failed
+
+    def _run(self, pool, limit):
+        groups = webhooks.claim(limit)
+        if not groups:
+            return 0, 0
+        futures = [pool.submit(self._deliver, self._endpoint(sub), sub, deliveries)
+                   for sub, deliveries in groups.items()]
+        sent, failed = [], []
+        for future in futures:
+            s, f = future.result()
+            sent += s
+            failed += f
+        webhooks.record_results(sent, failed)
+        return len(sent), len(failed)
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from tickets import snapshots
+from tickets.models import Department, SnapshotWatermark
+
+
+class Command(BaseCommand):
+    help = "Esporta in NDJSON.gz ticket, commenti e audit modificati dall'ultimo watermark, un processo per reparto (da schedulare)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+        parser.add_argument('--dir', default=settings.SNAPSHOT_DIR, help="Cartella di output (default SNAPSHOT_DIR)")
+        parser.add_argument('--departments', default='', help="Codici reparto separati da virgola (default tutti)")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--full', action='store_true',
+                            help="Azzera i watermark dei reparti scelti e riesporta tutto")
+
+    def handle(self, *args, **opts):
+        deps = Department.objects.order_by('code')
+        if opts['departments']:
+            codes = [c.strip().upper() for c in opts['departments'].split(',') if c.strip()]
+            deps = deps.filter(code__in=codes)
+            if deps.count() != len(set(codes)):
+                raise CommandError(f"Reparti sconosciuti in: {opts['departments']}")
+        deps = list(deps.values('id', 'code'))
+
+        with connection.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", [snapshots.LOCK_KEY])
+            if not cur.fetchone()[0]:
+                raise CommandError("Un'altra esportazione è in corso.")
+        try:
+            self._run(deps, opts)
+        finally:
+            with connection.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", [snapshots.LOCK_KEY])
+
+    def _run(self, deps, opts):
+        if opts['full']:
+            SnapshotWatermark.objects.filter(department_id__in=[d['id'] for d in deps]).delete()
+            if not opts['departments']:
+                SnapshotWatermark.objects.filter(department__isnull=True).delete()
+
+        started = timezone.now()
+        horizon = started - timedelta(seconds=settings.SNAPSHOT_SAFETY_SECONDS)
+        run_id = f"{started:%Y%m%dT%H%M%S}-{started.microsecond:06d}"
+        run_dir = os.path.join(opts['dir'], run_id)
+        os.makedirs(run_dir, exist_ok=True)
+
+        files = []
+        if not opts['departments']:
+            entry, position = snapshots.export_tombstones(run_id, run_dir, horizon, opts['batch_size'])
+            files.append(entry)
+            snapshots.save_watermark(snapshots.GLOBAL_STREAM, None, position, run_id)
+
+        jobs = [{
+            'run_id': run_id,
+            'run_dir': run_dir,
+            'department_id': d['id'],
+            'department_code': d['code'],
+            'horizon': horizon,
+            'batch_size': opts['batch_size'],
+        } for d in deps]
+        departments, failed = [], []
+        # spawn: ogni worker apre le sue connessioni; un reparto fallito non ferma gli altri
+        with ProcessPoolExecutor(max_workers=max(1, min(opts['workers'], len(jobs) or 1)),
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=snapshots.init_worker) as pool:
+            futures = {pool.submit(snapshots.export_department, job): job['department_code'] for job in jobs}
+            for future in as_completed(futures):
+                code = futures[future]
+                try:
+                    manifest = future.result()
+                except Exception as exc:
+                    failed.append(code)
+                    self.stderr.write(f"Reparto {code}: {type(exc).__name__}: {exc}")
+                    continue
+                rows = {f['stream']: f['rows'] for f in manifest['files']}
+                departments.append({'department': code, 'manifest': f'{code}/manifest.json', 'rows': rows})
+                files.extend(manifest['files'])
+
+        departments.sort(key=lambda d: d['department'])
+        # indice dell'esecuzione, scritto per ultimo: i loader considerano completa solo una cartella che lo contiene
+        snapshots.write_manifest(os.path.join(run_dir, 'manifest.json'), {
+            'format': snapshots.FORMAT_VERSION,
+            'run_id': run_id,
+            'started_at': started,
+            'completed_at': timezone.now(),
+            'horizon': horizon,
+            'departments': departments,
+            'failed_departments': sorted(failed),
+            'files': [f for f in files if f['rows']],
+        })
+
+        total = sum(f['rows'] for f in files)
+        msg = f"Snapshot {run_id}: {total} righe, {len(departments)} reparti in {run_dir}"
+        if failed:
+            raise CommandError(f"{msg}; reparti falliti (ripresi alla prossima esecuzione): {', '.join(sorted(failed))}")
+        self.stdout.write(self.style.SUCCESS(msg + "."))
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from tickets import text_extraction
+from tickets.models import Attachment, AttachmentText
+
+
+class Command(BaseCommand):
+    help = "Estrae in un pool di processi il testo dei nuovi allegati, per la ricerca in dashboard (da schedulare)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--limit', type=int, default=0, help="Massimo numero di allegati (0 = tutti)")
+        parser.add_argument('--retry-errors', action='store_true', help="Ritenta gli allegati finiti in errore")
+
+    def handle(self, *args, **opts):
+        max_bytes = settings.ATTACHMENTS_TEXT_MAX_MB * 1024 * 1024
+        qs = Attachment.objects.filter(text__isnull=True)
+        if opts['retry_errors']:
+            qs = Attachment.objects.filter(Q(text__isnull=True) | Q(text__status='ERR'))
+        qs = qs.order_by('id').values('id', 'ticket_id', 'file', 'original_name', 'size', 'compression')
+
+        counts, last_id, processed = Counter(), 0, 0
+        # spawn: i worker non ereditano le connessioni al DB; riciclati ogni 100 file (memoria dei parser)
+        with ProcessPoolExecutor(max_workers=opts['workers'], max_tasks_per_child=100,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            while True:
+                size = opts['batch_size']
+                if opts['limit']:
+                    size = min(size, opts['limit'] - processed)
+                batch = list(qs.filter(id__gt=last_id)[:size]) if size > 0 else []
+                if not batch:
+                    break
+                last_id = batch[-1]['id']
+
+                results, jobs = [], []
+                for a in batch:
+                    name = a['original_name'] or a['file']
+                    if not text_extraction.is_supported(text_extraction.extension(name)):
+                        results.append((a['id'], 'SKIP', "tipo non supportato", ''))
+                    elif a['size'] > max_bytes:
+                        results.append((a['id'], 'SKIP', f"oltre {settings.ATTACHMENTS_TEXT_MAX_MB} MB", ''))
+                    else:
+                        jobs.append({
+                            'id': a['id'],
+                            'path': default_storage.path(a['file']),
+                            'name': name,
+                            'compression': a['compression'],
+                            'timeout': settings.ATTACHMENTS_TEXT_TIMEOUT,
+                            'max_chars': settings.ATTACHMENTS_TEXT_MAX_CHARS,
+                        })
+                results += pool.map(text_extraction.extract, jobs)
+
+                self._save(results, {a['id']: a['ticket_id'] for a in batch})
+                counts.update(status for _, status, _, _ in results)
+                processed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Testo allegati: {counts['OK']} estratti, {counts['SKIP']} saltati, {counts['ERR']} in errore."))
+
+    def _save(self, results, ticket_ids):
+        with transaction.atomic():
+            # allegati cancellati nel frattempo (es. ticket archiviato): niente riga orfana
+            alive = set(Attachment.objects.select_for_update()
+                        .filter(pk__in=[r[0] for r in results]).values_list('pk', flat=True))
+            AttachmentText.objects.bulk_create(
+                [AttachmentText(attachment_id=pk, ticket_id=ticket_ids[pk], status=status, detail=detail, content=content)
+                 for pk, status, detail, content in results if pk in alive],
+                update_conflicts=True,
+                unique_fields=['attachment'],
+                update_fields=['status', 'detail', 'content', 'extracted_at'],
+            )
+            # tsvector calcolato da Postgres, una UPDATE per batch
+            ok = [pk for pk, status, _, _ in results if status == 'OK' and pk in alive]
+            AttachmentText.objects.filter(pk__in=ok).update(
+                search=SearchVector('content', config=text_extraction.SEARCH_CONFIG))
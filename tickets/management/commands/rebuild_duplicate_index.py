@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from tickets import duplicates
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = "Calcola le bande MinHash (ricerca duplicati) dei ticket che non le hanno ancora"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Ricalcola anche i ticket già indicizzati")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **opts):
+        qs = Ticket.objects.only('id', 'title', 'description', 'dup_bands').order_by('id')
+        if not opts['all']:
+            qs = qs.filter(dup_bands=[])
+
+        done, batch = 0, []
+        for ticket in qs.iterator(chunk_size=opts['batch_size']):
+            ticket.dup_bands = duplicates.bands_for(ticket.title, ticket.description)
+            batch.append(ticket)
+            if len(batch) >= opts['batch_size']:
+                # bulk_update: non tocca updated_at (la sync API non vede modifiche)
+                Ticket.objects.bulk_update(batch, ['dup_bands'])
+                done += len(batch)
+                batch = []
+        if batch:
+            Ticket.objects.bulk_update(batch, ['dup_bands'])
+            done += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Indice duplicati: {done} ticket aggiornati."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tickets import suggest
+
+
+class Command(BaseCommand):
+    help = "Ricalcola dai ticket i valori di location/asset_code proposti dall'autocomplete"
+
+    def handle(self, *args, **opts):
+        for field in suggest.FIELDS:
+            n = suggest.rebuild(field)
+            self.stdout.write(f"{field}: {n} valori distinti")
+        self.stdout.write(self.style.SUCCESS("Statistiche autocomplete ricalcolate."))
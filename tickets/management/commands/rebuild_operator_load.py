@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from tickets.assignment import OPEN_STATUSES
+from tickets.models import AssignmentRule, OperatorLoad, Ticket
+
+
+class Command(BaseCommand):
+    help = "Ricalcola i contatori OperatorLoad dai ticket aperti (un solo GROUP BY)"
+
+    def handle(self, *args, **opts):
+        counts = dict(
+            Ticket.objects.filter(status__in=OPEN_STATUSES, assignee__isnull=False)
+            .values_list('assignee_id').annotate(n=Count('id')).order_by()
+        )
+        # operatori con regole attive ma nessun ticket: contatore a zero (restano candidabili)
+        for user_id in AssignmentRule.objects.filter(is_active=True).values_list('user_id', flat=True).distinct():
+            counts.setdefault(user_id, 0)
+
+        with transaction.atomic():
+            existing = {l.user_id: l for l in OperatorLoad.objects.select_for_update()}
+            to_update, to_create = [], []
+            for user_id, n in counts.items():
+                load = existing.pop(user_id, None)
+                if load is None:
+                    to_create.append(OperatorLoad(user_id=user_id, open_tickets=n))
+                elif load.open_tickets != n:
+                    load.open_tickets = n
+                    to_update.append(load)
+            for load in existing.values():
+                if load.open_tickets:
+                    load.open_tickets = 0
+                    to_update.append(load)
+            OperatorLoad.objects.bulk_create(to_create)
+            OperatorLoad.objects.bulk_update(to_update, ['open_tickets'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Carichi operatori: {len(to_create)} creati, {len(to_update)} corretti."))
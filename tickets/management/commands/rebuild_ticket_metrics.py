@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tickets import analytics
+from tickets.models import AuditLog, Ticket, TicketMetric
+
+BATCH = 1000
+
+
+class Command(BaseCommand):
+    help = "Ricostruisce TicketMetric (statistiche presa in carico / risoluzione) dallo storico audit"
+
+    def handle(self, *args, **opts):
+        # audit storici: meta con sole etichette → codice
+        code_by_label = {label: code for code, label in Ticket.STATUS_CHOICES}
+
+        def code(meta, key):
+            return meta.get(f'{key}_code') or code_by_label.get(meta.get(key))
+
+        # due letture ordinate per ticket, unite in streaming (niente query per ticket)
+        audits = (AuditLog.objects
+                  .filter(action=AuditLog.Action.STATUS_CHANGED)
+                  .order_by('ticket_id', 'created_at', 'id')
+                  .values_list('ticket_id', 'meta', 'created_at')
+                  .iterator(chunk_size=5000))
+        pending = next(audits, None)
+
+        total, batch = 0, []
+        with transaction.atomic():
+            for ticket in Ticket.objects.order_by('id').only(
+                    'id', 'department_id', 'category', 'created_at').iterator(chunk_size=BATCH):
+                transitions = []
+                while pending is not None and pending[0] <= ticket.pk:
+                    ticket_id, meta, when = pending
+                    if ticket_id == ticket.pk and meta:
+                        transitions.append((code(meta, 'old'), code(meta, 'new'), when))
+                    pending = next(audits, None)
+                batch.append(analytics.replay(ticket, transitions))
+                if len(batch) >= BATCH:
+                    total += self._flush(batch)
+            total += self._flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Statistiche ricostruite per {total} ticket."))
+
+    def _flush(self, batch):
+        TicketMetric.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['ticket_id'],
+            update_fields=['department', 'category', 'week', 'created_at',
+                           'first_response_seconds', 'resolved_at', 'resolution_seconds'],
+        )
+        n = len(batch)
+        batch.clear()
+        return n
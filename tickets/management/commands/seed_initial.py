@@ -1,16 +1,20 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
-from tickets.models import Department, Ticket
+from tickets.constants import CATEGORY_CHOICES_BY_DEPARTMENT
+from tickets.models import Category, Department, Ticket
 
 class Command(BaseCommand):
-    help = "Crea reparti (ICT/WH/SP) e ruoli/permessi base"
+    help = "Crea reparti (ICT/WH/SP), categorie e ruoli/permessi base"
 
     def handle(self, *args, **options):
         deps = [('ICT', 'ICT'), ('WH', 'Magazzino'), ('SP', 'Piano Turni')]
         for code, name in deps:
             d, created = Department.objects.get_or_create(code=code, defaults={'name': name})
             self.stdout.write(self.style.SUCCESS(f"Department {code} {'created' if created else 'exists'}"))
+            for order, (cat_code, label) in enumerate(CATEGORY_CHOICES_BY_DEPARTMENT.get(code, [])):
+                Category.objects.get_or_create(department=d, code=cat_code,
+                                               defaults={'label': label, 'sort_order': order})
 
         groups = ['Admin', 'SuperUser', 'Coordinatore', 'Operatore']
         group_objs = {g: Group.objects.get_or_create(name=g)[0] for g in groups}
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from tickets import storage_tiers
+
+
+class Command(BaseCommand):
+    help = "Sposta nel tier COLD (compresso se conviene) gli allegati vecchi dei ticket risolti/chiusi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'ATTACHMENTS_COLD_AFTER_DAYS', 180))
+        parser.add_argument('--any-status', action='store_true', help="Anche allegati di ticket ancora aperti")
+        parser.add_argument('--limit', type=int, default=0, help="Massimo numero di allegati (0 = tutti)")
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--report', action='store_true', help="Mostra solo il riepilogo per tier")
+
+    def handle(self, *args, **opts):
+        if not opts['report']:
+            self._run(opts)
+        self._report()
+
+    def _run(self, opts):
+        qs = storage_tiers.candidates(opts['days'], any_status=opts['any_status']).order_by('uploaded_at')
+        ids = list(qs.values_list('id', flat=True))
+        if opts['limit']:
+            ids = ids[:opts['limit']]
+        if opts['dry_run']:
+            self.stdout.write(f"{len(ids)} allegati da portare nel tier COLD (dry-run).")
+            return
+
+        method = storage_tiers.codec()
+        moved = compressed = reclaimed = 0
+        for attachment_id in ids:
+            try:
+                saved = storage_tiers.move_to_cold(attachment_id, method)
+            except OSError as e:
+                self.stderr.write(f"allegato {attachment_id}: {e}")
+                continue
+            if saved is None:
+                continue
+            moved += 1
+            if saved:
+                compressed += 1
+                reclaimed += saved
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved} allegati nel tier COLD, {compressed} compressi ({method}), "
+            f"{filesizeformat(reclaimed)} recuperati."))
+
+    def _report(self):
+        self.stdout.write("tier  compressione  file  originali  su disco  recuperati")
+        for r in storage_tiers.report():
+            self.stdout.write(
+                f"{r['storage_tier']:<5} {r['compression'] or '-':<13} {r['files']:>5}  "
+                f"{filesizeformat(r['original']):>9}  {filesizeformat(r['stored']):>8}  {filesizeformat(r['reclaimed']):>10}")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from tickets import webhooks
+
+
+class Command(BaseCommand):
+    help = "Ricevente di prova per i webhook (solo sviluppo): verifica la firma e stampa i batch ricevuti"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--secret', required=True, help="Lo stesso secret della WebhookSubscription")
+        parser.add_argument('--fail-rate', type=float, default=0.0,
+                            help="Quota di richieste a cui rispondere 503 (prova dei retry)")
+
+    def handle(self, *args, **opts):
+        out = self.stdout
+
+        def on_batch(events, client):
+            stats = server.stats
+            out.write(f"{len(events)} eventi ({', '.join(sorted({e['event'] for e in events}))}) "
+                      f"da {client[0]}:{client[1]} — totale {stats['events']} eventi, "
+                      f"{stats['requests']} richieste, {len(stats['connections'])} connessioni")
+
+        server = webhooks.stub_server(opts['secret'], opts['port'], opts['fail_rate'], on_batch)
+        out.write(f"Stub webhook in ascolto su http://127.0.0.1:{server.server_port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,45 @@
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0002_attachment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='category',
+            field=models.CharField(blank=True, default='', max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='category_other',
+            field=models.CharField(blank=True, default='', max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='ticket',
+            name='description',
+            field=models.TextField(validators=[django.core.validators.MaxLengthValidator(10000)]),
+        ),
+        migrations.CreateModel(
+            name='AuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('CREATED', 'Creato'), ('STATUS_CHANGED', 'Cambio stato'), ('COMMENT_ADDED', 'Nuovo commento'), ('ATTACHMENT_ADDED', 'Nuovi allegati'), ('ASSIGNED', 'Assegnato')], max_length=32)),
+                ('note', models.TextField(blank=True, default='')),
+                ('meta', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audits', to='tickets.ticket')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
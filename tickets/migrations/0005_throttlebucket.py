@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_ticket_sync_index_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('allowed', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        # niente WAL: i contatori sono volatili, scritture molto più economiche
+        migrations.RunSQL(
+            "ALTER TABLE tickets_throttlebucket SET UNLOGGED",
+            reverse_sql="ALTER TABLE tickets_throttlebucket SET LOGGED",
+        ),
+    ]
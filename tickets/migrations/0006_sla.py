@@ -0,0 +1,75 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_throttlebucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlaPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('priority', models.CharField(choices=[('LOW', 'Bassa'), ('MED', 'Media'), ('HIGH', 'Alta'), ('BLK', 'Bloccante')], max_length=4)),
+                ('response_minutes', models.PositiveIntegerField()),
+                ('resolve_minutes', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolve_breached_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolve_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='response_breached_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='response_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_paused_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action',
+            field=models.CharField(choices=[('CREATED', 'Creato'), ('STATUS_CHANGED', 'Cambio stato'), ('COMMENT_ADDED', 'Nuovo commento'), ('ATTACHMENT_ADDED', 'Nuovi allegati'), ('ASSIGNED', 'Assegnato'), ('SLA_BREACHED', 'SLA violato')], max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('response_breached_at__isnull', True), ('status', 'NEW')), fields=['response_due_at'], name='ticket_sla_response_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('resolve_breached_at__isnull', True), ('status__in', ['NEW', 'INP'])), fields=['resolve_due_at'], name='ticket_sla_resolve_idx'),
+        ),
+        migrations.AddField(
+            model_name='slapolicy',
+            name='department',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sla_policies', to='tickets.department'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='slapolicy',
+            unique_together={('department', 'priority')},
+        ),
+    ]
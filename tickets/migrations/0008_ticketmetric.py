@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_assignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_id', models.IntegerField(unique=True)),
+                ('category', models.CharField(blank=True, default='', max_length=100)),
+                ('week', models.DateField()),
+                ('created_at', models.DateTimeField()),
+                ('first_response_seconds', models.IntegerField(blank=True, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('resolution_seconds', models.IntegerField(blank=True, null=True)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='tickets.department')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['week', 'department', 'category'], name='ticketmetric_week_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_archivedticket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='compression',
+            field=models.CharField(blank=True, choices=[('', 'Nessuna'), ('gzip', 'gzip'), ('zstd', 'zstd')], default='', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='storage_tier',
+            field=models.CharField(choices=[('HOT', 'Hot'), ('COLD', 'Cold')], default='HOT', max_length=4),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='stored_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='tiered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='attachment',
+            index=models.Index(fields=['storage_tier', 'uploaded_at'], name='attachment_tier_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_attachment_tiers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=100)),
+                ('label', models.CharField(max_length=100)),
+                ('sort_order', models.PositiveSmallIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='categories', to='tickets.department')),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ['department', 'sort_order', 'id'],
+                'unique_together': {('department', 'code')},
+            },
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='category_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tickets', to='tickets.category'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+from django.db.models import Max, OuterRef, Subquery
+
+# Copia congelata di constants.py al momento della migrazione
+SEED = {
+    "ICT": [
+        ("HW", "Problemi Hardware"),
+        ("SW", "Problemi Software"),
+        ("BKW", "BKW"),
+        ("EUREKA", "Eureka"),
+        ("ACCOUNT", "Account utente"),
+        ("OTHER", "Altro"),
+    ],
+    "WH": [
+        ("DPI", "DPI"),
+        ("CONSUMABLES", "Materiali di consumo"),
+        ("OTHER", "Altro"),
+    ],
+    "SP": [
+        ("FERIE", "Ferie"),
+        ("PERMESSI", "Permessi"),
+        ("CAMBIO_TURNO", "Cambio turno"),
+        ("OTHER", "Permessi specifici (altro)"),
+    ],
+}
+
+BATCH_SIZE = 5000
+
+
+def seed_categories(apps, schema_editor):
+    Category = apps.get_model('tickets', 'Category')
+    Department = apps.get_model('tickets', 'Department')
+    Ticket = apps.get_model('tickets', 'Ticket')
+
+    for dep in Department.objects.all():
+        for order, (code, label) in enumerate(SEED.get(dep.code, [])):
+            Category.objects.get_or_create(department=dep, code=code,
+                                           defaults={'label': label, 'sort_order': order})
+
+    # codici storici fuori elenco: categoria disattivata, così anche quei ticket hanno la FK
+    known = set(Category.objects.values_list('department_id', 'code'))
+    legacy = (Ticket.objects.exclude(category__isnull=True).exclude(category='')
+              .values_list('department_id', 'category').distinct())
+    for dep_id, code in legacy:
+        if (dep_id, code) not in known:
+            Category.objects.create(department_id=dep_id, code=code, label=code, sort_order=999, is_active=False)
+
+
+def backfill(apps, schema_editor):
+    Category = apps.get_model('tickets', 'Category')
+    Ticket = apps.get_model('tickets', 'Ticket')
+
+    match = Category.objects.filter(department_id=OuterRef('department_id'), code=OuterRef('category'))
+    last_id = Ticket.objects.aggregate(m=Max('id'))['m'] or 0
+    # range di id sulla PK: ogni UPDATE è una transazione breve (migrazione non atomica)
+    for start in range(0, last_id, BATCH_SIZE):
+        (Ticket.objects
+         .filter(id__gt=start, id__lte=start + BATCH_SIZE, category_ref__isnull=True)
+         .exclude(category='')
+         .update(category_ref=Subquery(match.values('id')[:1])))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('tickets', '0011_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_categories, migrations.RunPython.noop),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
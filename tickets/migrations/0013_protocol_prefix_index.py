@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_backfill_category_ref'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedticket',
+            index=models.Index(fields=['protocol'], name='archived_protocol_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['protocol'], name='ticket_protocol_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
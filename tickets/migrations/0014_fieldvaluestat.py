@@ -0,0 +1,45 @@
+from django.db import migrations, models
+
+# Indice trigrammi per la ricerca per sottostringa (LIKE '%...%'), solo se pg_trgm è disponibile
+# sul server (contrib): senza, la tabella resta piccola e la ricerca per prefisso usa l'indice btree.
+TRGM_INDEX_SQL = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS fieldvalue_trgm_idx
+            ON tickets_fieldvaluestat USING gin (normalized gin_trgm_ops);
+    ELSE
+        RAISE NOTICE 'pg_trgm non disponibile: autocomplete senza indice trigrammi';
+    END IF;
+EXCEPTION WHEN insufficient_privilege THEN
+    RAISE NOTICE 'pg_trgm non installabile da questo utente: autocomplete senza indice trigrammi';
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0013_protocol_prefix_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldValueStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('location', 'Location'), ('asset_code', 'Asset')], max_length=20)),
+                ('normalized', models.CharField(max_length=120)),
+                ('value', models.CharField(max_length=120)),
+                ('uses', models.PositiveIntegerField(default=0)),
+                ('last_used_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='fieldvaluestat',
+            constraint=models.UniqueConstraint(fields=('field', 'normalized'), name='fieldvalue_unique_prefix', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.RunSQL(TRGM_INDEX_SQL, reverse_sql="DROP INDEX IF EXISTS fieldvalue_trgm_idx"),
+    ]
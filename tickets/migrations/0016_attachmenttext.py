@@ -0,0 +1,29 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0015_ticket_dup_bands'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentText',
+            fields=[
+                ('attachment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text', serialize=False, to='tickets.attachment')),
+                ('status', models.CharField(choices=[('OK', 'Estratto'), ('SKIP', 'Non estraibile'), ('ERR', 'Errore')], max_length=4)),
+                ('detail', models.CharField(blank=True, max_length=200)),
+                ('content', models.TextField(blank=True)),
+                ('search', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachment_texts', to='tickets.ticket')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['search'], name='attachmenttext_search_idx')],
+            },
+        ),
+    ]
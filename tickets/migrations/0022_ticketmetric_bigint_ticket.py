@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0021_cache_table'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticketmetric',
+            name='ticket_id',
+            field=models.BigIntegerField(unique=True),
+        ),
+    ]
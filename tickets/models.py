@@ -1,8 +1,15 @@
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.validators import MaxLengthValidator
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.urls import reverse
+
+from . import duplicates, taxonomy
 
 User = get_user_model()
 
@@ -18,6 +25,22 @@ class Department(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+class Category(models.Model):
+    """Categorie di ticket per reparto (gestite da admin); lette tramite la cache di tickets/taxonomy.py."""
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='categories')
+    code = models.CharField(max_length=100)  # valore salvato in Ticket.category (es. HW, OTHER)
+    label = models.CharField(max_length=100)
+    sort_order = models.PositiveSmallIntegerField(default=0)
+    is_active = models.BooleanField(default=True)  # disattivata: sparisce dai form, resta sui ticket esistenti
+
+    class Meta:
+        unique_together = ('department', 'code')
+        ordering = ['department', 'sort_order', 'id']
+        verbose_name_plural = 'categories'
+
+    def __str__(self):
+        return f"{self.department.code}/{self.code} - {self.label}"
+
 class Counter(models.Model):
     dept_code = models.CharField(max_length=3)
     iso_year = models.IntegerField()
@@ -76,6 +99,10 @@ class Ticket(models.Model):
     # categorizzazione generica (verrà pilotata da JS e validata lato server)
     category = models.CharField(max_length=100, blank=True, null=True, default="")
     category_other = models.CharField(max_length=100, blank=True, null=True, default="")
+    # FK intera (indicizzata) per i filtri; allineata a `category` in save() dalla cache tassonomia
+    category_ref = models.ForeignKey(Category, on_delete=models.PROTECT, null=True, blank=True, related_name='tickets')
+    # bande MinHash di titolo+descrizione (tickets/duplicates.py), ricalcolate in save()
+    dup_bands = ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
 
     department = models.ForeignKey(Department, on_delete=models.PROTECT, related_name='tickets')
     created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='created_tickets')
@@ -84,14 +111,42 @@ class Ticket(models.Model):
     location = models.CharField(max_length=120, blank=True)
     asset_code = models.CharField(max_length=60, blank=True)
 
+    # SLA (calcolati da tickets/sla.py; orologio fermo mentre il ticket è in WAI)
+    response_due_at = models.DateTimeField(null=True, blank=True)
+    resolve_due_at = models.DateTimeField(null=True, blank=True)
+    first_response_at = models.DateTimeField(null=True, blank=True)
+    sla_paused_at = models.DateTimeField(null=True, blank=True)
+    response_breached_at = models.DateTimeField(null=True, blank=True)
+    resolve_breached_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # concorrenza ottimistica: +1 a ogni modifica (claim_version), confrontata con quella letta dal client
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     class Meta:
         permissions = [
             ("view_all_tickets", "Può visualizzare tutti i ticket"),
             ("assign_tickets", "Può assegnare ticket"),
         ]
+        indexes = [
+            # sync incrementale API (changes?since=...): range scan su (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='ticket_updated_id_idx'),
+            # ricerca per protocollo parziale (LIKE 'ICT-2025-07-%'): l'indice unique non basta con collation non-C
+            models.Index(fields=['protocol'], name='ticket_protocol_prefix_idx', opclasses=['varchar_pattern_ops']),
+            # duplicati: overlap (&&) sulle bande MinHash dei soli ticket aperti
+            GinIndex(fields=['dup_bands'], name='ticket_dup_bands_idx',
+                     condition=models.Q(status__in=['NEW', 'INP', 'WAI'])),
+            # scanner SLA: indici parziali sui soli ticket ancora "in corsa"
+            models.Index(
+                fields=['response_due_at'], name='ticket_sla_response_idx',
+                condition=models.Q(status='NEW', response_breached_at__isnull=True),
+            ),
+            models.Index(
+                fields=['resolve_due_at'], name='ticket_sla_resolve_idx',
+                condition=models.Q(status__in=['NEW', 'INP'], resolve_breached_at__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.protocol or '(no-proto)'} - {self.title[:40]}"
@@ -115,11 +170,173 @@ class Ticket(models.Model):
             number = f"{counter.last_number:04d}"
         return f"{dept_code}-{iso_year}-{iso_week:02d}-{number}"
 
+    def claim_version(self, expected=None):
+        """
+        UPDATE ... SET version = version + 1 WHERE id = … [AND version = expected]: da chiamare
+        dentro la transazione della modifica, prima del save() (che deve includere 'version').
+        False se la riga è cambiata dopo la lettura del client; la riga resta bloccata fino al commit,
+        quindi due modifiche con la stessa versione non passano entrambe.
+        """
+        sql = f'UPDATE {self._meta.db_table} SET version = version + 1 WHERE id = %s'
+        params = [self.pk]
+        if expected is not None:
+            sql += ' AND version = %s'
+            params.append(expected)
+        with connection.cursor() as cur:
+            cur.execute(sql + ' RETURNING version', params)
+            row = cur.fetchone()
+        if row is None:
+            return False
+        self.version = row[0]
+        return True
+
     def save(self, *args, **kwargs):
         if not self.protocol and self.department_id:
             self.protocol = self.generate_protocol(self.department.code)
+        if self.department_id:
+            self.category_ref_id = taxonomy.category_id(self.department_id, self.category)
+        self.dup_bands = duplicates.bands_for(self.title, self.description)
         super().save(*args, **kwargs)
 
+class SlaPolicy(models.Model):
+    """Matrice SLA per reparto e priorità (minuti di calendario)."""
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='sla_policies')
+    priority = models.CharField(max_length=4, choices=Ticket.PRIORITY_CHOICES)
+    response_minutes = models.PositiveIntegerField()
+    resolve_minutes = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('department', 'priority')
+
+    def __str__(self):
+        return f"{self.department.code}/{self.priority}: {self.response_minutes}m / {self.resolve_minutes}m"
+
+class AssignmentRule(models.Model):
+    """Operatori idonei all'assegnazione automatica per reparto (e categoria; vuota = tutte)."""
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='assignment_rules')
+    category = models.CharField(max_length=100, blank=True, default="")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='assignment_rules')
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ('department', 'category', 'user')
+
+    def __str__(self):
+        return f"{self.department.code}/{self.category or '*'} → {self.user}"
+
+class OperatorLoad(models.Model):
+    """Ticket aperti assegnati a ciascun operatore, mantenuto in modo incrementale (tickets/assignment.py)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='ticket_load')
+    open_tickets = models.IntegerField(default=0)
+    last_assigned_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['open_tickets', 'last_assigned_at'], name='operatorload_pick_idx')]
+
+    def __str__(self):
+        return f"{self.user}: {self.open_tickets}"
+
+class FieldValueStat(models.Model):
+    """Valori distinti di location/asset_code con numero di utilizzi, per l'autocomplete (tickets/suggest.py)."""
+    FIELD_CHOICES = [
+        ('location', 'Location'),
+        ('asset_code', 'Asset'),
+    ]
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    normalized = models.CharField(max_length=120)  # minuscolo, spazi compattati: chiave di deduplica e ricerca
+    value = models.CharField(max_length=120)  # grafia proposta
+    uses = models.PositiveIntegerField(default=0)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # pattern_ops: lo stesso indice serve l'UPSERT e la ricerca per prefisso (LIKE 'uff%')
+            models.UniqueConstraint(fields=['field', 'normalized'], name='fieldvalue_unique_prefix',
+                                    opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return f"{self.field}: {self.value} ({self.uses})"
+
+class WebhookSubscription(models.Model):
+    """Sistema esterno che riceve gli eventi dei ticket via HTTP POST firmato (tickets/webhooks.py)."""
+    EVENT_CHOICES = [
+        ('ticket.created', 'Ticket creato'),
+        ('ticket.status_changed', 'Cambio stato'),
+        ('ticket.assigned', 'Assegnazione'),
+    ]
+    name = models.CharField(max_length=100)
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=200, help_text="Chiave HMAC-SHA256 per la firma dei payload")
+    events = models.JSONField(default=list, blank=True, help_text='Es. ["ticket.created"]; vuoto = tutti')
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True,
+                                   help_text="Vuoto = tutti i reparti")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} → {self.url}"
+
+class WebhookDelivery(models.Model):
+    """Outbox: un evento per sottoscrittore, scritto nella transazione del cambiamento, inviato dal worker."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Da inviare'),
+        ('SENT', 'Inviato'),
+        ('FAILED', 'Fallito'),  # tentativi esauriti
+    ]
+    subscription = models.ForeignKey(WebhookSubscription, on_delete=models.CASCADE, related_name='deliveries')
+    event = models.CharField(max_length=40)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.CharField(max_length=300, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # coda del worker: solo le consegne ancora da fare
+            models.Index(fields=['next_attempt_at', 'id'], name='webhook_pending_idx',
+                         condition=models.Q(status='PENDING')),
+        ]
+
+    def __str__(self):
+        return f"{self.event} #{self.pk} → {self.subscription_id} ({self.status})"
+
+class TicketTombstone(models.Model):
+    """Traccia dei ticket cancellati, per la sync incrementale dei client API."""
+    ticket_id = models.BigIntegerField(db_index=True)
+    protocol = models.CharField(max_length=32)
+    owner_id = models.BigIntegerField(null=True, blank=True)  # created_by del ticket (visibilità operatori)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.protocol} (cancellato {self.deleted_at:%Y-%m-%d %H:%M})"
+
+class ArchivedTicket(models.Model):
+    """
+    Ticket chiuso spostato fuori dalle tabelle "calde" (manage.py archive_closed_tickets).
+    `document` contiene ticket, commenti, audit e metadati allegati così come erano.
+    """
+    ticket_id = models.BigIntegerField(unique=True)
+    protocol = models.CharField(max_length=32, unique=True)
+    title = models.CharField(max_length=120)
+    department_code = models.CharField(max_length=3, db_index=True)
+    created_by_id = models.BigIntegerField(null=True, blank=True)  # visibilità per l'autore
+    created_at = models.DateTimeField()
+    closed_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    document = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['protocol'], name='archived_protocol_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return f"{self.protocol} (archiviato {self.archived_at:%Y-%m-%d})"
+
 class Comment(models.Model):
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.PROTECT)
@@ -127,10 +344,28 @@ class Comment(models.Model):
     is_internal = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # API commenti: paginazione keyset su (created_at, id) dentro il ticket
+            models.Index(fields=['ticket', 'created_at', 'id'], name='comment_ticket_created_idx'),
+            # snapshot incrementali (tickets/snapshots.py)
+            models.Index(fields=['created_at', 'id'], name='comment_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.author} on {self.ticket.protocol}"
 
 class Attachment(models.Model):
+    TIER_CHOICES = [
+        ('HOT', 'Hot'),
+        ('COLD', 'Cold'),  # valutato dal lifecycle (tickets/storage_tiers.py), eventualmente compresso
+    ]
+    COMPRESSION_CHOICES = [
+        ('', 'Nessuna'),
+        ('gzip', 'gzip'),
+        ('zstd', 'zstd'),
+    ]
+
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='attachments')
     file = models.FileField(upload_to='attachments/%Y/%m/%d/')
     original_name = models.CharField(max_length=255)
@@ -139,9 +374,44 @@ class Attachment(models.Model):
     uploaded_by = models.ForeignKey(User, on_delete=models.PROTECT)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    storage_tier = models.CharField(max_length=4, choices=TIER_CHOICES, default='HOT')
+    compression = models.CharField(max_length=8, choices=COMPRESSION_CHOICES, blank=True, default='')
+    stored_size = models.PositiveIntegerField(null=True, blank=True)  # byte su disco, se diverso da size
+    tiered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['storage_tier', 'uploaded_at'], name='attachment_tier_idx')]
+
     def __str__(self):
         return f"{self.original_name} ({self.size} B)"
 
+    def download_url(self):
+        # i file compressi passano dalla view che decomprime in streaming
+        if self.compression:
+            return reverse('attachment_download', args=[self.pk])
+        return self.file.url
+
+class AttachmentText(models.Model):
+    """Testo estratto da un allegato (manage.py extract_attachment_text), cercabile dalla dashboard."""
+    STATUS_CHOICES = [
+        ('OK', 'Estratto'),
+        ('SKIP', 'Non estraibile'),  # tipo non supportato, troppo grande, libreria mancante
+        ('ERR', 'Errore'),  # file illeggibile o tempo scaduto: ritentabile con --retry-errors
+    ]
+    attachment = models.OneToOneField(Attachment, on_delete=models.CASCADE, primary_key=True, related_name='text')
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='attachment_texts')
+    status = models.CharField(max_length=4, choices=STATUS_CHOICES)
+    detail = models.CharField(max_length=200, blank=True)
+    content = models.TextField(blank=True)
+    search = SearchVectorField(null=True, editable=False)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [GinIndex(fields=['search'], name='attachmenttext_search_idx')]
+
+    def __str__(self):
+        return f"{self.attachment_id}: {self.status} ({len(self.content)} caratteri)"
+
 class AuditLog(models.Model):
     class Action(models.TextChoices):
         CREATED = "CREATED", "Creato"
@@ -149,6 +419,7 @@ class AuditLog(models.Model):
         COMMENT_ADDED = "COMMENT_ADDED", "Nuovo commento"
         ATTACHMENT_ADDED = "ATTACHMENT_ADDED", "Nuovi allegati"
         ASSIGNED = "ASSIGNED", "Assegnato"
+        SLA_BREACHED = "SLA_BREACHED", "SLA violato"
 
     ticket = models.ForeignKey('Ticket', related_name='audits', on_delete=models.CASCADE)
     action = models.CharField(max_length=32, choices=Action.choices)
@@ -159,7 +430,67 @@ class AuditLog(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # snapshot incrementali (tickets/snapshots.py)
+            models.Index(fields=['created_at', 'id'], name='auditlog_created_id_idx'),
+        ]
 
     def __str__(self):
         who = self.actor.username if self.actor else "system"
         return f"[{self.created_at:%Y-%m-%d %H:%M}] {self.action} by {who}"
+
+class ThrottleBucket(models.Model):
+    """Token bucket del rate limit API, condiviso da tutti i worker/host (tabella UNLOGGED)."""
+    key = models.CharField(max_length=200, primary_key=True)
+    tokens = models.FloatField()
+    allowed = models.BooleanField(default=True)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f}"
+
+class TicketMetric(models.Model):
+    """
+    Tempi di presa in carico / risoluzione per ticket, aggiornati a ogni cambio stato
+    (tickets/analytics.py). I report leggono solo questa tabella, mai l'audit.
+    """
+    ticket_id = models.BigIntegerField(unique=True)  # niente FK: la riga sopravvive all'archiviazione del ticket
+    department = models.ForeignKey(Department, on_delete=models.PROTECT, related_name='+')
+    category = models.CharField(max_length=100, blank=True, default="")
+    week = models.DateField()  # lunedì della settimana di apertura
+    created_at = models.DateTimeField()
+    first_response_seconds = models.IntegerField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    resolution_seconds = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['week', 'department', 'category'], name='ticketmetric_week_idx')]
+
+    def __str__(self):
+        return f"#{self.ticket_id} {self.week:%Y-%m-%d}"
+
+class SnapshotWatermark(models.Model):
+    """Ultima riga esportata per stream e reparto (manage.py export_snapshots, tickets/snapshots.py)."""
+    STREAM_CHOICES = [
+        ('tickets', 'Ticket'),
+        ('comments', 'Commenti'),
+        ('audits', 'Audit'),
+        ('tombstones', 'Ticket cancellati'),
+    ]
+
+    stream = models.CharField(max_length=12, choices=STREAM_CHOICES)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='+')  # vuoto per gli stream globali (tombstones)
+    last_ts = models.DateTimeField(null=True, blank=True)
+    last_id = models.BigIntegerField(default=0)
+    run_id = models.CharField(max_length=40, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stream', 'department'], name='snapshot_watermark_uniq',
+                                    nulls_distinct=False),
+        ]
+
+    def __str__(self):
+        return f"{self.stream}/{self.department_id or '-'}: {self.last_ts} #{self.last_id}"
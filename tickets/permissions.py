@@ -3,7 +3,12 @@ from rest_framework.permissions import BasePermission, SAFE_METHODS
 ADMIN_GROUPS = {'Admin', 'SuperUser', 'Coordinatore'}
 
 def is_staffish(user):
-    return user.is_superuser or user.groups.filter(name__in=ADMIN_GROUPS).exists()
+    # memorizzato sull'oggetto utente: request.user è nuovo a ogni richiesta (anche quello del token, copiato)
+    cached = getattr(user, '_ati_staffish', None)
+    if cached is None:
+        cached = bool(user.is_superuser or user.groups.filter(name__in=ADMIN_GROUPS).exists())
+        user._ati_staffish = cached
+    return cached
 
 class TicketPermissions(BasePermission):
     """
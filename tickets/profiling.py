@@ -0,0 +1,224 @@
+# tickets/profiling.py
+"""
+Profilazione delle richieste lente (PROFILING_ENABLED).
+
+- Ogni richiesta registra tempo totale e SQL eseguito (testo, alias, durata) con un
+  `execute_wrapper` sulle connessioni: costo trascurabile, nessun dato se non serve.
+- Richieste con header PROFILING_HEADER (solo staff, cioè `is_staffish`): cProfile completo.
+- Richieste oltre PROFILING_SLOW_MS: un thread campionatore registra lo stack del
+  thread della richiesta ogni PROFILING_SAMPLE_INTERVAL_MS, a partire dalla soglia
+  (le richieste veloci non vengono mai campionate).
+- Le richieste catturate finiscono in PROFILING_DIR: `.json` (SQL, tempi, stack più
+  frequenti), `.folded` (stack per flamegraph) e, se profilate, `.prof` (pstats/snakeviz).
+- Header `Server-Timing` (db, app, totale) per lo staff, visibile nei devtools. `is_staffish` si
+  valuta solo se c'è l'header o dopo la risposta (di solito già calcolato dalla view: nessuna query in più).
+"""
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .permissions import is_staffish
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERIES = 2000      # oltre, si contano ma non si conservano
+SQL_CHARS = 2000
+STACK_DEPTH = 80
+TOP_STACKS = 30
+_SLUG_RE = re.compile(r'[^A-Za-z0-9]+')
+
+
+class Capture:
+    """Dati raccolti durante una richiesta."""
+
+    def __init__(self, thread_id, profile):
+        self.thread_id = thread_id
+        self.start = time.perf_counter()
+        self.profile = profile
+        self.queries = []
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.stacks = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: tempo di ogni statement, anche se fallisce
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.query_count += 1
+            self.db_seconds += duration
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    'alias': context['connection'].alias,
+                    'ms': round(duration * 1000, 3),
+                    'many': many,
+                    'sql': sql[:SQL_CHARS],
+                })
+
+
+class StackSampler:
+    """Un solo thread per processo: campiona solo le richieste già oltre la soglia."""
+
+    def __init__(self, interval, threshold):
+        self.interval = interval
+        self.threshold = threshold
+        self.active = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def _ensure_running(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='request-stack-sampler', daemon=True)
+            self.thread.start()
+
+    def add(self, capture):
+        with self.lock:
+            self.active[capture.thread_id] = capture
+            self._ensure_running()
+
+    def remove(self, capture):
+        with self.lock:
+            self.active.pop(capture.thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            with self.lock:
+                due = [c for c in self.active.values() if now - c.start >= self.threshold]
+            if not due:
+                continue
+            frames = sys._current_frames()
+            for capture in due:
+                frame = frames.get(capture.thread_id)
+                if frame is not None:
+                    capture.stacks[_folded(frame)] += 1
+
+
+def _folded(frame):
+    parts = []
+    while frame is not None and len(parts) < STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+def server_timing(capture, total):
+    db_ms = capture.db_seconds * 1000
+    return ', '.join([
+        f'db;dur={db_ms:.1f};desc="{capture.query_count} query"',
+        f'app;dur={max(total * 1000 - db_ms, 0):.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ])
+
+
+def write_report(request, response, capture, total, reason):
+    """Scrive i file della richiesta catturata; ritorna il percorso base (senza estensione)."""
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    now = timezone.now()
+    slug = _SLUG_RE.sub('-', request.path).strip('-')[:60] or 'root'
+    base = os.path.join(directory, f"{now:%Y%m%d-%H%M%S}-{now.microsecond:06d}-{request.method}-{slug}-{int(total * 1000)}ms")
+
+    repeated = Counter(q['sql'] for q in capture.queries)
+    report = {
+        'path': request.get_full_path(),
+        'method': request.method,
+        'status': response.status_code,
+        'user': getattr(getattr(request, 'user', None), 'username', None),
+        'reason': reason,
+        'at': now.isoformat(),
+        'total_ms': round(total * 1000, 1),
+        'db_ms': round(capture.db_seconds * 1000, 1),
+        'query_count': capture.query_count,
+        # stesso SQL eseguito più volte: tipico N+1
+        'repeated_sql': [{'count': n, 'sql': sql} for sql, n in repeated.most_common(10) if n > 1],
+        'queries': capture.queries,
+        'stack_samples': sum(capture.stacks.values()),
+        'top_stacks': [{'samples': n, 'stack': s.split(';')[-15:]} for s, n in capture.stacks.most_common(TOP_STACKS)],
+    }
+    with open(base + '.json', 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=1)
+    if capture.stacks:
+        with open(base + '.folded', 'w', encoding='utf-8') as fh:
+            fh.writelines(f"{stack} {n}\n" for stack, n in capture.stacks.items())
+    if capture.profile is not None:
+        capture.profile.dump_stats(base + '.prof')
+    _prune(directory)
+    return base
+
+
+def _prune(directory):
+    keep = settings.PROFILING_KEEP_FILES
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return
+    if len(names) > keep * 2:  # nomi con timestamp: i primi sono i più vecchi
+        for name in names[:len(names) - keep]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+class RequestProfilingMiddleware:
+    """Da mettere dopo AuthenticationMiddleware. Inattivo se PROFILING_ENABLED è False."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', False)
+        self.threshold = settings.PROFILING_SLOW_MS / 1000
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace('-', '_')
+        self.sampler = StackSampler(settings.PROFILING_SAMPLE_INTERVAL_MS / 1000, self.threshold)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        user = getattr(request, 'user', None)
+        authenticated = bool(user is not None and user.is_authenticated)
+        forced = authenticated and bool(request.META.get(self.header)) and is_staffish(user)
+        capture = Capture(threading.get_ident(), cProfile.Profile() if forced else None)
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(capture))
+            if forced:
+                capture.profile.enable()
+            else:
+                self.sampler.add(capture)
+            try:
+                response = self.get_response(request)
+            finally:
+                if forced:
+                    capture.profile.disable()
+                else:
+                    self.sampler.remove(capture)
+        total = time.perf_counter() - capture.start
+
+        if forced or total >= self.threshold:
+            try:
+                base = write_report(request, response, capture, total, 'header' if forced else 'slow')
+                logger.warning("Richiesta %s %s: %.0f ms, %s query (%.0f ms) → %s.json",
+                               request.method, request.path, total * 1000, capture.query_count,
+                               capture.db_seconds * 1000, base)
+            except OSError:
+                logger.exception("Profilo della richiesta non salvato")
+        if authenticated and is_staffish(user):
+            response['Server-Timing'] = server_timing(capture, total)
+        return response
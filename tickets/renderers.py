@@ -0,0 +1,30 @@
+# tickets/renderers.py
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # dipendenza opzionale: senza orjson si usa il JSONRenderer standard
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer con orjson (attivo con API_FAST_JSON=True).
+    Produce gli stessi byte del renderer DRF in modalità compatta/unicode;
+    per l'output indentato (browsable API, ?indent) ricade su quello standard.
+    """
+    _default = encoders.JSONEncoder().default
+    _options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self._default, option=self._options)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # come JSONRenderer: U+2028/U+2029 sempre escapati
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
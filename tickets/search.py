@@ -0,0 +1,53 @@
+# tickets/search.py
+"""
+Ricerca per protocollo (es. ICT-2025-07-0012).
+
+Il testo del box di ricerca viene riconosciuto come protocollo completo o parziale
+(reparto, reparto-anno, reparto-anno-settimana, ...): in quel caso si interroga solo
+`protocol`, con uguaglianza sull'indice unique o con LIKE 'prefisso%' sull'indice
+varchar_pattern_ops, invece del LIKE '%...%' su titolo/descrizione.
+"""
+import re
+from collections import namedtuple
+
+from . import taxonomy
+
+ProtocolQuery = namedtuple('ProtocolQuery', 'prefix exact')
+
+# REPARTO-AAAA-SS-NNNN, ogni parte dopo il reparto è opzionale (trattino finale ammesso)
+PROTOCOL_RE = re.compile(
+    r'^(?P<dep>[A-Za-z]+)-(?:(?P<year>\d{4})(?:-(?P<week>\d{1,2})(?:-(?P<num>\d{1,4}))?)?)?(?P<dash>-?)$'
+)
+NUMBER_DIGITS = 4
+
+
+def parse_protocol(text):
+    """ProtocolQuery (prefix sempre valorizzato, exact solo se completo) o None se non è un protocollo."""
+    m = PROTOCOL_RE.match((text or '').strip())
+    if not m:
+        return None
+    dep_id = taxonomy.department_id(m['dep'])
+    if dep_id is None:
+        return None  # "HP-LaserJet" e simili restano ricerca testuale
+
+    parts = [taxonomy.dep_code_by_id()[dep_id]]
+    if m['year']:
+        parts.append(m['year'])
+    week = m['week']
+    if week:
+        # "7-…" è sicuramente la settimana 07; "1" da sola può essere l'inizio di 1x
+        complete_week = len(week) == 2 or m['num'] is not None or m['dash']
+        parts.append(week.zfill(2) if complete_week else week)
+        if not complete_week:
+            return ProtocolQuery(prefix='-'.join(parts), exact=None)
+    if m['num']:
+        # numero progressivo sempre a 4 cifre: "…-12" è "…-0012"
+        exact = '-'.join(parts + [m['num'].zfill(NUMBER_DIGITS)])
+        return ProtocolQuery(prefix=exact, exact=exact)
+    return ProtocolQuery(prefix='-'.join(parts) + '-', exact=None)
+
+
+def filter_protocol(qs, proto, field='protocol'):
+    if proto.exact:
+        return qs.filter(**{field: proto.exact})
+    return qs.filter(**{f'{field}__startswith': proto.prefix})
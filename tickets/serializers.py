@@ -9,18 +9,27 @@ class DepartmentSerializer(serializers.ModelSerializer):
         model = Department
         fields = ['id', 'code', 'name']
 
-class TicketSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """Sparse fieldsets: `fields=['id', 'status']` limita i campi serializzati."""
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class TicketSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     department = serializers.PrimaryKeyRelatedField(queryset=Department.objects.all())
 
     class Meta:
         model = Ticket
-        read_only_fields = ['id', 'protocol', 'status', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'protocol', 'status', 'created_at', 'updated_at', 'version']
         fields = [
             'id', 'protocol', 'title', 'description',
             'status', 'priority', 'impact', 'urgency', 'source_channel',
             'department', 'created_by', 'assignee',
             'location', 'asset_code',
-            'created_at', 'updated_at',
+            'created_at', 'updated_at', 'version',
         ]
         extra_kwargs = {
             'created_by': {'read_only': True},
@@ -33,7 +42,10 @@ class TicketSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 class CommentSerializer(serializers.ModelSerializer):
+    # autore dalla select_related della view (nessuna query per riga)
+    author_username = serializers.CharField(source='author.username', read_only=True)
+
     class Meta:
         model = Comment
-        read_only_fields = ['id', 'created_at']
-        fields = ['id', 'ticket', 'author', 'body', 'is_internal', 'created_at']
+        read_only_fields = ['id', 'ticket', 'author', 'created_at']
+        fields = ['id', 'ticket', 'author', 'author_username', 'body', 'is_internal', 'created_at']
@@ -1,16 +1,148 @@
 from django.db import transaction
-from .models import Ticket
-from .emails import send_new_ticket_notification
-from .audit import log_created
+from django.db.models import F
+from django.utils import timezone
+from .models import Comment, Ticket
+from .emails import (
+    send_new_ticket_notification, send_ticket_status_changed, send_new_public_comments,
+    send_bulk_status_changed, send_bulk_assigned,
+)
+from .audit import (
+    log_assigned, log_comments, log_created, log_status_change,
+    log_bulk_status_change, log_bulk_assigned,
+)
+from . import analytics, assignment, events, sla, suggest
+
+class TicketConflict(Exception):
+    """Il ticket è stato modificato da altri dopo che il client l'ha letto (versione diversa)."""
+
+    def __init__(self, ticket):
+        super().__init__(f"Ticket {ticket.pk} modificato da un'altra richiesta")
+        self.ticket = ticket
 
 @transaction.atomic
 def create_ticket_with_notification(**kwargs) -> Ticket:
-    ticket = Ticket.objects.create(**kwargs)
+    ticket = Ticket(**kwargs)
+    sla.apply_on_create(ticket)
+    ticket.save(force_insert=True)
 
     # Audit: registra la creazione (actor = created_by se presente)
     actor = kwargs.get('created_by')
     log_created(ticket, actor)
+    analytics.record_created(ticket)
+    suggest.record_ticket_values(ticket)
+
+    # Assegnazione: esplicita (API) → aggiorna il carico; altrimenti automatica
+    if ticket.assignee_id:
+        assignment.adjust_load(ticket.assignee_id, +1, assigned_at=ticket.created_at)
+    else:
+        assignment.auto_assign(ticket)
+
+    # Notifica di nuovo ticket (dopo il commit: niente SMTP dentro la transazione)
+    transaction.on_commit(lambda: send_new_ticket_notification(ticket))
+
+    # Dashboard live (inviato dopo il commit)
+    events.publish_ticket_event('ticket_created', ticket)
+    return ticket
+
+@transaction.atomic
+def change_ticket_status(ticket, new_status, actor, expected_version=None) -> Ticket:
+    """
+    Cambio stato di un singolo ticket: salva, notifica, audit, evento live.
+    Con `expected_version` (versione vista dall'utente) solleva TicketConflict se nel frattempo è cambiato.
+    """
+    if not ticket.claim_version(expected_version):
+        raise TicketConflict(ticket)
+    old_status, old_status_display = ticket.status, ticket.get_status_display()
+    sla_fields = sla.on_status_change(ticket, old_status, new_status)
+    ticket.status = new_status
+    ticket.save(update_fields=['status', 'updated_at', 'version', *sla_fields])
+    assignment.on_status_change(ticket, old_status, new_status)
+    analytics.record_status_changes([(ticket, old_status)])
+
+    # Email di notifica (dopo il commit, a lock rilasciato)
+    transaction.on_commit(lambda: send_ticket_status_changed(ticket, old_status_display, actor=actor))
+
+    # Audit
+    log_status_change(ticket, actor, old_status_display, ticket.get_status_display(),
+                      old_code=old_status, new_code=new_status)
+
+    events.publish_ticket_event('status_changed', ticket)
+    return ticket
 
-    # Notifica di nuovo ticket
-    send_new_ticket_notification(ticket)
+@transaction.atomic
+def record_reassignment(ticket, old_assignee_id, actor) -> Ticket:
+    """Da chiamare dopo aver salvato un nuovo assegnatario: carico operatori + audit."""
+    if ticket.assignee_id == old_assignee_id:
+        return ticket
+    assignment.on_reassign(ticket, old_assignee_id, ticket.assignee_id)
+    if ticket.assignee_id:
+        log_assigned(ticket, actor, ticket.assignee)
     return ticket
+
+
+@transaction.atomic
+def add_comments(ticket, author, items) -> list:
+    """
+    Uno o più commenti ({'body', 'is_internal'}): un INSERT, un INSERT di audit,
+    una sola email per i commenti pubblici.
+    """
+    comments = Comment.objects.bulk_create([
+        Comment(ticket=ticket, author=author, body=item['body'], is_internal=bool(item.get('is_internal')))
+        for item in items
+    ])
+    log_comments(ticket, author, comments)
+    transaction.on_commit(lambda: send_new_public_comments(ticket, comments))
+    return comments
+
+
+def _lock_for_bulk(ticket_ids):
+    # righe bloccate fino al commit: nessun cambio concorrente tra lettura del vecchio stato e UPDATE
+    return (Ticket.objects
+            .select_for_update(of=('self',))
+            .select_related('department', 'created_by', 'assignee')
+            .filter(pk__in=ticket_ids)
+            .order_by('pk'))
+
+@transaction.atomic
+def bulk_change_status(ticket_ids, new_status, actor) -> int:
+    """
+    Cambio stato massivo: un UPDATE (SLA inclusi), un INSERT di audit,
+    una email per destinatario (dopo il commit). Ritorna il numero di ticket modificati.
+    """
+    tickets = list(_lock_for_bulk(ticket_ids).exclude(status=new_status))
+    if not tickets:
+        return 0
+    now = timezone.now()
+    old = {t.pk: (t.status, t.get_status_display()) for t in tickets}
+    Ticket.objects.filter(pk__in=old).update(
+        status=new_status, updated_at=now, version=F('version') + 1, **sla.bulk_status_updates(new_status, now),
+    )
+    for t in tickets:
+        t.status, t.updated_at, t.version = new_status, now, t.version + 1
+
+    assignment.on_bulk_status_change([(t.assignee_id, old[t.pk][0]) for t in tickets], new_status)
+    analytics.record_status_changes([(t, old[t.pk][0]) for t in tickets], when=now)
+    log_bulk_status_change(tickets, actor, old)
+    old_displays = {pk: display for pk, (_code, display) in old.items()}
+    # email dopo il commit: l'SMTP non deve tenere i lock delle righe
+    transaction.on_commit(lambda: send_bulk_status_changed(tickets, old_displays, actor))
+    events.publish_ticket_events('status_changed', tickets)
+    return len(tickets)
+
+@transaction.atomic
+def bulk_assign(ticket_ids, assignee, actor) -> int:
+    """Assegnazione massiva: un UPDATE, un INSERT di audit, una email per destinatario."""
+    tickets = list(_lock_for_bulk(ticket_ids).exclude(assignee=assignee))
+    if not tickets:
+        return 0
+    now = timezone.now()
+    Ticket.objects.filter(pk__in=[t.pk for t in tickets]).update(
+        assignee=assignee, updated_at=now, version=F('version') + 1,
+    )
+
+    assignment.on_bulk_reassign([(t.assignee_id, t.status) for t in tickets], assignee.pk)
+    for t in tickets:
+        t.assignee, t.updated_at, t.version = assignee, now, t.version + 1
+    log_bulk_assigned(tickets, actor, assignee)
+    transaction.on_commit(lambda: send_bulk_assigned(tickets, assignee, actor))
+    return len(tickets)
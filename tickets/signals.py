@@ -0,0 +1,83 @@
+# tickets/signals.py
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import assignment, authentication, taxonomy, webhooks
+from .models import AssignmentRule, Category, Department, Ticket, TicketTombstone, WebhookSubscription
+
+
+@receiver([post_save, post_delete], sender=Department)
+@receiver([post_save, post_delete], sender=Category)
+def department_changed(sender, **kwargs):
+    # dopo il commit: invalidando prima, un'altra richiesta ricaricherebbe la tassonomia vecchia
+    transaction.on_commit(taxonomy.invalidate)
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    TicketTombstone.objects.create(
+        ticket_id=instance.pk,
+        protocol=instance.protocol,
+        owner_id=instance.created_by_id,
+    )
+    if instance.assignee_id and instance.status in assignment.OPEN_STATUSES:
+        assignment.adjust_load(instance.assignee_id, -1)
+
+
+@receiver(post_save, sender=AssignmentRule)
+def assignment_rule_saved(sender, instance, **kwargs):
+    # l'operatore diventa candidabile: serve la sua riga di carico
+    assignment.ensure_load(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=WebhookSubscription)
+def webhook_subscription_changed(sender, **kwargs):
+    transaction.on_commit(webhooks.invalidate_subscriptions)
+
+
+@receiver(post_save, sender=WebhookSubscription)
+def webhook_subscription_saved(sender, instance, **kwargs):
+    # disattivata: le consegne in coda non partirebbero mai, falliscono nella stessa transazione
+    if not instance.is_active:
+        webhooks.fail_inactive(instance.pk)
+
+
+# --- Revoca immediata dei token in cache (CachedTokenAuthentication) ---
+# Sempre dopo il commit, altrimenti una richiesta concorrente rimette in cache i dati vecchi.
+# Valori letti subito: dopo un delete instance.pk è già None quando gira la callback.
+@receiver([post_save, post_delete], sender=Token)
+def token_changed(sender, instance, created=False, **kwargs):
+    if not created:  # un token nuovo non è in cache da nessuna parte
+        key, user_id = instance.key, instance.user_id
+        transaction.on_commit(lambda: authentication.evict_token(key, user_id))
+
+
+@receiver(post_save, sender=get_user_model())
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # is_active, is_superuser, password...; il login salva solo last_login e non cambia i permessi
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: authentication.evict_user(user_id))
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set=None, **kwargs):
+    # i gruppi decidono is_staffish (Admin/SuperUser/Coordinatore)
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set:
+        user_ids = list(pk_set)  # group.user_set.add/remove
+    else:
+        transaction.on_commit(authentication.evict_all)  # group.user_set.clear(): utenti non noti
+        return
+
+    def evict():
+        for user_id in user_ids:
+            authentication.evict_user(user_id)
+    transaction.on_commit(evict)
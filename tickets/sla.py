@@ -0,0 +1,128 @@
+# tickets/sla.py
+"""
+Calcolo SLA dei ticket.
+
+- Scadenze da SlaPolicy (reparto × priorità) o, in mancanza, da settings.TICKET_SLA_DEFAULTS.
+- Presa in carico: il ticket esce da NEW. Risoluzione: il ticket arriva in RES/CLO.
+- In WAI (attesa utente) l'orologio si ferma: all'uscita le scadenze slittano
+  della durata della pausa.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, DateTimeField, DurationField, ExpressionWrapper, F, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import SlaPolicy
+
+PAUSED_STATUS = 'WAI'
+RESPONSE_PENDING_STATUS = 'NEW'
+RUNNING_STATUSES = ('NEW', 'INP')   # stati in cui l'orologio di risoluzione corre
+
+
+def policy_minutes(department_id, priority):
+    """(minuti presa in carico, minuti risoluzione) oppure None se non configurato."""
+    row = (SlaPolicy.objects
+           .filter(department_id=department_id, priority=priority)
+           .values_list('response_minutes', 'resolve_minutes')
+           .first())
+    if row:
+        return row
+    default = getattr(settings, 'TICKET_SLA_DEFAULTS', {}).get(priority)
+    return tuple(default) if default else None
+
+
+def apply_on_create(ticket, now=None):
+    """Imposta le scadenze su un ticket non ancora salvato."""
+    minutes = policy_minutes(ticket.department_id, ticket.priority)
+    if not minutes:
+        return
+    now = now or timezone.now()
+    ticket.response_due_at = now + timedelta(minutes=minutes[0])
+    ticket.resolve_due_at = now + timedelta(minutes=minutes[1])
+
+
+def on_status_change(ticket, old_status, new_status, now=None):
+    """
+    Aggiorna i campi SLA in memoria per il passaggio old → new.
+    Ritorna la lista dei campi modificati (da aggiungere a update_fields).
+    """
+    if old_status == new_status:
+        return []
+    now = now or timezone.now()
+    changed = []
+
+    # presa in carico: prima uscita da NEW
+    if old_status == RESPONSE_PENDING_STATUS and ticket.first_response_at is None:
+        ticket.first_response_at = now
+        changed.append('first_response_at')
+
+    # pausa in WAI
+    if new_status == PAUSED_STATUS and ticket.sla_paused_at is None:
+        ticket.sla_paused_at = now
+        changed.append('sla_paused_at')
+    elif old_status == PAUSED_STATUS and ticket.sla_paused_at is not None:
+        paused = now - ticket.sla_paused_at
+        if ticket.resolve_due_at and not ticket.resolve_breached_at:
+            ticket.resolve_due_at += paused
+            changed.append('resolve_due_at')
+        if ticket.response_due_at and not ticket.first_response_at and not ticket.response_breached_at:
+            ticket.response_due_at += paused
+            changed.append('response_due_at')
+        ticket.sla_paused_at = None
+        changed.append('sla_paused_at')
+
+    return changed
+
+
+def bulk_status_updates(new_status, now):
+    """
+    Come on_status_change, ma espresso in SQL per un solo UPDATE su più ticket
+    (stati di partenza diversi). Ritorna i kwargs per QuerySet.update();
+    i ticket già in `new_status` vanno esclusi dal chiamante.
+    """
+    now_value = Value(now, output_field=DateTimeField())
+    paused_for = ExpressionWrapper(now_value - F('sla_paused_at'), output_field=DurationField())
+    leaving_pause = Q(status=PAUSED_STATUS, sla_paused_at__isnull=False)
+
+    updates = {
+        'first_response_at': Case(
+            When(status=RESPONSE_PENDING_STATUS, first_response_at__isnull=True, then=now_value),
+            default=F('first_response_at'),
+        ),
+    }
+    if new_status == PAUSED_STATUS:
+        updates['sla_paused_at'] = Coalesce(F('sla_paused_at'), now_value)
+        return updates
+
+    updates['resolve_due_at'] = Case(
+        When(leaving_pause & Q(resolve_due_at__isnull=False, resolve_breached_at__isnull=True),
+             then=F('resolve_due_at') + paused_for),
+        default=F('resolve_due_at'),
+    )
+    updates['response_due_at'] = Case(
+        When(leaving_pause & Q(response_due_at__isnull=False, first_response_at__isnull=True,
+                               response_breached_at__isnull=True),
+             then=F('response_due_at') + paused_for),
+        default=F('response_due_at'),
+    )
+    updates['sla_paused_at'] = None
+    return updates
+
+
+def breaching(kind, now=None):
+    """
+    Queryset dei ticket che hanno appena superato la scadenza `kind` ('response'|'resolve').
+    I filtri coincidono con la condizione degli indici parziali → un solo range scan.
+    """
+    from .models import Ticket
+
+    now = now or timezone.now()
+    if kind == 'response':
+        return Ticket.objects.filter(
+            status=RESPONSE_PENDING_STATUS, response_breached_at__isnull=True, response_due_at__lte=now,
+        )
+    return Ticket.objects.filter(
+        status__in=RUNNING_STATUSES, resolve_breached_at__isnull=True, resolve_due_at__lte=now,
+    )
@@ -0,0 +1,187 @@
+# tickets/snapshots.py
+"""
+Snapshot incrementali per la BI (manage.py export_snapshots): NDJSON compresso con gzip.
+
+- Stream per reparto: `tickets` (modificati, su updated_at), `comments` e `audits` (nuovi, su
+  created_at); stream globale `tombstones` (ticket cancellati/archiviati, su deleted_at).
+- Watermark per (stream, reparto) in SnapshotWatermark: ogni esecuzione esporta solo le righe
+  oltre l'ultima posizione (keyset su (data, id)) e fino a un orizzonte fisso (adesso meno
+  SNAPSHOT_SAFETY_SECONDS), così le transazioni ancora in volo finiscono nell'esecuzione dopo.
+- Un processo per reparto (spawn: il worker inizializza Django da sé). Ogni reparto scrive i suoi
+  file, poi il proprio `manifest.json`, infine fa avanzare i propri watermark: un reparto fallito
+  viene ripreso alla prossima esecuzione senza ripetere gli altri.
+- Consegna at-least-once: se il processo muore tra manifest e watermark l'intervallo viene
+  riesportato; i loader deduplicano per `id` (tickets: l'`updated_at` più recente vince).
+- Layout: <SNAPSHOT_DIR>/<run>/<REPARTO>/<stream>.ndjson.gz + <REPARTO>/manifest.json,
+  <run>/tombstones.ndjson.gz e <run>/manifest.json (indice dell'esecuzione, scritto per ultimo).
+"""
+import gzip
+import hashlib
+import json
+import os
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+FORMAT_VERSION = 1
+DEPARTMENT_STREAMS = ('tickets', 'comments', 'audits')
+GLOBAL_STREAM = 'tombstones'
+LOCK_KEY = 0x5A9_0050  # pg_advisory_lock: una sola esportazione per volta
+
+
+def _streams():
+    """stream → (queryset, campo data del watermark, colonne). Import lazy: il modulo gira anche nei worker."""
+    from .archive import DERIVED_FIELDS
+    from .models import AuditLog, Comment, Ticket, TicketTombstone
+
+    ticket_fields = [f.attname for f in Ticket._meta.concrete_fields if f.name not in DERIVED_FIELDS]
+    return {
+        'tickets': (Ticket.objects.all(), 'updated_at', ticket_fields + ['department__code']),
+        'comments': (Comment.objects.all(), 'created_at',
+                     ['id', 'ticket_id', 'author_id', 'author__username', 'body', 'is_internal', 'created_at']),
+        'audits': (AuditLog.objects.all(), 'created_at',
+                   ['id', 'ticket_id', 'action', 'actor_id', 'actor__username', 'note', 'meta', 'created_at']),
+        'tombstones': (TicketTombstone.objects.all(), 'deleted_at',
+                       ['id', 'ticket_id', 'protocol', 'deleted_at']),
+    }
+
+
+def init_worker():
+    """initializer del pool (spawn): il processo figlio parte senza Django configurato."""
+    import django
+    django.setup()
+
+
+def _write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def write_manifest(path, manifest):
+    _write_atomic(path, json.dumps(manifest, cls=DjangoJSONEncoder, indent=1).encode('utf-8'))
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        while chunk := fh.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def export_stream(stream, path, department_id, start, horizon, batch_size):
+    """
+    Scrive le righe di `stream` oltre `start` = (data, id) fino a `horizon`.
+    Ritorna (righe, nuova posizione). Il file resta solo se contiene righe.
+    """
+    from django.db.models import Q
+
+    qs, ts_field, columns = _streams()[stream]
+    if department_id is not None:
+        dep_filter = 'department_id' if stream == 'tickets' else 'ticket__department_id'
+        qs = qs.filter(**{dep_filter: department_id})
+    qs = qs.filter(**{f'{ts_field}__lte': horizon}).order_by(ts_field, 'id')
+
+    last_ts, last_id = start
+    rows = 0
+    tmp = path + '.tmp'
+    with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as out:
+        while True:
+            page = qs
+            if last_ts is not None:
+                page = page.filter(**{f'{ts_field}__gte': last_ts}).filter(
+                    Q(**{f'{ts_field}__gt': last_ts}) | Q(id__gt=last_id))
+            batch = list(page.values(*columns)[:batch_size])
+            for row in batch:
+                out.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')))
+                out.write('\n')
+            rows += len(batch)
+            if len(batch) < batch_size:
+                if batch:
+                    last_ts, last_id = batch[-1][ts_field], batch[-1]['id']
+                break
+            last_ts, last_id = batch[-1][ts_field], batch[-1]['id']
+    if rows:
+        with open(tmp, 'rb') as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    else:
+        os.remove(tmp)
+    return rows, (last_ts, last_id)
+
+
+def _position(stream, department_id):
+    from .models import SnapshotWatermark
+
+    wm = SnapshotWatermark.objects.filter(stream=stream, department_id=department_id).first()
+    return (wm.last_ts, wm.last_id) if wm else (None, 0)
+
+
+def save_watermark(stream, department_id, position, run_id):
+    from .models import SnapshotWatermark
+
+    SnapshotWatermark.objects.update_or_create(
+        stream=stream, department_id=department_id,
+        defaults={'last_ts': position[0], 'last_id': position[1], 'run_id': run_id},
+    )
+
+
+def _file_entry(stream, rel_path, path, rows, start, end):
+    return {
+        'stream': stream,
+        'path': rel_path if rows else None,
+        'rows': rows,
+        'bytes': os.path.getsize(path) if rows else 0,
+        'sha256': _sha256(path) if rows else None,
+        'from': {'ts': start[0], 'id': start[1]},
+        'to': {'ts': end[0], 'id': end[1]},
+    }
+
+
+def export_department(job):
+    """
+    Worker: esporta gli stream di un reparto. job: run_id, run_dir, department_id, department_code,
+    horizon, batch_size. Ritorna il manifest del reparto.
+    """
+    from django.db import connections
+    from django.utils import timezone
+
+    code, dep_id = job['department_code'], job['department_id']
+    dep_dir = os.path.join(job['run_dir'], code)
+    os.makedirs(dep_dir, exist_ok=True)
+    try:
+        files, positions = [], {}
+        for stream in DEPARTMENT_STREAMS:
+            start = _position(stream, dep_id)
+            name = f'{stream}.ndjson.gz'
+            rows, end = export_stream(stream, os.path.join(dep_dir, name), dep_id, start,
+                                      job['horizon'], job['batch_size'])
+            files.append(_file_entry(stream, f'{code}/{name}', os.path.join(dep_dir, name), rows, start, end))
+            positions[stream] = end
+
+        manifest = {
+            'format': FORMAT_VERSION,
+            'run_id': job['run_id'],
+            'department': code,
+            'horizon': job['horizon'],
+            'completed_at': timezone.now(),
+            'files': files,
+        }
+        # prima il manifest (i dati sono completi), poi i watermark: al peggio si riesporta
+        write_manifest(os.path.join(dep_dir, 'manifest.json'), manifest)
+        for stream, position in positions.items():
+            save_watermark(stream, dep_id, position, job['run_id'])
+        return manifest
+    finally:
+        connections.close_all()
+
+
+def export_tombstones(run_id, run_dir, horizon, batch_size):
+    start = _position(GLOBAL_STREAM, None)
+    name = f'{GLOBAL_STREAM}.ndjson.gz'
+    path = os.path.join(run_dir, name)
+    rows, end = export_stream(GLOBAL_STREAM, path, None, start, horizon, batch_size)
+    return _file_entry(GLOBAL_STREAM, name, path, rows, start, end), end
@@ -0,0 +1,27 @@
+// Tutte le pagine: componenti Materialize, label delle date, toast dei messaggi Django
+document.addEventListener('DOMContentLoaded', function() {
+  // Inizializza componenti Materialize
+  M.AutoInit();
+
+  // Forza label "attive" per tutti gli <input type="date">
+  document.querySelectorAll('input[type="date"]').forEach(function(inp){
+    const id = inp.id;
+    if (!id) return;
+    const lbl = document.querySelector('label[for="'+id+'"]');
+    if (lbl) lbl.classList.add('active');
+  });
+
+  // Toast per messaggi Django
+  const box = document.getElementById('django-messages');
+  if (box) {
+    box.querySelectorAll('div[data-text]').forEach(function(el) {
+      const text = el.getAttribute('data-text');
+      const tags = (el.getAttribute('data-tags') || '').toLowerCase();
+      let classes = 'blue-grey darken-1';
+      if (tags.includes('success')) classes = 'green darken-2';
+      if (tags.includes('error')) classes = 'red darken-2';
+      if (tags.includes('warning')) classes = 'orange darken-2';
+      M.toast({html: text, classes: classes, displayLength: 4000});
+    });
+  }
+});
@@ -0,0 +1,110 @@
+// Dashboard (team e operatore): drawer dei filtri e select categorie dipendente dal reparto.
+// Configurazione dagli attributi data-* del tag <script>:
+//   data-taxonomy-url  asset JSON versionato con le mappe reparto/categorie (cacheato dal browser)
+//   data-other-code    codice della categoria "Altro"
+//   data-category      categoria selezionata (querystring)
+//   data-open          "1" se ci sono filtri attivi (drawer aperto al caricamento)
+(function() {
+  const cfg = document.currentScript.dataset;
+
+  document.addEventListener('DOMContentLoaded', function() {
+    // Drawer Materialize
+    M.Sidenav.init(document.querySelectorAll('.sidenav'), { edge: 'right', draggable: true, preventScrolling: true });
+
+    // Apri auto se filtri attivi
+    if (cfg.open === '1') {
+      const inst = M.Sidenav.getInstance(document.getElementById('filters-drawer'));
+      if (inst) inst.open();
+    }
+
+    let categoryMap = {};   // {ICT:[[val,label],...], WH:[...], SP:[...]}
+    let depCodeById = {};   // {"3":"ICT","7":"WH",...}
+    const OTHER_CODE  = cfg.otherCode || '';
+    const preSelCategory = cfg.category || '';
+
+    // Elementi
+    const depSelect  = document.getElementById('id_department');
+    const catSelect  = document.getElementById('id_category');
+    const otherWrap  = document.getElementById('flt_category_other_wrap');
+    const otherInput = document.getElementById('id_category_other');
+
+    function renderCategoryOptions(depId) {
+      if (!catSelect) return;
+
+      // svuota select
+      while (catSelect.firstChild) catSelect.removeChild(catSelect.firstChild);
+
+      // "Tutte"
+      const optAll = document.createElement('option');
+      optAll.value = "";
+      optAll.textContent = "Tutte";
+      catSelect.appendChild(optAll);
+
+      // trova codice reparto e scelte
+      const depCode = depId ? depCodeById[String(depId)] : null;
+      const choices = depCode && categoryMap[depCode] ? categoryMap[depCode] : [];
+
+      // aggiungi opzioni
+      choices.forEach(function(pair) {
+        const value = pair[0], label = pair[1];
+        const opt = document.createElement('option');
+        opt.value = value;
+        opt.textContent = label;
+        catSelect.appendChild(opt);
+      });
+
+      // ripristina selezione da querystring se coerente
+      if (preSelCategory) {
+        const found = Array.from(catSelect.options).find(o => o.value === preSelCategory);
+        catSelect.value = found ? preSelCategory : "";
+      } else {
+        catSelect.value = "";
+      }
+
+      toggleOther(catSelect.value);
+    }
+
+    function toggleOther(value) {
+      if (!otherWrap) return;
+      if (value === OTHER_CODE) {
+        otherWrap.style.display = "";
+      } else {
+        otherWrap.style.display = "none";
+        if (otherInput) otherInput.value = "";
+      }
+    }
+
+    // init
+    fetch(cfg.taxonomyUrl, { credentials: 'same-origin' })
+      .then(function (r) { return r.json(); })
+      .then(function (tax) {
+        categoryMap = tax.category_map || {};
+        depCodeById = tax.dep_code_by_id || {};
+        renderCategoryOptions(depSelect ? depSelect.value : null);
+      });
+
+    // eventi
+    if (depSelect) {
+      depSelect.addEventListener('change', function () {
+        renderCategoryOptions(this.value); // aggiorna subito le categorie
+      });
+    }
+    if (catSelect) {
+      catSelect.addEventListener('change', function () {
+        toggleOther(this.value);
+      });
+    }
+  });
+
+  // Blocca il click sull'overlay della sidenav (così non chiude)
+  function blockOverlay(e) {
+    if (e.target && e.target.classList.contains('sidenav-overlay')) {
+      e.preventDefault();
+      e.stopPropagation();
+      return false;
+    }
+  }
+  document.addEventListener('click', blockOverlay, true); // in capturing, così lo prendiamo prima di Materialize
+  // blocca anche i tocchi mobili
+  document.addEventListener('touchstart', blockOverlay, { capture: true, passive: false });
+})();
@@ -0,0 +1,181 @@
+// Nuovo ticket: categorie per reparto, possibili duplicati, autocomplete location/asset.
+// Configurazione dagli attributi data-* del tag <script>: data-other-code, data-ict-id, data-wh-id,
+// data-sp-id, data-duplicates-url, data-autocomplete-url.
+(function() {
+  const cfg = document.currentScript.dataset;
+
+  (function() {
+    const depSelect = document.getElementById("id_department");
+    const catReal   = document.getElementById("id_category_real");
+    const otherWrap = document.getElementById("category_other_wrap");
+    const OTHER_CODE = cfg.otherCode || "";
+
+    // mapping dep_id -> codice dep
+    const ICT_ID = cfg.ictId || null;
+    const WH_ID  = cfg.whId || null;
+    const SP_ID  = cfg.spId || null;
+
+    // selettori per categoria per reparto
+    const selICT = document.getElementById("id_category_ict");
+    const selWH  = document.getElementById("id_category_wh");
+    const selSP  = document.getElementById("id_category_sp");
+
+    function activeSelectForDepartment(depId) {
+      // nascondi/disable tutto
+      [selICT, selWH, selSP].forEach(sel => {
+        sel.closest(".category-select").style.display = "none";
+        sel.disabled = true;
+      });
+
+      let active = null;
+      if (depId && ICT_ID && depId.toString() === ICT_ID.toString()) {
+        active = selICT;
+      } else if (depId && WH_ID && depId.toString() === WH_ID.toString()) {
+        active = selWH;
+      } else if (depId && SP_ID && depId.toString() === SP_ID.toString()) {
+        active = selSP;
+      }
+
+      if (active) {
+        active.closest(".category-select").style.display = "";
+        active.disabled = false;
+      }
+      return active;
+    }
+
+    function syncCategoryToHidden(activeSel) {
+      if (!activeSel || activeSel.disabled) {
+        catReal.value = "";
+        otherWrap.style.display = "none";
+        return;
+      }
+      catReal.value = activeSel.value || "";
+      otherWrap.style.display = (activeSel.value === OTHER_CODE) ? "" : "none";
+    }
+
+    // on load
+    const currentDepId = depSelect ? depSelect.value : null;
+    const activeSelOnLoad = activeSelectForDepartment(currentDepId);
+    // ripristina eventuale categoria selezionata dal server
+    if (activeSelOnLoad && catReal.value) {
+      activeSelOnLoad.value = catReal.value;
+    }
+    syncCategoryToHidden(activeSelOnLoad);
+
+    // eventi
+    if (depSelect) {
+      depSelect.addEventListener("change", function() {
+        const active = activeSelectForDepartment(this.value);
+        // reset categoria quando cambio reparto
+        if (active) active.value = "";
+        syncCategoryToHidden(active);
+      });
+    }
+
+    [selICT, selWH, selSP].forEach(sel => {
+      sel.addEventListener("change", function() {
+        syncCategoryToHidden(this);
+      });
+    });
+  })();
+
+  // Possibili duplicati: ticket aperti simili nello stesso reparto
+  (function() {
+    const url = cfg.duplicatesUrl;
+    const box = document.getElementById("dup-box");
+    const list = document.getElementById("dup-list");
+    const ids = ["id_title", "id_description", "id_department", "id_asset_code", "id_category_real"];
+    const fields = ids.map(id => document.getElementById(id)).filter(Boolean);
+    let timer = null, lastQuery = "", pending = null;
+
+    function value(id) {
+      const el = document.getElementById(id);
+      return el ? el.value.trim() : "";
+    }
+
+    function render(results, hiddenCount) {
+      const items = results.map(r => {
+        const li = document.createElement("li");
+        li.className = "collection-item";
+        const proto = document.createElement("a");
+        proto.className = "chip";
+        proto.textContent = r.protocol;
+        proto.href = r.url;
+        proto.target = "_blank";
+        li.append(proto, ` ${r.title} `);
+        const status = document.createElement("span");
+        status.className = "grey-text";
+        status.textContent = `(${r.status_display})`;
+        li.append(status);
+        return li;
+      });
+      if (hiddenCount) {
+        // ticket di altri utenti: solo il numero, senza titolo né protocollo
+        const li = document.createElement("li");
+        li.className = "collection-item grey-text";
+        li.textContent = hiddenCount === 1
+          ? "1 ticket simile aperto da un altro utente"
+          : `${hiddenCount} ticket simili aperti da altri utenti`;
+        items.push(li);
+      }
+      list.replaceChildren(...items);
+      box.style.display = items.length ? "" : "none";
+    }
+
+    function check() {
+      const params = new URLSearchParams({
+        department: value("id_department"),
+        title: value("id_title"),
+        description: value("id_description").slice(0, 1000),
+        category: value("id_category_real"),
+        asset_code: value("id_asset_code"),
+      });
+      if (!params.get("department") || params.get("title").length < 5) { render([], 0); return; }
+      const query = params.toString();
+      if (query === lastQuery) return;
+      lastQuery = query;
+      if (pending) pending.abort();
+      pending = new AbortController();
+      fetch(`${url}?${query}`, {signal: pending.signal, headers: {"Accept": "application/json"}})
+        .then(resp => resp.ok ? resp.json() : {results: [], hidden_count: 0})
+        .then(data => render(data.results, data.hidden_count))
+        .catch(() => { /* richiesta annullata o rete assente */ });
+    }
+
+    fields.forEach(el => {
+      el.addEventListener("input", () => { clearTimeout(timer); timer = setTimeout(check, 400); });
+      el.addEventListener("change", () => { clearTimeout(timer); timer = setTimeout(check, 100); });
+    });
+  })();
+
+  // Autocomplete location/asset: suggerimenti dal server nel <datalist> del campo
+  (function() {
+    const url = cfg.autocompleteUrl;
+    document.querySelectorAll("input[data-autocomplete]").forEach(input => {
+      const list = document.getElementById(input.getAttribute("list"));
+      let timer = null, lastQuery = "", pending = null;
+
+      input.addEventListener("input", function() {
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+          const q = input.value.trim();
+          if (!q || q === lastQuery) return;
+          lastQuery = q;
+          if (pending) pending.abort();  // conta solo l'ultima digitazione
+          pending = new AbortController();
+          try {
+            const params = new URLSearchParams({field: input.dataset.autocomplete, q: q});
+            const resp = await fetch(`${url}?${params}`, {signal: pending.signal, headers: {"Accept": "application/json"}});
+            if (!resp.ok) return;
+            const data = await resp.json();
+            list.replaceChildren(...data.results.map(r => {
+              const opt = document.createElement("option");
+              opt.value = r.value;
+              return opt;
+            }));
+          } catch (e) { /* richiesta annullata o rete assente: nessun suggerimento */ }
+        }, 150);
+      });
+    });
+  })();
+})();
@@ -0,0 +1,108 @@
+// Dashboard team: azioni massive e aggiornamenti live (SSE).
+// Configurazione dagli attributi data-* del tag <script>:
+//   data-events-url    stream SSE (assente se LIVE_EVENTS è disattivato)
+//   data-can-prepend   "1" se i nuovi ticket vanno aggiunti in testa (prima pagina, senza filtri)
+(function() {
+  const cfg = document.currentScript.dataset;
+
+  // ===== Azioni massive =====
+  document.addEventListener('DOMContentLoaded', function() {
+    const bulkForm   = document.getElementById('bulk-form');
+    const bulkAll    = document.getElementById('bulk-all');
+    const bulkCount  = document.getElementById('bulk-count');
+    const bulkSubmit = document.getElementById('bulk-submit');
+    const bulkAction = document.getElementById('id_action');
+    if (!bulkForm) return;
+
+    function refreshBulk() {
+      const boxes = document.querySelectorAll('.js-bulk');
+      const n = document.querySelectorAll('.js-bulk:checked').length;
+      bulkCount.textContent = n;
+      bulkSubmit.disabled = n === 0;
+      bulkAll.checked = n > 0 && n === boxes.length;
+    }
+    function toggleBulkAction() {
+      const isStatus = bulkAction.value === 'status';
+      document.getElementById('bulk-status-wrap').style.display = isStatus ? '' : 'none';
+      document.getElementById('bulk-assignee-wrap').style.display = isStatus ? 'none' : '';
+    }
+    bulkAll.addEventListener('change', function () {
+      document.querySelectorAll('.js-bulk').forEach(function (cb) { cb.checked = bulkAll.checked; });
+      refreshBulk();
+    });
+    document.getElementById('tickets-tbody').addEventListener('change', function (e) {
+      if (e.target.classList.contains('js-bulk')) refreshBulk();
+    });
+    bulkAction.addEventListener('change', toggleBulkAction);
+    bulkForm.addEventListener('submit', function (e) {
+      const n = document.querySelectorAll('.js-bulk:checked').length;
+      if (!confirm('Applicare l\'azione a ' + n + ' ticket?')) e.preventDefault();
+    });
+    toggleBulkAction();
+  });
+
+  // ===== Aggiornamenti live (SSE): patch delle righe senza ricaricare =====
+  if (!cfg.eventsUrl || !window.EventSource) return;
+  const canPrepend = cfg.canPrepend === '1';
+  const PRIORITY_CLASSES = {LOW: 'green lighten-2', MED: 'amber lighten-2', HIGH: 'deep-orange lighten-2', BLK: 'red lighten-2'};
+
+  function chip(text, classes) {
+    const span = document.createElement('span');
+    span.className = 'chip' + (classes ? ' ' + classes : '');
+    span.textContent = text;
+    return span;
+  }
+  function cell(child, classes) {
+    const td = document.createElement('td');
+    if (classes) td.className = classes;
+    if (typeof child === 'string') td.textContent = child; else td.appendChild(child);
+    return td;
+  }
+  function link(href, text, classes) {
+    const a = document.createElement('a');
+    a.href = href; a.textContent = text;
+    if (classes) a.className = classes;
+    return a;
+  }
+
+  const tbody = document.getElementById('tickets-tbody');
+  const source = new EventSource(cfg.eventsUrl);
+
+  source.addEventListener('status_changed', function (e) {
+    const ev = JSON.parse(e.data);
+    const row = tbody.querySelector('tr[data-ticket-id="' + ev.id + '"]');
+    if (!row) return;
+    const td = row.querySelector('.js-status');
+    td.replaceChildren(chip(ev.status_display));
+    row.classList.add('yellow', 'lighten-4');
+    setTimeout(function () { row.classList.remove('yellow', 'lighten-4'); }, 3000);
+  });
+
+  source.addEventListener('ticket_created', function (e) {
+    if (!canPrepend) return;
+    const ev = JSON.parse(e.data);
+    if (tbody.querySelector('tr[data-ticket-id="' + ev.id + '"]')) return;
+    const empty = tbody.querySelector('.js-empty');
+    if (empty) empty.remove();
+
+    const row = document.createElement('tr');
+    row.dataset.ticketId = ev.id;
+    const box = document.createElement('input');
+    box.type = 'checkbox'; box.className = 'filled-in js-bulk';
+    box.name = 'ticket_ids'; box.value = ev.id; box.setAttribute('form', 'bulk-form');
+    const boxLabel = document.createElement('label');
+    boxLabel.append(box, document.createElement('span'));
+    row.appendChild(cell(boxLabel));
+    row.appendChild(cell(link(ev.url, ev.protocol, 'chip small'))).style.whiteSpace = 'nowrap';
+    const tdTitle = row.appendChild(cell(link(ev.url, ev.title), 'truncate'));
+    tdTitle.title = ev.title;
+    row.appendChild(cell(chip(ev.department)));
+    row.appendChild(cell(chip(ev.priority_display, PRIORITY_CLASSES[ev.priority])));
+    row.appendChild(cell(chip(ev.status_display), 'js-status'));
+    row.appendChild(cell(ev.created_by));
+    row.appendChild(cell(ev.created_at)).style.whiteSpace = 'nowrap';
+    row.classList.add('yellow', 'lighten-4');
+    tbody.insertBefore(row, tbody.firstChild);
+    setTimeout(function () { row.classList.remove('yellow', 'lighten-4'); }, 3000);
+  });
+})();
@@ -0,0 +1,90 @@
+# tickets/staticfiles.py
+"""
+Storage degli statici per `collectstatic`.
+
+- Nomi con hash del contenuto (ManifestStaticFilesStorage): `base.3f2a9c.css`, quindi
+  cacheabili "per sempre" (nginx: `expires max` / `immutable`); un deploy cambia il nome.
+- Accanto a ogni file testuale con hash scrive `.gz` e, se `brotli` è installato
+  (opzionale), `.br`: nginx li serve già compressi (`gzip_static` / `brotli_static`)
+  senza comprimere a ogni richiesta. Varianti che non risparmiano almeno MIN_SAVING
+  non vengono scritte.
+- Usato solo con DEBUG=False (settings.STORAGES): `collectstatic` è un passo obbligatorio del
+  deploy. Se manca (o manca un file) `{% static %}` ripiega sul nome senza hash invece di
+  far fallire la pagina con un 500, e lo segnala una volta nel log.
+"""
+import gzip
+import logging
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # dipendenza opzionale: solo varianti gzip
+    brotli = None
+
+COMPRESS_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.map', '.html', '.xml', '.ico', '.ttf', '.eot'}
+MIN_SIZE = 512          # byte: sotto, l'header Content-Encoding costa più di quanto si risparmia
+MIN_SAVING = 0.05
+
+logger = logging.getLogger(__name__)
+_warned_missing = False
+
+
+def _write_variant(path, suffix, data):
+    target = path + suffix
+    tmp = target + '.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, target)
+
+
+def compress_file(path):
+    """Scrive le varianti .gz/.br di `path`; ritorna i suffissi scritti."""
+    if os.path.splitext(path)[1].lower() not in COMPRESS_EXTENSIONS:
+        return []
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    if len(data) < MIN_SIZE:
+        return []
+    limit = len(data) * (1 - MIN_SAVING)
+    written = []
+    variants = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda d: brotli.compress(d, quality=11)))
+    for suffix, compress in variants:
+        if os.path.exists(path + suffix):
+            written.append(suffix)  # nome con hash: contenuto già compresso a un deploy precedente
+            continue
+        compressed = compress(data)
+        if len(compressed) <= limit:
+            _write_variant(path, suffix, compressed)
+            written.append(suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest con hash + varianti precompresse dei file con hash."""
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        global _warned_missing
+        try:
+            return super().stored_name(name)
+        except ValueError:  # né nel manifest né in STATIC_ROOT: collectstatic non eseguito
+            if not _warned_missing:
+                _warned_missing = True
+                logger.warning("Statico %r non trovato in STATIC_ROOT: eseguire collectstatic", name)
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(hashed):
+            compress_file(self.path(name))
@@ -0,0 +1,157 @@
+# tickets/storage_tiers.py
+"""
+Lifecycle degli allegati: HOT → COLD.
+
+- Candidati: allegati più vecchi di ATTACHMENTS_COLD_AFTER_DAYS su ticket risolti/chiusi.
+- Tipi comprimibili (ATTACHMENTS_COLD_COMPRESS_EXTENSIONS): compressi con zstd
+  (se `zstandard` è installato) o gzip; il file originale viene sostituito solo se
+  il risparmio supera MIN_SAVING. Gli altri tipi (pdf, immagini) restano come sono
+  e vengono solo marcati COLD, così non vengono rivalutati a ogni esecuzione.
+- `iter_decompressed()` rilegge un allegato compresso a blocchi (download in streaming), anche
+  dopo l'archiviazione del ticket (`iter_decompressed_file()`, dai metadati del documento d'archivio).
+"""
+import gzip
+import os
+import shutil
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Attachment
+
+try:
+    import zstandard
+except ImportError:  # dipendenza opzionale
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+MIN_SAVING = 0.05  # sotto il 5% di risparmio il file resta non compresso
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+CLOSED_STATUSES = ('RES', 'CLO')
+
+
+def codec():
+    wanted = getattr(settings, 'ATTACHMENTS_COLD_CODEC', 'auto')
+    if wanted == 'zstd' or (wanted == 'auto' and zstandard is not None):
+        if zstandard is None:
+            raise RuntimeError("ATTACHMENTS_COLD_CODEC=zstd richiede `pip install zstandard`")
+        return 'zstd'
+    return 'gzip'
+
+
+def is_compressible(name):
+    ext = os.path.splitext(name)[1].lstrip('.').lower()
+    return ext in {e.strip().lower() for e in getattr(settings, 'ATTACHMENTS_COLD_COMPRESS_EXTENSIONS', [])}
+
+
+def candidates(days, any_status=False, now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    qs = Attachment.objects.filter(storage_tier='HOT', uploaded_at__lt=cutoff)
+    if not any_status:
+        qs = qs.filter(ticket__status__in=CLOSED_STATUSES)
+    return qs
+
+
+def _compress_file(src_path, dst_path, method):
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as raw:
+        if method == 'zstd':
+            with zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False) as out:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+        else:
+            with gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=9, mtime=0) as out:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+        raw.flush()
+        os.fsync(raw.fileno())
+    return os.path.getsize(dst_path)
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def move_to_cold(attachment_id, method):
+    """
+    Porta un allegato nel tier COLD. Ritorna i byte recuperati (0 se lasciato com'è)
+    o None se l'allegato è già stato gestito da un altro processo.
+    Da chiamare fuori da transazioni: il file compresso resta solo se il commit riesce.
+    """
+    dst_path = None
+    try:
+        with transaction.atomic():
+            att = (Attachment.objects.select_for_update(skip_locked=True)
+                   .filter(pk=attachment_id, storage_tier='HOT').first())
+            if att is None:
+                return None
+            now = timezone.now()
+            if not is_compressible(att.original_name or att.file.name):
+                Attachment.objects.filter(pk=att.pk).update(storage_tier='COLD', tiered_at=now)
+                return 0
+
+            src_path = att.file.path
+            # nome libero: un altro allegato potrebbe aver già prodotto lo stesso "<nome>.gz"
+            new_name = default_storage.get_available_name(att.file.name + SUFFIXES[method])
+            dst_path = default_storage.path(new_name)
+            stored = _compress_file(src_path, dst_path, method)
+            original = os.path.getsize(src_path)
+            if stored > original * (1 - MIN_SAVING):
+                _remove(dst_path)
+                dst_path = None
+                Attachment.objects.filter(pk=att.pk).update(storage_tier='COLD', tiered_at=now)
+                return 0
+
+            Attachment.objects.filter(pk=att.pk).update(
+                file=new_name, storage_tier='COLD', compression=method, stored_size=stored, tiered_at=now,
+            )
+            # l'originale si cancella solo a commit avvenuto (in caso di rollback resta valido)
+            transaction.on_commit(lambda: _remove(src_path))
+    except BaseException:
+        # errore in compressione, UPDATE o commit: la riga punta ancora all'originale, il compresso è orfano
+        if dst_path:
+            _remove(dst_path)
+        raise
+    return original - stored
+
+
+def iter_decompressed(attachment):
+    """Contenuto originale dell'allegato, a blocchi, senza caricarlo tutto in memoria."""
+    yield from iter_decompressed_file(attachment.file.name, attachment.compression)
+
+
+def iter_decompressed_file(name, compression):
+    """Come `iter_decompressed`, dal nome nello storage: serve anche per gli allegati dei ticket archiviati."""
+    with default_storage.open(name, 'rb') as fh:
+        if compression == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("Allegato zstd: serve `pip install zstandard`")
+            yield from zstandard.ZstdDecompressor().read_to_iter(fh, read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+            return
+        if compression == 'gzip':
+            d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            while chunk := fh.read(CHUNK_SIZE):
+                out = d.decompress(chunk)
+                if out:
+                    yield out
+            yield d.flush()
+            return
+        while chunk := fh.read(CHUNK_SIZE):
+            yield chunk
+
+
+def report():
+    """Riepilogo per tier/compressione: numero file, byte originali, byte su disco, byte recuperati."""
+    rows = (Attachment.objects
+            .values('storage_tier', 'compression')
+            .annotate(files=Count('id'), original=Sum('size'), stored=Sum('stored_size'))
+            .order_by('storage_tier', 'compression'))
+    out = []
+    for r in rows:
+        original = r['original'] or 0
+        stored = r['stored'] if r['compression'] else original
+        out.append({**r, 'original': original, 'stored': stored or 0, 'reclaimed': original - (stored or 0)})
+    return out
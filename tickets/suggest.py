@@ -0,0 +1,83 @@
+# tickets/suggest.py
+"""
+Autocomplete per `location` e `asset_code` del nuovo ticket.
+
+- FieldValueStat tiene i valori distinti (normalizzati: minuscolo, spazi compattati)
+  con il numero di utilizzi: una riga per valore, non una per ticket.
+- Ogni ticket creato incrementa i contatori con un solo UPSERT;
+  `manage.py rebuild_field_stats` ricalcola la tabella dai ticket.
+- Ricerca: fino a 2 caratteri solo prefisso (indice varchar_pattern_ops), poi
+  sottostringa (indice GIN pg_trgm, se l'estensione è disponibile). Prima i
+  prefissi, poi per frequenza d'uso.
+"""
+from django.db import connection, transaction
+from django.db.models import Case, Count, IntegerField, Max, Value, When
+
+from .models import FieldValueStat, Ticket
+
+FIELDS = ('location', 'asset_code')
+MIN_SUBSTRING_CHARS = 3  # sotto i 3 caratteri i trigrammi non aiutano
+LIMIT = 10
+
+_UPSERT_SQL = """
+INSERT INTO tickets_fieldvaluestat AS s (field, normalized, value, uses, last_used_at)
+VALUES {rows}
+ON CONFLICT (field, normalized) DO UPDATE SET
+    uses = s.uses + 1,
+    last_used_at = EXCLUDED.last_used_at
+"""
+
+
+def normalize(value):
+    return ' '.join((value or '').split()).lower()
+
+
+def record_ticket_values(ticket):
+    """Conta location/asset_code di un ticket appena creato (un solo statement)."""
+    rows, params = [], []
+    for field in FIELDS:
+        value = ' '.join((getattr(ticket, field) or '').split())
+        if value:
+            rows.append("(%s, %s, %s, 1, %s)")
+            params += [field, normalize(value), value, ticket.created_at]
+    if rows:
+        with connection.cursor() as cur:
+            cur.execute(_UPSERT_SQL.format(rows=', '.join(rows)), params)
+
+
+def suggest(field, text, limit=LIMIT):
+    """[{'value': ..., 'uses': ...}] ordinati: prima chi inizia con `text`, poi per utilizzi."""
+    norm = normalize(text)
+    if field not in FIELDS or not norm:
+        return []
+    qs = FieldValueStat.objects.filter(field=field)
+    if len(norm) < MIN_SUBSTRING_CHARS:
+        qs = qs.filter(normalized__startswith=norm)
+    else:
+        qs = qs.filter(normalized__contains=norm)
+    qs = qs.annotate(rank=Case(When(normalized__startswith=norm, then=Value(0)),
+                               default=Value(1), output_field=IntegerField()))
+    return list(qs.order_by('rank', '-uses', 'normalized').values('value', 'uses')[:limit])
+
+
+def rebuild(field):
+    """Ricalcola le righe di un campo dai ticket; ritorna il numero di valori distinti."""
+    stats = {}
+    # dal più usato: la prima grafia incontrata per ogni valore normalizzato è quella proposta
+    rows = (Ticket.objects.exclude(**{field: ''})
+            .values(field).annotate(n=Count('id'), last=Max('created_at')).order_by('-n', field))
+    for row in rows:
+        value = ' '.join(row[field].split())
+        if not value:
+            continue
+        stat = stats.setdefault(normalize(value), {'value': value, 'uses': 0, 'last': row['last']})
+        stat['uses'] += row['n']
+        stat['last'] = max(stat['last'], row['last'])
+
+    with transaction.atomic():
+        FieldValueStat.objects.filter(field=field).delete()
+        FieldValueStat.objects.bulk_create([
+            FieldValueStat(field=field, normalized=norm, value=s['value'], uses=s['uses'], last_used_at=s['last'])
+            for norm, s in stats.items()
+        ], batch_size=1000)
+    return len(stats)
@@ -0,0 +1,153 @@
+# tickets/taxonomy.py
+"""
+Cache in-process di reparti e categorie (cambiano ~1 volta l'anno).
+
+Le categorie vivono nella tabella Category (gestita da admin); da qui si leggono
+scelte dei form, etichette e id per i filtri, senza query per riga.
+
+Ogni processo tiene uno snapshot locale; la validità è data da un numero di
+versione nella cache Django condivisa (CACHES: tabella su Postgres o Redis).
+I signal su Department/Category incrementano la versione; ogni worker la
+rilegge al più ogni VERSION_CHECK_SECONDS (non a ogni helper: con DatabaseCache
+sarebbe una query per riga) e ricostruisce comunque lo snapshot dopo MAX_AGE_SECONDS.
+
+Lo snapshot viene pubblicato anche come asset JSON versionato
+(`taxonomy_json`), cacheabile a lungo dal browser.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'taxonomy:version'
+VERSION_CHECK_SECONDS = 1  # ritardo massimo di un'invalidazione fatta da un altro worker
+MAX_AGE_SECONDS = 300      # rete di sicurezza se la versione condivisa va persa
+
+_lock = threading.Lock()
+_snapshot = {'version': None, 'data': None, 'built_at': 0.0, 'checked_at': 0.0}
+
+
+def _shared_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # chiave assente (primo avvio, cache svuotata o potata): un valore mai visto, non 1
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Da chiamare quando cambiano reparti/categorie (vedi signals.py)."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    with _lock:
+        _snapshot['version'] = None
+        _snapshot['data'] = None
+
+
+def _build():
+    from .models import Category, Department
+
+    deps = list(Department.objects.order_by('code').values_list('id', 'code', 'name'))
+    dep_code = {i: c for i, c, _ in deps}
+    cats = list(Category.objects.order_by('department_id', 'sort_order', 'id')
+                .values_list('id', 'department_id', 'code', 'label', 'is_active'))
+
+    # solo le attive nei form; le disattivate restano risolvibili per i ticket esistenti
+    category_map = {}
+    for _, dep_id, code, label, active in cats:
+        if active:
+            category_map.setdefault(dep_code[dep_id], []).append([code, label])
+
+    asset = json.dumps(
+        {
+            'dep_code_by_id': {str(i): c for i, c, _ in deps},
+            'category_map': category_map,
+        },
+        ensure_ascii=False, separators=(',', ':'), sort_keys=True,
+    ).encode('utf-8')
+
+    return {
+        'departments': deps,
+        'dep_code_by_id': {i: c for i, c, _ in deps},
+        'dep_id_by_code': {c.upper(): i for i, c, _ in deps},
+        'category_map': category_map,
+        'category_id_by_key': {(dep_id, code): i for i, dep_id, code, _, _ in cats},
+        'category_labels': {i: label for i, _, _, label, _ in cats},
+        'asset': asset,
+        'asset_version': hashlib.sha1(asset).hexdigest()[:12],
+    }
+
+
+def get_taxonomy():
+    now = time.monotonic()
+    data = _snapshot['data']
+    if (data is not None and now - _snapshot['checked_at'] < VERSION_CHECK_SECONDS
+            and now - _snapshot['built_at'] < MAX_AGE_SECONDS):
+        return data
+    version = _shared_version()
+    with _lock:
+        if (_snapshot['data'] is None or _snapshot['version'] != version
+                or now - _snapshot['built_at'] >= MAX_AGE_SECONDS):
+            _snapshot['data'] = _build()
+            _snapshot['version'] = version
+            _snapshot['built_at'] = now
+        _snapshot['checked_at'] = now
+        return _snapshot['data']
+
+
+# --- helper di comodo ---
+def department_choices():
+    """[(id, code), ...] ordinati per codice."""
+    return [(i, c) for i, c, _ in get_taxonomy()['departments']]
+
+
+def dep_code_by_id():
+    return get_taxonomy()['dep_code_by_id']
+
+
+def department_id(code):
+    return get_taxonomy()['dep_id_by_code'].get((code or '').upper())
+
+
+def category_map():
+    return get_taxonomy()['category_map']
+
+
+def category_choices(dep_code):
+    """[(code, label), ...] delle categorie attive del reparto."""
+    return [tuple(c) for c in get_taxonomy()['category_map'].get((dep_code or '').upper(), [])]
+
+
+def all_category_choices():
+    """Unione delle categorie attive di tutti i reparti (codice ripetuto: prima etichetta)."""
+    seen = {}
+    for choices in get_taxonomy()['category_map'].values():
+        for code, label in choices:
+            seen.setdefault(code, label)
+    return list(seen.items())
+
+
+def category_id(department_id, code):
+    """Id Category per (reparto, codice) o None."""
+    if not code:
+        return None
+    return get_taxonomy()['category_id_by_key'].get((department_id, code))
+
+
+def category_ids(code, department_id=None):
+    """Id Category con quel codice (in tutti i reparti o in uno solo): per i filtri su category_ref."""
+    return [i for (dep_id, c), i in get_taxonomy()['category_id_by_key'].items()
+            if c == code and (department_id is None or dep_id == department_id)]
+
+
+def category_label(category_id):
+    return get_taxonomy()['category_labels'].get(category_id, '')
+
+
+def asset_version():
+    return get_taxonomy()['asset_version']
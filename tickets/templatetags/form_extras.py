@@ -4,3 +4,17 @@ register = template.Library()
 @register.filter(name='add_class')
 def add_class(field, css):
     return field.as_widget(attrs={**field.field.widget.attrs, 'class': css})
+
+@register.filter(name='duration')
+def duration(seconds):
+    """Secondi → '45m', '3h 05m', '2g 4h' (vuoto se None)."""
+    if seconds is None or seconds == '':
+        return ''
+    minutes = int(seconds) // 60
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes:02d}m"
+    days, hours = divmod(hours, 24)
+    return f"{days}g {hours}h"
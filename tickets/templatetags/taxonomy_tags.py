@@ -0,0 +1,16 @@
+from django import template
+
+from tickets import taxonomy
+from tickets.constants import OTHER_CODE
+
+register = template.Library()
+
+@register.filter(name='category_label')
+def category_label(ticket):
+    """Etichetta della categoria dalla cache tassonomia (nessuna query per riga); 'Altro — <testo>' se specificato."""
+    if not ticket.category:
+        return ''
+    label = taxonomy.category_label(ticket.category_ref_id) or ticket.category
+    if ticket.category == OTHER_CODE and ticket.category_other:
+        return f"{label} — {ticket.category_other}"
+    return label
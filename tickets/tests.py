@@ -0,0 +1,314 @@
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import duplicates, staticfiles, webhooks
+from .fast_serialization import serialize_ticket_rows
+from .models import (
+    AuditLog, Comment, Department, Ticket, TicketTombstone, WebhookDelivery, WebhookSubscription,
+)
+from .serializers import TicketSerializer
+from .services import (
+    TicketConflict, bulk_assign, bulk_change_status, change_ticket_status, create_ticket_with_notification,
+)
+
+SECRET = 'stub-secret'
+
+
+class WebhookDeliveryStubTests(TestCase):
+    """Consegna dei webhook contro lo stub locale (webhooks.stub_server) su una porta libera."""
+
+    def setUp(self):
+        self.server = webhooks.stub_server(SECRET, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        self.endpoint = webhooks.Endpoint(self.url, timeout=5)
+
+    def tearDown(self):
+        self.endpoint.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def _deliveries(self, n, secret=SECRET):
+        sub = WebhookSubscription.objects.create(name='stub', url=self.url, secret=secret)
+        WebhookDelivery.objects.bulk_create(
+            WebhookDelivery(subscription=sub, event='ticket.created', payload={'id': i}) for i in range(n))
+        groups = webhooks.claim(limit=100)
+        self.assertEqual(list(groups), [sub])
+        return sub, groups[sub]
+
+    def test_signed_batches_share_one_connection(self):
+        sub, deliveries = self._deliveries(4)
+        for batch in (deliveries[:2], deliveries[2:]):
+            self.assertEqual(webhooks.send_batch(self.endpoint, sub, batch), '')
+        webhooks.record_results(deliveries, [])
+
+        stats = self.server.stats
+        self.assertEqual((stats['requests'], stats['events']), (2, 4))
+        self.assertEqual(len(stats['connections']), 1)  # keep-alive: secondo POST sulla stessa connessione
+        self.assertEqual(WebhookDelivery.objects.filter(status='SENT', attempts=1).count(), 4)
+
+    def test_wrong_secret_is_rejected(self):
+        sub, deliveries = self._deliveries(1, secret='other-secret')
+        self.assertEqual(webhooks.send_batch(self.endpoint, sub, deliveries), 'HTTP 401')
+        self.assertEqual(self.server.stats['requests'], 0)
+
+    def test_503_is_retried_with_backoff(self):
+        sub, deliveries = self._deliveries(2)
+        self.server.fail_rate = 1.0
+        error = webhooks.send_batch(self.endpoint, sub, deliveries)
+        self.assertEqual(error, 'HTTP 503')
+
+        now = timezone.now()
+        with self.assertLogs('tickets.webhooks', 'WARNING'):
+            webhooks.record_results([], [(d, error) for d in deliveries], now=now)
+        for d in WebhookDelivery.objects.all():
+            self.assertEqual((d.status, d.attempts, d.last_error), ('PENDING', 1, 'HTTP 503'))
+            # primo backoff: BACKOFF_BASE secondi ±20% di jitter
+            delay = d.next_attempt_at - now
+            self.assertGreaterEqual(delay, timedelta(seconds=webhooks.BACKOFF_BASE * 0.8))
+            self.assertLessEqual(delay, timedelta(seconds=webhooks.BACKOFF_BASE * 1.2))
+        self.assertEqual(webhooks.claim(limit=100, now=now), {})  # non ancora pronte
+
+        self.server.fail_rate = 0.0
+        later = now + timedelta(seconds=webhooks.BACKOFF_BASE * 2)
+        retry = webhooks.claim(limit=100, now=later)[sub]
+        self.assertEqual(webhooks.send_batch(self.endpoint, sub, retry), '')
+        webhooks.record_results(retry, [], now=later)
+        self.assertEqual(WebhookDelivery.objects.filter(status='SENT', attempts=2).count(), 2)
+
+    def test_deactivation_fails_pending_deliveries(self):
+        sub, deliveries = self._deliveries(2)
+        webhooks.record_results(deliveries[:1], [])
+        sub.is_active = False
+        sub.save()
+        self.assertEqual(WebhookDelivery.objects.get(pk=deliveries[0].pk).status, 'SENT')
+        pending = WebhookDelivery.objects.get(pk=deliveries[1].pk)
+        self.assertEqual((pending.status, pending.last_error), ('FAILED', webhooks.INACTIVE_ERROR))
+
+        # accodata con la lista di sottoscrizioni ancora vecchia: la raccoglie il giro di pulizia
+        late = WebhookDelivery.objects.create(subscription=sub, event='ticket.created', payload={})
+        self.assertEqual(webhooks.fail_inactive(), 1)
+        self.assertEqual(WebhookDelivery.objects.get(pk=late.pk).status, 'FAILED')
+
+    @override_settings(WEBHOOKS_MAX_ATTEMPTS=1)
+    def test_failed_after_max_attempts(self):
+        sub, deliveries = self._deliveries(1)
+        self.server.fail_rate = 1.0
+        error = webhooks.send_batch(self.endpoint, sub, deliveries)
+        with self.assertLogs('tickets.webhooks', 'WARNING'):
+            webhooks.record_results([], [(deliveries[0], error)])
+        self.assertEqual(WebhookDelivery.objects.get().status, 'FAILED')
+
+
+class ManifestStaticFilesTests(TestCase):
+    """Con DEBUG=False e senza collectstatic le pagine si aprono comunque (URL senza hash)."""
+
+    def test_page_renders_without_collectstatic(self):
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'tickets.staticfiles.CompressedManifestStaticFilesStorage'},
+        }
+        with tempfile.TemporaryDirectory() as root, override_settings(STORAGES=storages, STATIC_ROOT=root), \
+                mock.patch.object(staticfiles, '_warned_missing', False), \
+                self.assertLogs('tickets.staticfiles', 'WARNING'):
+            response = self.client.get('/accounts/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/static/tickets/')
+
+
+class FastSerializationTests(TestCase):
+    """serialize_ticket_rows deve restituire esattamente TicketSerializer(many=True).data."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dep = Department.objects.create(code='ICT', name='ICT')
+        author = User.objects.create_user('autore')
+        operator = User.objects.create_user('operatore')
+        create_ticket_with_notification(title='Assegnato', description='x', department=dep, created_by=author,
+                                        assignee=operator, category='HW', location='Sala 1', asset_code='PC-1')
+        create_ticket_with_notification(title='Senza assegnatario', description='y', department=dep,
+                                        created_by=author, category=None)
+        internal = create_ticket_with_notification(title='Con nota interna', description='z', department=dep,
+                                                   created_by=author, category='')
+        Comment.objects.create(ticket=internal, author=operator, body='solo staff', is_internal=True)
+
+    def _compare(self, fields=None):
+        queryset = Ticket.objects.order_by('pk')
+        expected = TicketSerializer(queryset, many=True, fields=fields).data
+        self.assertEqual(serialize_ticket_rows(queryset, fields), [dict(row) for row in expected])
+
+    def test_all_fields(self):
+        self.assertIsNone(Ticket.objects.get(title='Senza assegnatario').assignee_id)
+        self._compare()
+
+    def test_sparse_fields(self):
+        self._compare(['id', 'assignee', 'updated_at'])
+        self._compare(['status', 'version'])
+
+
+class OptimisticConcurrencyTests(TestCase):
+    """Modifica basata su una versione vecchia: nessuna scrittura, conflitto."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        dep = Department.objects.create(code='ICT', name='ICT')
+        self.ticket = create_ticket_with_notification(title='Stampante', description='x', department=dep,
+                                                      created_by=self.admin)
+        self.client.force_login(self.admin)
+        self.url = f'/api/tickets/{self.ticket.pk}/'
+
+    def test_service_rejects_stale_version(self):
+        stale = self.ticket.version
+        change_ticket_status(Ticket.objects.get(pk=self.ticket.pk), 'INP', self.admin, expected_version=stale)
+        with self.assertRaises(TicketConflict):
+            change_ticket_status(Ticket.objects.get(pk=self.ticket.pk), 'WAI', self.admin, expected_version=stale)
+        current = Ticket.objects.get(pk=self.ticket.pk)
+        self.assertEqual((current.status, current.version), ('INP', stale + 1))
+
+    def test_api_stale_version_is_409(self):
+        stale = self.ticket.version
+        ok = self.client.patch(self.url, {'title': 'Prima', 'version': stale}, content_type='application/json')
+        self.assertEqual(ok.status_code, 200)
+        self.assertEqual(ok.json()['version'], stale + 1)
+
+        conflict = self.client.patch(self.url, {'title': 'Seconda', 'version': stale},
+                                     content_type='application/json')
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.json()['current']['title'], 'Prima')
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).version, stale + 1)
+
+    def test_api_stale_if_match_is_412(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.patch(self.url, {'title': 'Prima'}, content_type='application/json', HTTP_IF_MATCH=etag)
+        response = self.client.patch(self.url, {'title': 'Seconda'}, content_type='application/json',
+                                     HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).title, 'Prima')
+
+
+class BulkActionTests(TestCase):
+    """Azioni massive: versione +1, un audit per ticket, email solo dopo il commit."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.operator = User.objects.create_user('operatore', 'op@example.com')
+        dep = Department.objects.create(code='ICT', name='ICT')
+        self.tickets = [
+            create_ticket_with_notification(title=f'Ticket {i}', description='x', department=dep,
+                                            created_by=self.admin)
+            for i in range(3)
+        ]
+        self.ids = [t.pk for t in self.tickets]
+        self.versions = {t.pk: t.version for t in self.tickets}
+        AuditLog.objects.all().delete()
+
+    def test_bulk_change_status(self):
+        change_ticket_status(self.tickets[0], 'INP', self.admin)  # già nello stato: escluso
+        self.versions[self.ids[0]] += 1
+        AuditLog.objects.all().delete()
+        mail.outbox.clear()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(bulk_change_status(self.ids, 'INP', self.admin), 2)
+            self.assertEqual(mail.outbox, [])
+        self.assertTrue(callbacks)
+        self.assertTrue(mail.outbox)
+
+        for t in Ticket.objects.filter(pk__in=self.ids):
+            self.assertEqual(t.status, 'INP')
+            self.assertEqual(t.version, self.versions[t.pk] + (t.pk != self.ids[0]))
+        audits = AuditLog.objects.filter(action=AuditLog.Action.STATUS_CHANGED)
+        self.assertEqual(sorted(a.ticket_id for a in audits), self.ids[1:])
+        self.assertTrue(all(a.meta['bulk'] and a.meta['new_code'] == 'INP' for a in audits))
+
+    def test_bulk_assign(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(bulk_assign(self.ids, self.operator, self.admin), 3)
+        self.assertEqual(bulk_assign(self.ids, self.operator, self.admin), 0)  # già assegnati
+
+        for t in Ticket.objects.filter(pk__in=self.ids):
+            self.assertEqual((t.assignee_id, t.version), (self.operator.pk, self.versions[t.pk] + 1))
+        audits = AuditLog.objects.filter(action=AuditLog.Action.ASSIGNED)
+        self.assertEqual(sorted(a.ticket_id for a in audits), self.ids)
+        self.assertEqual({a.meta['assignee'] for a in audits}, {'operatore'})
+
+
+class DuplicateDetectionTests(TestCase):
+    """find_duplicates: ticket aperti quasi identici nello stesso reparto, mai quelli chiusi."""
+
+    TITLE = 'Stampante ufficio acquisti non stampa'
+    DESCRIPTION = 'La stampante del secondo piano da errore carta inceppata e non stampa nulla'
+
+    def setUp(self):
+        self.user = User.objects.create_user('autore')
+        self.ict = Department.objects.create(code='ICT', name='ICT')
+        self.wh = Department.objects.create(code='WH', name='Magazzino')
+
+    def _ticket(self, department=None, status='NEW', title=TITLE, description=DESCRIPTION, **kwargs):
+        ticket = create_ticket_with_notification(title=title, description=description,
+                                                 department=department or self.ict, created_by=self.user, **kwargs)
+        if status != 'NEW':
+            Ticket.objects.filter(pk=ticket.pk).update(status=status)
+        return ticket
+
+    def _find(self, **kwargs):
+        return duplicates.find_duplicates(self.ict.pk, 'Stampante ufficio acquisti non stampa piu',
+                                          'Stampante del secondo piano: errore carta inceppata, non stampa nulla',
+                                          **kwargs)
+
+    def test_finds_near_identical_open_ticket(self):
+        open_ticket = self._ticket(asset_code='PRN-7')
+        self._ticket(title='Password scaduta', description='Non riesco ad accedere alla posta elettronica')
+        results = self._find(asset_code='prn-7')
+        self.assertEqual([r['ticket']['id'] for r in results], [open_ticket.pk])
+        self.assertGreaterEqual(results[0]['score'], 0.5)
+        self.assertNotIn('description', results[0]['ticket'])
+
+    def test_skips_closed_other_department_and_excluded(self):
+        self._ticket(status='CLO')
+        self._ticket(status='RES')
+        self._ticket(department=self.wh)
+        self.assertEqual(self._find(), [])
+
+        waiting = self._ticket(status='WAI')
+        self.assertEqual([r['ticket']['id'] for r in self._find()], [waiting.pk])
+        self.assertEqual(self._find(exclude_id=waiting.pk), [])
+
+    def test_poor_text_gives_no_suggestions(self):
+        self._ticket()
+        self.assertEqual(duplicates.find_duplicates(self.ict.pk, 'a e', ''), [])
+
+
+class ConditionalTicketListTests(TestCase):
+    """GET condizionale della lista: una cancellazione sposta Last-Modified anche senza ETag."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        dep = Department.objects.create(code='ICT', name='ICT')
+        self.tickets = [
+            create_ticket_with_notification(title=f'Ticket {i}', description='x', department=dep,
+                                            created_by=self.admin)
+            for i in range(2)
+        ]
+        self.client.force_login(self.admin)
+
+    def test_deletion_moves_last_modified(self):
+        first = self.client.get('/api/tickets/')
+        since = first['Last-Modified']
+        self.assertEqual(self.client.get('/api/tickets/', HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+
+        self.tickets[0].delete()  # il più vecchio: MAX(updated_at) non cambia
+        TicketTombstone.objects.update(deleted_at=timezone.now() + timedelta(seconds=5))
+        response = self.client.get('/api/tickets/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], since)
+        self.assertEqual([t['id'] for t in response.json()], [self.tickets[1].pk])
@@ -0,0 +1,151 @@
+# tickets/text_extraction.py
+"""
+Estrazione del testo dagli allegati, per la ricerca della dashboard.
+
+- `extract()` gira in un processo del pool (manage.py extract_attachment_text): riceve
+  solo percorso e metadati, non tocca l'ORM (il modulo non importa Django) e ha un
+  proprio limite di tempo (SIGALRM), così un PDF patologico non blocca il batch.
+- txt/csv/log: testo (utf-8, altrimenti latin-1); docx/xlsx: XML interno allo zip,
+  solo libreria standard; pdf: `pypdf` se installato (opzionale), altrimenti saltato.
+- Gli allegati compressi dal tier COLD vengono letti decomprimendo al volo.
+"""
+import gzip
+import io
+import os
+import re
+import signal
+import zipfile
+from xml.etree import ElementTree
+
+try:
+    import zstandard
+except ImportError:  # dipendenza opzionale (tier COLD)
+    zstandard = None
+
+try:
+    import pypdf
+except ImportError:  # dipendenza opzionale
+    pypdf = None
+
+SEARCH_CONFIG = 'italian'  # configurazione full-text di Postgres (stemming italiano)
+
+TEXT_EXTENSIONS = {'txt', 'csv', 'log'}
+ZIP_XML_PARTS = {
+    'docx': ['word/document.xml'],
+    'xlsx': ['xl/sharedStrings.xml'],
+}
+MAX_XML_BYTES = 50 * 1024 * 1024  # XML decompresso: difesa contro gli zip bomb
+
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_SPACES_RE = re.compile(r'\s+')
+
+
+class Skipped(Exception):
+    """Allegato non estraibile (tipo non supportato, libreria mancante)."""
+
+
+class TimeLimit(Exception):
+    pass
+
+
+def extension(name):
+    return os.path.splitext(name or '')[1].lstrip('.').lower()
+
+
+def is_supported(ext):
+    return ext in TEXT_EXTENSIONS or ext in ZIP_XML_PARTS or ext == 'pdf'
+
+
+def _open(path, compression):
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise Skipped("allegato zstd: serve `pip install zstandard`")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def _decode(data):
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
+
+
+def _zip_xml_text(data, ext):
+    parts = []
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        for name in ZIP_XML_PARTS[ext]:
+            try:
+                info = zf.getinfo(name)
+            except KeyError:
+                continue
+            if info.file_size > MAX_XML_BYTES:
+                raise Skipped(f"{name} troppo grande")
+            root = ElementTree.fromstring(zf.read(name))
+            if ext == 'docx':
+                # un paragrafo per riga
+                for para in root.iter(f'{_WORD_NS}p'):
+                    parts.append(''.join(t.text or '' for t in para.iter(f'{_WORD_NS}t')))
+            else:
+                parts.extend(t.text or '' for t in root.iter(f'{_SHEET_NS}t'))
+    return '\n'.join(parts)
+
+
+def _pdf_text(data, max_chars):
+    if pypdf is None:
+        raise Skipped("pdf: serve `pip install pypdf`")
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    parts, total = [], 0
+    for page in reader.pages:
+        text = page.extract_text() or ''
+        parts.append(text)
+        total += len(text)
+        if total >= max_chars:
+            break
+    return '\n'.join(parts)
+
+
+def _clean(text, max_chars):
+    # \x00 non è ammesso nei campi text di Postgres
+    return _SPACES_RE.sub(' ', text.replace('\x00', ' ')).strip()[:max_chars]
+
+
+def _on_alarm(signum, frame):
+    raise TimeLimit()
+
+
+def extract(job):
+    """
+    job: dict con id, path, name, compression, timeout, max_chars.
+    Ritorna (id, status, detail, content) con status OK / SKIP / ERR.
+    """
+    ext = extension(job['name'])
+    use_alarm = hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, job['timeout'])
+    try:
+        if not is_supported(ext):
+            raise Skipped(f"tipo .{ext} non supportato")
+        with _open(job['path'], job['compression']) as fh:
+            data = fh.read()
+        if ext in TEXT_EXTENSIONS:
+            text = _decode(data)
+        elif ext in ZIP_XML_PARTS:
+            text = _zip_xml_text(data, ext)
+        else:
+            text = _pdf_text(data, job['max_chars'])
+        return job['id'], 'OK', '', _clean(text, job['max_chars'])
+    except Skipped as exc:
+        return job['id'], 'SKIP', str(exc)[:200], ''
+    except TimeLimit:
+        return job['id'], 'ERR', f"tempo scaduto ({job['timeout']}s)", ''
+    except Exception as exc:  # file corrotto, mancante, ...: registrato e ritentabile
+        return job['id'], 'ERR', f"{type(exc).__name__}: {exc}"[:200], ''
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
@@ -0,0 +1,83 @@
+# tickets/throttling.py
+"""
+Throttle DRF con token bucket condiviso in Postgres (tabella UNLOGGED).
+
+Il throttle DRF standard fa get/set non atomici sulla cache (e con una cache per
+processo il limite reale diventa `rate × worker`). Qui il bucket vive in
+`tickets_throttlebucket` e ogni richiesta costa un solo UPSERT atomico sulla
+primary key.
+
+Semantica: "N/periodo" è il ritmo sostenibile, la ricarica è N per periodo. La capienza
+C = BURST_FRACTION di N (almeno 1) è un burst in più, accumulato stando sotto il ritmo:
+in una finestra lunga un periodo passano al più N + C richieste (es. 600/min: 600/min
+sostenuti, picchi fino a 660 nel minuto dopo una pausa).
+Su DB diversi da Postgres si ricade sul comportamento DRF standard (cache).
+"""
+import random
+
+from django.db import connections
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+CLEANUP_PROBABILITY = 0.001
+BURST_FRACTION = 0.1
+
+_TAKE_SQL = """
+INSERT INTO tickets_throttlebucket AS b (key, tokens, allowed, updated_at)
+VALUES (%(key)s, %(cap)s - 1, true, now())
+ON CONFLICT (key) DO UPDATE SET
+    tokens = CASE
+        WHEN LEAST(%(cap)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s) >= 1
+        THEN LEAST(%(cap)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s) - 1
+        ELSE LEAST(%(cap)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s)
+    END,
+    allowed = LEAST(%(cap)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s) >= 1,
+    updated_at = now()
+RETURNING allowed, tokens
+"""
+
+# bucket fermi da più di un'ora sono di nuovo pieni: equivalgono a "assente"
+_CLEANUP_SQL = "DELETE FROM tickets_throttlebucket WHERE updated_at < now() - interval '1 hour'"
+
+
+def take_token(key, capacity, per_second):
+    """Consuma un token dal bucket `key`. Ritorna (allowed, tokens_rimasti)."""
+    with connections['default'].cursor() as cur:
+        cur.execute(_TAKE_SQL, {'key': key, 'cap': float(capacity), 'rate': per_second})
+        allowed, tokens = cur.fetchone()
+        if random.random() < CLEANUP_PROBABILITY:
+            cur.execute(_CLEANUP_SQL)
+    return allowed, tokens
+
+
+def bucket_params(num_requests, duration):
+    """(capienza, token al secondo): ricarica di `num_requests` per `duration`, burst sopra."""
+    return max(1, int(num_requests * BURST_FRACTION)), num_requests / duration
+
+
+class SharedBucketThrottleMixin:
+    def allow_request(self, request, view):
+        if connections['default'].vendor != 'postgresql':
+            return super().allow_request(request, view)
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        capacity, self._per_second = bucket_params(self.num_requests, self.duration)
+        allowed, self._tokens = take_token(self.key, capacity, self._per_second)
+        return allowed if allowed else self.throttle_failure()
+
+    def wait(self):
+        if not hasattr(self, '_tokens'):
+            return super().wait()
+        # secondi necessari per tornare ad avere un token intero
+        return max(0.0, (1 - self._tokens) / self._per_second)
+
+
+class SharedAnonRateThrottle(SharedBucketThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(SharedBucketThrottleMixin, UserRateThrottle):
+    pass
@@ -6,6 +6,10 @@ urlpatterns = [
     # UI
     path('tickets/new/', views.new_ticket, name='ticket_new'),
     path('tickets/<int:pk>/', views.ticket_detail, name='ticket_detail'),
+    path('tickets/attachments/<int:pk>/download/', views.attachment_download, name='attachment_download'),
+    path('tickets/taxonomy.json', views.taxonomy_json, name='taxonomy_json'),
+    path('tickets/autocomplete/', views.field_autocomplete, name='field_autocomplete'),
+    path('tickets/duplicates/', views.ticket_duplicates, name='ticket_duplicates'),
 
     # Export CSV (nomi “canonici” usati nei template)
     path('tickets/operator.csv', views.operator_export_csv, name='operator_export_csv'),
@@ -15,6 +19,16 @@ urlpatterns = [
     path('dash/operator/export.csv', views.operator_export_csv, name='dash_operator_export'),
     path('dash/team/export.csv', views.team_export_csv, name='dash_team_export'),
 
+    # Report tempi di presa in carico / risoluzione (staff)
+    path('dash/reports/', views.team_reports, name='team_reports'),
+    path('dash/reports/export.csv', views.team_reports_csv, name='team_reports_csv'),
+
+    # Archivio (ricerca esplicita sui ticket chiusi archiviati)
+    path('dash/archive/', views.archive_search, name='archive_search'),
+    path('dash/archive/<int:ticket_id>/', views.archived_ticket_detail, name='archived_ticket_detail'),
+    path('dash/archive/<int:ticket_id>/attachments/<int:index>/', views.archived_attachment_download,
+         name='archived_attachment_download'),
+
     # Export audit del singolo ticket (comodo dalla detail page)
     path('tickets/<int:pk>/audit.csv', views.ticket_audit_csv, name='ticket_audit_csv'),
 ]
@@ -1,36 +1,53 @@
+import asyncio
+import base64
 import csv
+import hashlib
+import json
+import re
 
 from rest_framework import viewsets, status
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import APIException, ValidationError
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from django.utils.cache import patch_cache_control, get_conditional_response
+from django.utils.http import content_disposition_header, http_date, url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, Max, Count
+from django.contrib.postgres.search import SearchQuery
 from django.core.paginator import Paginator
 from django.core.exceptions import PermissionDenied
-from datetime import datetime, time
+from django.core.files.storage import default_storage
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
 from django.utils import timezone
 
-from .models import Ticket, Attachment, Comment, Department
-from .serializers import TicketSerializer
-from .services import create_ticket_with_notification
-from .forms import NewTicketForm, CommentForm, AttachmentUploadForm, TicketFilterForm
-from .permissions import TicketPermissions, is_staffish
-from .emails import (
-    send_ticket_status_changed,
-    send_new_public_comment,
-    send_new_attachments,
+from .models import Ticket, Attachment, AttachmentText, AuditLog, Comment, TicketTombstone, ArchivedTicket
+from .serializers import CommentSerializer, TicketSerializer
+from .fast_serialization import serialize_ticket_rows
+from .services import (
+    TicketConflict, add_comments, create_ticket_with_notification, change_ticket_status, record_reassignment,
+    bulk_change_status, bulk_assign,
 )
-from .audit import log_status_change, log_comment, log_attachments
-from .constants import (
-    OTHER_CODE,
-    ICT_CATEGORY_CHOICES,
-    WH_CATEGORY_CHOICES,
-    SP_CATEGORY_CHOICES,
+from .forms import (
+    NewTicketForm, CommentForm, AttachmentUploadForm, TicketFilterForm, BulkActionForm, ReportFilterForm,
 )
+from .permissions import TicketPermissions, is_staffish
+from .db_routing import read_from_replica, replica_reads
+from . import analytics, authentication, duplicates, search, storage_tiers, suggest, taxonomy, text_extraction
+from .events import broker
+from .emails import send_new_attachments
+from .audit import log_attachments
+from .constants import OTHER_CODE
 
 def _filters_open(request):
     keys = {
@@ -40,6 +57,101 @@ def _filters_open(request):
     return any(request.GET.get(k) for k in keys)
 
 # ---------------------- API ----------------------
+def _weak_etag(*parts):
+    digest = hashlib.md5("|".join(str(p) for p in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+class PreconditionRequired(APIException):
+    status_code = 428
+    default_detail = "Modifica senza versione: inviare If-Match (ETag del ticket) o il campo version."
+    default_code = 'precondition_required'
+
+
+def _ticket_etag(ticket, variant=''):
+    """ETag forte "<id>-v<versione>-<hash>": la versione serve anche per If-Match negli update."""
+    digest = hashlib.md5(f"{ticket.updated_at.isoformat()}|{variant}".encode()).hexdigest()[:12]
+    return f'"{ticket.pk}-v{ticket.version}-{digest}"'
+
+
+_TICKET_ETAG_RE = re.compile(r'^(?:W/)?"(?P<pk>\d+)-v(?P<version>\d+)(?:-[0-9a-f]+)?"$')
+
+
+def _expected_version(request, ticket):
+    """
+    Versione su cui il client basa la modifica: header If-Match (ETag del GET) o campo `version`
+    nel body. None = nessun controllo (ultimo che scrive vince), salvo TICKET_API_REQUIRE_VERSION.
+    """
+    if_match = request.headers.get('If-Match')
+    if if_match:
+        if if_match.strip() == '*':
+            return None
+        for tag in if_match.split(','):
+            m = _TICKET_ETAG_RE.match(tag.strip())
+            if m and int(m['pk']) == ticket.pk:
+                return int(m['version'])
+        return 0  # nessun ETag di questo ticket: non può corrispondere (412)
+    raw = request.data.get('version') if hasattr(request.data, 'get') else None
+    if raw not in (None, ''):
+        try:
+            return int(raw)
+        except (TypeError, ValueError):
+            raise ValidationError({'version': "Valore non valido."})
+    if settings.TICKET_API_REQUIRE_VERSION:
+        raise PreconditionRequired()
+    return None
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # il client può tenere la risposta ma deve sempre rivalidarla
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _encode_sync_cursor(updated_at, ticket_id, tombstone_id):
+    raw = json.dumps({'t': updated_at.isoformat() if updated_at else None, 'i': ticket_id, 'd': tombstone_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_sync_cursor(cursor):
+    """Cursore opaco → (updated_at, ticket_id, tombstone_id). Cursore vuoto = sync completa."""
+    if not cursor:
+        return None, 0, 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        updated_at = parse_datetime(data['t']) if data.get('t') else None
+        return updated_at, int(data.get('i') or 0), int(data.get('d') or 0)
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError({'since': "Cursore non valido."})
+
+
+def _encode_comment_cursor(created_at, comment_id):
+    raw = json.dumps({'t': created_at.isoformat(), 'i': comment_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_comment_cursor(cursor):
+    """Cursore opaco → (created_at, comment_id) dell'ultimo commento già letto; (None, 0) = dall'inizio."""
+    if not cursor:
+        return None, 0
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        created_at = parse_datetime(data['t'])
+        if created_at is None:
+            raise ValueError
+        return created_at, int(data['i'])
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError({'cursor': "Cursore non valido."})
+
+
+COMMENTS_PAGE_MAX = 200
+COMMENTS_BULK_MAX = 100
+
+
 class TicketViewSet(viewsets.ModelViewSet):
     serializer_class = TicketSerializer
     permission_classes = [IsAuthenticated, TicketPermissions]
@@ -49,6 +161,154 @@ class TicketViewSet(viewsets.ModelViewSet):
         qs = Ticket.objects.select_related('department', 'created_by', 'assignee').order_by('-created_at')
         return qs if is_staffish(user) else qs.filter(created_by=user)
 
+    def _requested_fields(self):
+        """`?fields=id,protocol,status` → lista validata (None = tutti i campi)."""
+        raw = self.request.query_params.get('fields') or ''
+        fields = [f.strip() for f in raw.split(',') if f.strip()]
+        if not fields:
+            return None
+        unknown = set(fields) - set(TicketSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': f"Campi sconosciuti: {', '.join(sorted(unknown))}"})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve', 'changes'):
+            kwargs.setdefault('fields', self._requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    # list/retrieve in sola lettura: replica (se configurata) + GET condizionale (ETag/Last-Modified)
+    def list(self, request, *args, **kwargs):
+        with read_from_replica(request):
+            queryset = self.filter_queryset(self.get_queryset())
+            # COUNT oltre a MAX(updated_at): così anche una cancellazione cambia l'ETag
+            agg = queryset.aggregate(last=Max('updated_at'), n=Count('id'))
+            # ...e per If-Modified-Since l'ultima cancellazione visibile (tombstone più recente, via pk)
+            tombs = TicketTombstone.objects.order_by('-id')
+            if not is_staffish(request.user):
+                tombs = tombs.filter(owner_id=request.user.id)
+            last_deleted = tombs.values_list('deleted_at', flat=True).first()
+            last = max(filter(None, (agg['last'], last_deleted)), default=None)
+            etag = _weak_etag('list', agg['n'], last and last.isoformat(), request.query_params.urlencode())
+            last_ts = int(last.timestamp()) if last else None
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_ts)
+            if not_modified is not None:
+                return not_modified
+            if self.paginator is None:
+                # percorso veloce: values_list + dict, stesso output di TicketSerializer
+                response = Response(serialize_ticket_rows(queryset, self._requested_fields()))
+            else:
+                response = super().list(request, *args, **kwargs)
+        return _set_validators(response, etag, last)
+
+    def retrieve(self, request, *args, **kwargs):
+        with read_from_replica(request):
+            instance = self.get_object()
+            etag = _ticket_etag(instance, request.query_params.urlencode())
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=int(instance.updated_at.timestamp())
+            )
+            if not_modified is not None:
+                return not_modified
+            response = Response(self.get_serializer(instance).data)
+        return _set_validators(response, etag, instance.updated_at)
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request):
+        """
+        Sync incrementale: ticket creati/modificati dopo `since` (+ cancellazioni).
+        Il client riparte da `next_cursor` finché `has_more` è true.
+        """
+        since_ts, since_id, since_tomb = _decode_sync_cursor(request.query_params.get('since'))
+        try:
+            limit = max(1, min(int(request.query_params.get('limit') or 200), 1000))
+        except ValueError:
+            raise ValidationError({'limit': "Valore non valido."})
+
+        # orizzonte: le transazioni ancora in volo (updated_at già assegnato, commit non ancora
+        # visibile) verranno lette al giro successivo invece di essere saltate per sempre
+        horizon = timezone.now() - timedelta(seconds=settings.TICKET_SYNC_SAFETY_SECONDS)
+
+        qs = self.get_queryset().order_by('updated_at', 'id').filter(updated_at__lte=horizon)
+        if since_ts is not None:
+            qs = qs.filter(updated_at__gte=since_ts).filter(
+                Q(updated_at__gt=since_ts) | Q(id__gt=since_id)
+            )
+        tickets = list(qs[:limit + 1])
+
+        tombs = TicketTombstone.objects.filter(id__gt=since_tomb, deleted_at__lte=horizon).order_by('id')
+        if not is_staffish(request.user):
+            tombs = tombs.filter(owner_id=request.user.id)
+        tombs = list(tombs[:limit + 1])
+
+        has_more = len(tickets) > limit or len(tombs) > limit
+        tickets, tombs = tickets[:limit], tombs[:limit]
+
+        if tickets:
+            since_ts, since_id = tickets[-1].updated_at, tickets[-1].id
+        if tombs:
+            since_tomb = tombs[-1].id
+
+        return Response({
+            'results': self.get_serializer(tickets, many=True).data,
+            'deleted': [
+                {'id': t.ticket_id, 'protocol': t.protocol, 'deleted_at': t.deleted_at}
+                for t in tombs
+            ],
+            'next_cursor': _encode_sync_cursor(since_ts, since_id, since_tomb),
+            'has_more': has_more,
+        })
+
+    @action(detail=True, methods=['get', 'post'], url_path='comments')
+    def comments(self, request, pk=None):
+        """
+        GET: commenti in ordine cronologico, paginati a keyset (`?cursor=…&limit=50`; i commenti
+        interni solo allo staff). POST: un commento o una lista (max COMMENTS_BULK_MAX), un solo INSERT.
+        """
+        ticket = self.get_object()
+        staff = is_staffish(request.user)
+        if request.method == 'POST':
+            return self._add_comments(request, ticket, staff)
+
+        try:
+            limit = max(1, min(int(request.query_params.get('limit') or 50), COMMENTS_PAGE_MAX))
+        except ValueError:
+            raise ValidationError({'limit': "Valore non valido."})
+        after_ts, after_id = _decode_comment_cursor(request.query_params.get('cursor'))
+
+        qs = Comment.objects.filter(ticket=ticket).select_related('author').order_by('created_at', 'id')
+        if not staff:
+            qs = qs.filter(is_internal=False)
+        if after_ts is not None:
+            qs = qs.filter(created_at__gte=after_ts).filter(Q(created_at__gt=after_ts) | Q(id__gt=after_id))
+        comments = list(qs[:limit + 1])
+        has_more = len(comments) > limit
+        comments = comments[:limit]
+
+        return Response({
+            'results': CommentSerializer(comments, many=True).data,
+            'next_cursor': (_encode_comment_cursor(comments[-1].created_at, comments[-1].pk)
+                            if comments else request.query_params.get('cursor')),
+            'has_more': has_more,
+        })
+
+    def _add_comments(self, request, ticket, staff):
+        many = isinstance(request.data, list)
+        if many and not 1 <= len(request.data) <= COMMENTS_BULK_MAX:
+            raise ValidationError({'non_field_errors': f"Da 1 a {COMMENTS_BULK_MAX} commenti per richiesta."})
+        serializer = CommentSerializer(data=request.data, many=many)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data if many else [serializer.validated_data]
+        if not staff and any(item.get('is_internal') for item in items):
+            raise ValidationError({'is_internal': "Solo lo staff può scrivere commenti interni."})
+        data = CommentSerializer(add_comments(ticket, request.user, items), many=True).data
+        return Response(data if many else data[0], status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='duplicates')
+    def duplicates(self, request):
+        """Ticket aperti simili a quello che si sta per creare (stessi campi del POST di creazione)."""
+        return Response(_duplicate_suggestions(request.user, request.data))
+
     # create custom per usare il service che invia la mail e assegna il protocollo
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -60,6 +320,41 @@ class TicketViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(out.data)
         return Response(out.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    # update/partial_update: concorrenza ottimistica (If-Match / version) senza lock tra lettura e scrittura
+    def update(self, request, *args, **kwargs):
+        try:
+            response = super().update(request, *args, **kwargs)
+        except TicketConflict as exc:
+            current = exc.ticket
+            current.refresh_from_db()
+            code = status.HTTP_412_PRECONDITION_FAILED if request.headers.get('If-Match') else status.HTTP_409_CONFLICT
+            return Response({
+                'detail': f"Il ticket è stato modificato da un'altra richiesta (versione attuale {current.version}): "
+                          f"rileggilo e riapplica la modifica.",
+                'current': self.get_serializer(current).data,
+            }, status=code, headers={'ETag': _ticket_etag(current)})
+        response['ETag'] = _ticket_etag(self._updated)
+        return response
+
+    # un cambio di assegnatario aggiorna i carichi e va in audit
+    @transaction.atomic
+    def perform_update(self, serializer):
+        ticket = serializer.instance
+        if not ticket.claim_version(_expected_version(self.request, ticket)):
+            raise TicketConflict(ticket)
+        old_assignee_id = ticket.assignee_id
+        ticket = serializer.save()
+        record_reassignment(ticket, old_assignee_id, self.request.user)
+        self._updated = ticket
+
+
+# Statistiche cache token del processo che risponde (solo staff)
+@api_view(['GET'])
+def api_auth_stats(request):
+    if not is_staffish(request.user):
+        raise PermissionDenied("Non autorizzato")
+    return Response(authentication.stats())
+
 
 # ------------------- LANDING & DASHBOARD -------------------
 def landing(request):
@@ -68,33 +363,63 @@ def landing(request):
     return redirect('dash_team' if is_staffish(request.user) else 'dash_operator')
 
 
+# Filtri comuni a dashboard ed export CSV (TicketFilterForm già validato)
+def _filter_tickets(qs, cd, user):
+    q = cd.get('q')
+    proto = search.parse_protocol(q)
+    if proto:
+        # protocollo completo/parziale: solo indice su `protocol`, niente LIKE '%...%'
+        qs = search.filter_protocol(qs, proto)
+    elif q:
+        # testo degli allegati: sottoquery sull'indice GIN full-text, valutata una volta sola
+        in_attachments = AttachmentText.objects.filter(
+            search=SearchQuery(q, config=text_extraction.SEARCH_CONFIG)).values('ticket_id')
+        qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q) | Q(protocol__icontains=q)
+                       | Q(pk__in=in_attachments))
+    if cd.get('status'):
+        qs = qs.filter(status=cd['status'])
+    if cd.get('priority'):
+        qs = qs.filter(priority=cd['priority'])
+    dep_id = int(cd['department']) if cd.get('department') else None
+    if dep_id:
+        qs = qs.filter(department_id=dep_id)
+    if cd.get('category'):
+        # FK intera indicizzata: gli id arrivano dalla cache tassonomia, niente confronto su varchar
+        qs = qs.filter(category_ref_id__in=taxonomy.category_ids(cd['category'], department_id=dep_id))
+        # opzionale: se Altro e l'utente ha scritto un testo, filtra per testo
+        if cd['category'] == OTHER_CODE and cd.get('category_other'):
+            qs = qs.filter(category_other__icontains=cd['category_other'])
+    if cd.get('date_from'):
+        start = timezone.make_aware(datetime.combine(cd['date_from'], time.min))
+        qs = qs.filter(created_at__gte=start)
+    if cd.get('date_to'):
+        end = timezone.make_aware(datetime.combine(cd['date_to'], time.max))
+        qs = qs.filter(created_at__lte=end)
+    if cd.get('mine_only'):
+        qs = qs.filter(created_by=user)
+    return qs
+
+
+def _protocol_hit(qs, cd):
+    """Id del ticket se `q` è un protocollo completo e il ticket è tra i risultati (redirect al dettaglio)."""
+    proto = search.parse_protocol(cd.get('q'))
+    if proto and proto.exact:
+        return qs.values_list('pk', flat=True).first()
+    return None
+
+
 @login_required
+@replica_reads
 def operator_dashboard(request):
     qs = Ticket.objects.select_related('department').filter(created_by=request.user)
 
     form = TicketFilterForm(request.GET or None, user=request.user, is_team=False)
     if form.is_valid():
         cd = form.cleaned_data
-        q = cd.get('q')
-        if q:
-            qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q) | Q(protocol__icontains=q))
-        if cd.get('status'):
-            qs = qs.filter(status=cd['status'])
-        if cd.get('priority'):
-            qs = qs.filter(priority=cd['priority'])
-        if cd.get('department'):
-            qs = qs.filter(department_id=int(cd['department']))
-        if cd.get('category'):
-            qs = qs.filter(category=cd['category'])
-            # opzionale: se Altro e l'utente ha scritto un testo, filtra per testo
-            if cd['category'] == OTHER_CODE and cd.get('category_other'):
-                qs = qs.filter(category_other__icontains=cd['category_other'])
-        if cd.get('date_from'):
-            start = timezone.make_aware(datetime.combine(cd['date_from'], time.min))
-            qs = qs.filter(created_at__gte=start)
-        if cd.get('date_to'):
-            end = timezone.make_aware(datetime.combine(cd['date_to'], time.max))
-            qs = qs.filter(created_at__lte=end)
+        qs = _filter_tickets(qs, cd, request.user)
+        hit = _protocol_hit(qs, cd)
+        if hit:
+            return redirect('ticket_detail', pk=hit)
         page_size = int(cd.get('page_size') or 25)
     else:
         page_size = 25
@@ -103,12 +428,6 @@ def operator_dashboard(request):
     paginator = Paginator(qs, page_size)
     page_number = request.GET.get('page') or 1
     page_obj = paginator.get_page(page_number)
-    dep_code_by_id = dict(Department.objects.all().values_list('id', 'code'))
-    category_map = {
-        "ICT": list(ICT_CATEGORY_CHOICES),
-        "WH": list(WH_CATEGORY_CHOICES),
-        "SP": list(SP_CATEGORY_CHOICES),
-    }
 
     return render(request, 'dash/operator.html', {
         'filter_form': form,
@@ -116,13 +435,13 @@ def operator_dashboard(request):
         'page_obj': page_obj,
         'paginator': paginator,
         'OTHER_CODE': OTHER_CODE,  # per lo snippet JS del filtro
-        'category_map': category_map,        # mappa reparto->categorie
-        'dep_code_by_id': dep_code_by_id,    # mappa id->codice reparto (ICT/WH/SP)
+        'taxonomy_version': taxonomy.asset_version(),  # mappe reparto/categorie via taxonomy_json
         'filters_open': _filters_open(request),
     })
 
 
 @login_required
+@replica_reads
 def team_dashboard(request):
     if not is_staffish(request.user):
         return redirect('dash_operator')
@@ -132,27 +451,10 @@ def team_dashboard(request):
     form = TicketFilterForm(request.GET or None, user=request.user, is_team=True)
     if form.is_valid():
         cd = form.cleaned_data
-        q = cd.get('q')
-        if q:
-            qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q) | Q(protocol__icontains=q))
-        if cd.get('status'):
-            qs = qs.filter(status=cd['status'])
-        if cd.get('priority'):
-            qs = qs.filter(priority=cd['priority'])
-        if cd.get('department'):
-            qs = qs.filter(department_id=int(cd['department']))
-        if cd.get('category'):
-            qs = qs.filter(category=cd['category'])
-            if cd['category'] == OTHER_CODE and cd.get('category_other'):
-                qs = qs.filter(category_other__icontains=cd['category_other'])
-        if cd.get('date_from'):
-            start = timezone.make_aware(datetime.combine(cd['date_from'], time.min))
-            qs = qs.filter(created_at__gte=start)
-        if cd.get('date_to'):
-            end = timezone.make_aware(datetime.combine(cd['date_to'], time.max))
-            qs = qs.filter(created_at__lte=end)
-        if cd.get('mine_only'):
-            qs = qs.filter(created_by=request.user)
+        qs = _filter_tickets(qs, cd, request.user)
+        hit = _protocol_hit(qs, cd)
+        if hit:
+            return redirect('ticket_detail', pk=hit)
         page_size = int(cd.get('page_size') or 25)
     else:
         page_size = 25
@@ -161,12 +463,6 @@ def team_dashboard(request):
     paginator = Paginator(qs, page_size)
     page_number = request.GET.get('page') or 1
     page_obj = paginator.get_page(page_number)
-    dep_code_by_id = dict(Department.objects.all().values_list('id', 'code'))
-    category_map = {
-        "ICT": list(ICT_CATEGORY_CHOICES),
-        "WH": list(WH_CATEGORY_CHOICES),
-        "SP": list(SP_CATEGORY_CHOICES),
-    }
 
     return render(request, 'dash/team.html', {
         'filter_form': form,
@@ -174,35 +470,165 @@ def team_dashboard(request):
         'page_obj': page_obj,
         'paginator': paginator,
         'OTHER_CODE': OTHER_CODE,  # per lo snippet JS del filtro
-        'category_map': category_map,
-        'dep_code_by_id': dep_code_by_id,
+        'taxonomy_version': taxonomy.asset_version(),
         'filters_open': _filters_open(request),
+        'live_events': settings.LIVE_EVENTS,
+        'bulk_form': BulkActionForm(),
     })
 
 
+# Azioni massive dalla dashboard team (stato / assegnatario dei ticket selezionati)
+@login_required
+@require_POST
+def team_bulk_action(request):
+    if not is_staffish(request.user):
+        raise PermissionDenied("Non autorizzato")
+
+    next_url = request.POST.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = 'dash_team'
+
+    form = BulkActionForm(request.POST)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for e in errors:
+                messages.error(request, e)
+        return redirect(next_url)
+
+    cd = form.cleaned_data
+    if cd['action'] == 'status':
+        n = bulk_change_status(cd['ticket_ids'], cd['status'], request.user)
+    else:
+        n = bulk_assign(cd['ticket_ids'], cd['assignee'], request.user)
+    skipped = len(cd['ticket_ids']) - n
+    messages.success(request, f"{n} ticket aggiornati." + (f" {skipped} già allineati o inesistenti." if skipped else ""))
+    return redirect(next_url)
+
+
+# Stream SSE per la dashboard team (richiede il server ASGI, vedi LIVE_EVENTS)
+async def team_events(request):
+    # con LIVE_EVENTS spento (server WSGI) lo stream terrebbe occupato un worker per sempre
+    if not settings.LIVE_EVENTS:
+        raise Http404("Aggiornamenti live disattivati")
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not await sync_to_async(is_staffish)(user):
+        raise PermissionDenied("Non autorizzato")
+
+    async def stream():
+        queue = broker.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # keep-alive per proxy/nginx
+                    continue
+                data = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+                yield f"event: {event['event']}\ndata: {data}\n\n"
+        finally:
+            broker.unsubscribe(queue)
+
+    resp = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    resp['Cache-Control'] = 'no-cache'
+    resp['X-Accel-Buffering'] = 'no'
+    return resp
+
+
+# Mappe reparto/categorie come asset JSON versionato (al posto di json_script in ogni pagina)
+@login_required
+def taxonomy_json(request):
+    data = taxonomy.get_taxonomy()
+    etag = f'"{data["asset_version"]}"'
+    if request.headers.get('If-None-Match') == etag:
+        resp = HttpResponse(status=304)
+    else:
+        resp = HttpResponse(data['asset'], content_type='application/json; charset=utf-8')
+    resp['ETag'] = etag
+    if request.GET.get('v') == data['asset_version']:
+        # URL versionato: il contenuto non cambia mai
+        patch_cache_control(resp, private=True, max_age=31536000, immutable=True)
+    else:
+        patch_cache_control(resp, private=True, no_cache=True)
+    return resp
+
+
+def _duplicate_suggestions(user, data):
+    """
+    Possibili duplicati per UI e API: {'results': [...], 'hidden_count': n}.
+    Dei ticket che l'utente non può aprire (non staff, non autore) si restituisce solo il numero.
+    """
+    try:
+        department_id = int(data.get('department') or 0)
+    except (TypeError, ValueError):
+        department_id = 0
+    # tutti possono aprire ticket in ogni reparto, ma solo in quelli esistenti
+    if department_id not in taxonomy.dep_code_by_id():
+        raise ValidationError({'department': "Valore non valido."})
+    found = duplicates.find_duplicates(
+        department_id,
+        str(data.get('title') or '')[:120],
+        str(data.get('description') or '')[:duplicates.DESCRIPTION_CHARS],
+        category=str(data.get('category') or ''),
+        asset_code=str(data.get('asset_code') or ''),
+    )
+    staff = is_staffish(user)
+    status_labels = dict(Ticket.STATUS_CHOICES)
+    results, hidden = [], 0
+    for item in found:
+        t = item['ticket']
+        if not (staff or t['created_by_id'] == user.id):
+            hidden += 1
+            continue
+        results.append({
+            'id': t['id'],
+            'protocol': t['protocol'],
+            'title': t['title'],
+            'status': t['status'],
+            'status_display': status_labels.get(t['status'], t['status']),
+            'created_at': t['created_at'],
+            'score': item['score'],
+            'url': reverse('ticket_detail', args=[t['id']]),
+        })
+    return {'results': results, 'hidden_count': hidden}
+
+
+# Possibili duplicati mentre si compila il nuovo ticket
+@login_required
+def ticket_duplicates(request):
+    try:
+        suggestions = _duplicate_suggestions(request.user, request.GET)
+    except ValidationError:
+        return JsonResponse({'error': 'Reparto non valido.'}, status=400)
+    return JsonResponse(suggestions)
+
+
+# Autocomplete location/asset_code del nuovo ticket (valori distinti più usati)
+@login_required
+@replica_reads
+def field_autocomplete(request):
+    field = request.GET.get('field') or ''
+    if field not in suggest.FIELDS:
+        return JsonResponse({'error': 'Campo non valido.'}, status=400)
+    results = suggest.suggest(field, (request.GET.get('q') or '')[:120])
+    resp = JsonResponse({'results': results})
+    # i valori cambiano lentamente: il browser può riusare la risposta per qualche minuto
+    patch_cache_control(resp, private=True, max_age=300)
+    return resp
+
+
 # ------------------- EXPORT CSV -------------------
 @login_required
+@replica_reads
 def operator_export_csv(request):
     qs = Ticket.objects.select_related('department', 'created_by', 'assignee').filter(created_by=request.user)
 
     form = TicketFilterForm(request.GET or None, user=request.user, is_team=False)
     if form.is_valid():
         cd = form.cleaned_data
-        q = cd.get('q')
-        if q:
-            qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q) | Q(protocol__icontains=q))
-        if cd.get('status'):
-            qs = qs.filter(status=cd['status'])
-        if cd.get('priority'):
-            qs = qs.filter(priority=cd['priority'])
-        if cd.get('department'):
-            qs = qs.filter(department_id=int(cd['department']))
-        if cd.get('date_from'):
-            start = timezone.make_aware(datetime.combine(cd['date_from'], time.min))
-            qs = qs.filter(created_at__gte=start)
-        if cd.get('date_to'):
-            end = timezone.make_aware(datetime.combine(cd['date_to'], time.max))
-            qs = qs.filter(created_at__lte=end)
+        qs = _filter_tickets(qs, cd, request.user)
 
     qs = qs.order_by('-created_at')[:10000]
 
@@ -225,6 +651,7 @@ def operator_export_csv(request):
 
 
 @login_required
+@replica_reads
 def team_export_csv(request):
     if not is_staffish(request.user):
         return redirect('dash_operator')
@@ -234,23 +661,7 @@ def team_export_csv(request):
     form = TicketFilterForm(request.GET or None, user=request.user, is_team=True)
     if form.is_valid():
         cd = form.cleaned_data
-        q = cd.get('q')
-        if q:
-            qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q) | Q(protocol__icontains=q))
-        if cd.get('status'):
-            qs = qs.filter(status=cd['status'])
-        if cd.get('priority'):
-            qs = qs.filter(priority=cd['priority'])
-        if cd.get('department'):
-            qs = qs.filter(department_id=int(cd['department']))
-        if cd.get('date_from'):
-            start = timezone.make_aware(datetime.combine(cd['date_from'], time.min))
-            qs = qs.filter(created_at__gte=start)
-        if cd.get('date_to'):
-            end = timezone.make_aware(datetime.combine(cd['date_to'], time.max))
-            qs = qs.filter(created_at__lte=end)
-        if cd.get('mine_only'):
-            qs = qs.filter(created_by=request.user)
+        qs = _filter_tickets(qs, cd, request.user)
 
     qs = qs.order_by('-created_at')[:10000]
 
@@ -272,14 +683,177 @@ def team_export_csv(request):
     return response
 
 
+# ------------------- REPORT TEMPI (staff) -------------------
+def _resolution_report(request):
+    form = ReportFilterForm(request.GET or None)
+    date_from, date_to = form.period()
+    department_id = form.cleaned_data.get('department') if form.is_valid() else None
+    rows = analytics.weekly_report(date_from, date_to, department_id=int(department_id) if department_id else None)
+
+    labels = {(dep, value): label for dep, pairs in taxonomy.category_map().items() for value, label in pairs}
+    for row in rows:
+        row['category_label'] = labels.get((row['department'], row['category']), row['category'])
+    return form, date_from, date_to, rows
+
+
+@login_required
+@replica_reads
+def team_reports(request):
+    if not is_staffish(request.user):
+        return redirect('dash_operator')
+    form, date_from, date_to, rows = _resolution_report(request)
+    return render(request, 'dash/reports.html', {
+        'form': form,
+        'date_from': date_from,
+        'date_to': date_to,
+        'rows': rows,
+    })
+
+
+@login_required
+@replica_reads
+def team_reports_csv(request):
+    if not is_staffish(request.user):
+        return redirect('dash_operator')
+    _form, date_from, date_to, rows = _resolution_report(request)
+
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="tempi_{date_from:%Y%m%d}_{date_to:%Y%m%d}.csv"'
+    response.write('\ufeff')
+    writer = csv.writer(response, delimiter=';')
+    writer.writerow([
+        'Settimana', 'Comparto', 'Categoria', 'Ticket',
+        'Presi in carico', 'Presa in carico media (min)', 'Presa in carico p50 (min)', 'Presa in carico p90 (min)',
+        'Risolti', 'Risoluzione media (min)', 'Risoluzione p50 (min)', 'Risoluzione p90 (min)',
+    ])
+
+    def minutes(stats, key):
+        if not stats or stats[key] is None:
+            return ''
+        return round(stats[key] / 60)
+
+    for r in rows:
+        resp, res = r['response'], r['resolution']
+        writer.writerow([
+            r['week'].strftime('%d/%m/%Y'), r['department'], r['category_label'], r['tickets'],
+            resp['count'] if resp else 0, minutes(resp, 'avg'), minutes(resp, 'p50'), minutes(resp, 'p90'),
+            res['count'] if res else 0, minutes(res, 'avg'), minutes(res, 'p50'), minutes(res, 'p90'),
+        ])
+    return response
+
+
+# ------------------- ARCHIVIO (ticket chiusi spostati fuori dalle tabelle calde) -------------------
+@login_required
+@replica_reads
+def archive_search(request):
+    qs = ArchivedTicket.objects.defer('document').order_by('-closed_at')
+    if not is_staffish(request.user):
+        qs = qs.filter(created_by_id=request.user.id)
+
+    q = (request.GET.get('q') or '').strip()
+    proto = search.parse_protocol(q)
+    if proto:
+        qs = search.filter_protocol(qs, proto)
+    elif q:
+        qs = qs.filter(Q(protocol__istartswith=q) | Q(title__icontains=q))
+    dep = (request.GET.get('department') or '').strip()
+    if dep:
+        qs = qs.filter(department_code=dep)
+
+    page_obj = Paginator(qs, 25).get_page(request.GET.get('page') or 1)
+    return render(request, 'dash/archive.html', {
+        'page_obj': page_obj,
+        'tickets': page_obj.object_list,
+        'q': q,
+        'department': dep,
+        'departments': [code for _id, code in taxonomy.department_choices()],
+    })
+
+
+@login_required
+@replica_reads
+def archived_ticket_detail(request, ticket_id: int):
+    archived = get_object_or_404(ArchivedTicket, ticket_id=ticket_id)
+    staff = is_staffish(request.user)
+    if not (archived.created_by_id == request.user.id or staff):
+        raise PermissionDenied("Non autorizzato")
+
+    doc = archived.document
+    comments = doc.get('comments', [])
+    if not staff:
+        comments = [c for c in comments if not c.get('is_internal')]
+    audits = doc.get('audits', [])
+    action_labels = dict(AuditLog.Action.choices)
+    for a in audits:
+        a['action_display'] = action_labels.get(a['action'], a['action'])
+    attachments = doc.get('attachments', [])
+    for index, a in enumerate(attachments):
+        # le righe Attachment non esistono più: download dal documento (decompresso se COLD)
+        a['download_url'] = reverse('archived_attachment_download', args=[archived.ticket_id, index])
+    # date serializzate in ISO nel documento JSON
+    for item in comments + audits + attachments:
+        for key in ('created_at', 'uploaded_at'):
+            if isinstance(item.get(key), str):
+                item[key] = parse_datetime(item[key])
+    return render(request, 'tickets/archived_detail.html', {
+        'archived': archived,
+        'ticket': doc['ticket'],
+        'comments': comments,
+        'audits': audits,
+        'attachments': attachments,
+        'status_display': dict(Ticket.STATUS_CHOICES).get(doc['ticket'].get('status'), ''),
+        'priority_display': dict(Ticket.PRIORITY_CHOICES).get(doc['ticket'].get('priority'), ''),
+    })
+
+
+# Download di un allegato del tier COLD: decompresso al volo, a blocchi
+@login_required
+def attachment_download(request, pk: int):
+    att = get_object_or_404(Attachment.objects.select_related('ticket'), pk=pk)
+    if not (att.ticket.created_by_id == request.user.id or is_staffish(request.user)):
+        raise PermissionDenied("Non autorizzato")
+    if not att.compression:
+        return redirect(att.file.url)
+
+    resp = StreamingHttpResponse(storage_tiers.iter_decompressed(att),
+                                 content_type=att.mime_type or 'application/octet-stream')
+    resp['Content-Length'] = str(att.size)
+    resp['Content-Disposition'] = content_disposition_header(True, att.original_name or 'allegato')
+    return resp
+
+
+# Download di un allegato di un ticket archiviato: metadati dal documento, file ancora su disco
+@login_required
+def archived_attachment_download(request, ticket_id: int, index: int):
+    archived = get_object_or_404(ArchivedTicket.objects.only('ticket_id', 'created_by_id', 'document'),
+                                 ticket_id=ticket_id)
+    if not (archived.created_by_id == request.user.id or is_staffish(request.user)):
+        raise PermissionDenied("Non autorizzato")
+    attachments = archived.document.get('attachments', [])
+    if index >= len(attachments):
+        raise Http404("Allegato non trovato")
+    att = attachments[index]
+    if not att.get('compression'):
+        return redirect(default_storage.url(att['file']))
+
+    resp = StreamingHttpResponse(storage_tiers.iter_decompressed_file(att['file'], att['compression']),
+                                 content_type=att.get('mime_type') or 'application/octet-stream')
+    resp['Content-Length'] = str(att['size'])
+    resp['Content-Disposition'] = content_disposition_header(True, att.get('original_name') or 'allegato')
+    return resp
+
+
 # ------------------- DETTAGLIO & CREAZIONE -------------------
 @login_required
 def ticket_detail(request, pk: int):
-    ticket = get_object_or_404(
-        Ticket.objects.select_related('department', 'created_by', 'assignee')
-                      .prefetch_related('comments', 'attachments', 'audits'),
-        pk=pk
-    )
+    ticket = (Ticket.objects.select_related('department', 'created_by', 'assignee')
+                            .prefetch_related('comments', 'attachments', 'audits')
+                            .filter(pk=pk).first())
+    if ticket is None:
+        # ticket archiviato: vecchi link (email, bookmark) portano alla copia in archivio
+        if ArchivedTicket.objects.filter(ticket_id=pk).exists():
+            return redirect('archived_ticket_detail', ticket_id=pk)
+        raise Http404("Ticket non trovato")
 
     # Autorizzazione
     if not (ticket.created_by_id == request.user.id or is_staffish(request.user)):
@@ -289,6 +863,7 @@ def ticket_detail(request, pk: int):
 
     comment_form = CommentForm()
     attach_form = AttachmentUploadForm()
+    conflict = None
 
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -298,22 +873,8 @@ def ticket_detail(request, pk: int):
             form = CommentForm(request.POST)
             if form.is_valid():
                 is_internal = form.cleaned_data.get('is_internal') if can_change_status else False
-                c = Comment.objects.create(
-                    ticket=ticket,
-                    author=request.user,
-                    body=form.cleaned_data['body'],
-                    is_internal=is_internal
-                )
-
-                # Email SOLO se pubblico
-                if not c.is_internal:
-                    send_new_public_comment(c)
-
-                # Audit
-                try:
-                    log_comment(ticket, actor=request.user, comment=c)
-                except Exception:
-                    pass
+                # salva + audit + email (solo se pubblico)
+                add_comments(ticket, request.user, [{'body': form.cleaned_data['body'], 'is_internal': is_internal}])
 
                 messages.success(request, "Commento aggiunto.")
                 return redirect('ticket_detail', pk=ticket.pk)
@@ -356,31 +917,33 @@ def ticket_detail(request, pk: int):
         elif action == 'change_status' and can_change_status:
             new_status = request.POST.get('status')
             valid = dict(Ticket.STATUS_CHOICES)
+            try:
+                # versione mostrata nel form: se nel frattempo un altro coordinatore ha modificato il ticket → conflitto
+                expected_version = int(request.POST['version']) if request.POST.get('version') else None
+            except ValueError:
+                expected_version = 0
             if new_status in valid:
-                old_status_display = ticket.get_status_display()
-                ticket.status = new_status
-                ticket.save(update_fields=['status', 'updated_at'])
-
-                # Email di notifica
-                send_ticket_status_changed(ticket, old_status_display, actor=request.user)
-
-                # Audit
                 try:
-                    log_status_change(
-                        ticket,
-                        actor=request.user,
-                        old=old_status_display,
-                        new=ticket.get_status_display()
-                    )
-                except Exception:
-                    pass
-
-                messages.success(request, f"Stato aggiornato a: {valid[new_status]}")
-                return redirect('ticket_detail', pk=ticket.pk)
+                    # salva + email + audit + evento live
+                    change_ticket_status(ticket, new_status, actor=request.user, expected_version=expected_version)
+                except TicketConflict:
+                    ticket.refresh_from_db()
+                    last = ticket.audits.select_related('actor').order_by('-created_at').first()
+                    conflict = {
+                        'wanted': valid[new_status],
+                        'current': ticket.get_status_display(),
+                        'by': last.actor if last else None,
+                        'at': last.created_at if last else ticket.updated_at,
+                    }
+                else:
+                    messages.success(request, f"Stato aggiornato a: {valid[new_status]}")
+                    return redirect('ticket_detail', pk=ticket.pk)
             else:
                 messages.error(request, "Stato non valido.")
 
     comments = ticket.comments.select_related('author').order_by('created_at')
+    if not can_change_status:
+        comments = comments.filter(is_internal=False)  # i commenti interni restano allo staff
     attachments = ticket.attachments.order_by('-uploaded_at')
 
     return render(request, 'tickets/detail.html', {
@@ -391,20 +954,16 @@ def ticket_detail(request, pk: int):
         'attach_form': attach_form,
         'can_change_status': can_change_status,
         'status_choices': Ticket.STATUS_CHOICES,
-        'OTHER_CODE': OTHER_CODE,  # per il template
-    })
+        'conflict': conflict,
+    }, status=409 if conflict else 200)
 
 
 @login_required
 def new_ticket(request):
-    # ID reparti per il JS (ok se qualcuno non esiste)
-    ict_dep = Department.objects.filter(code__iexact="ICT").only("id").first()
-    wh_dep  = Department.objects.filter(code__iexact="WH").only("id").first()
-    sp_dep  = Department.objects.filter(code__iexact="SP").only("id").first()
-
-    ict_dep_id = ict_dep.id if ict_dep else None
-    wh_dep_id  = wh_dep.id if wh_dep else None
-    sp_dep_id  = sp_dep.id if sp_dep else None
+    # ID reparti per il JS (ok se qualcuno non esiste) — dalla cache in-process
+    ict_dep_id = taxonomy.department_id("ICT")
+    wh_dep_id  = taxonomy.department_id("WH")
+    sp_dep_id  = taxonomy.department_id("SP")
 
     if request.method == 'POST':
         form = NewTicketForm(request.POST, request.FILES)
@@ -455,9 +1014,9 @@ def new_ticket(request):
             'ict_dep_id': ict_dep_id,
             'wh_dep_id':  wh_dep_id,
             'sp_dep_id':  sp_dep_id,
-            'ICT_CATEGORY_CHOICES': ICT_CATEGORY_CHOICES,
-            'WH_CATEGORY_CHOICES':  WH_CATEGORY_CHOICES,
-            'SP_CATEGORY_CHOICES':  SP_CATEGORY_CHOICES,
+            'ICT_CATEGORY_CHOICES': taxonomy.category_choices("ICT"),
+            'WH_CATEGORY_CHOICES':  taxonomy.category_choices("WH"),
+            'SP_CATEGORY_CHOICES':  taxonomy.category_choices("SP"),
             'OTHER_CODE': OTHER_CODE,
         })
 
@@ -468,14 +1027,15 @@ def new_ticket(request):
         'ict_dep_id': ict_dep_id,
         'wh_dep_id':  wh_dep_id,
         'sp_dep_id':  sp_dep_id,
-        'ICT_CATEGORY_CHOICES': ICT_CATEGORY_CHOICES,
-        'WH_CATEGORY_CHOICES':  WH_CATEGORY_CHOICES,
-        'SP_CATEGORY_CHOICES':  SP_CATEGORY_CHOICES,
+        'ICT_CATEGORY_CHOICES': taxonomy.category_choices("ICT"),
+        'WH_CATEGORY_CHOICES':  taxonomy.category_choices("WH"),
+        'SP_CATEGORY_CHOICES':  taxonomy.category_choices("SP"),
         'OTHER_CODE': OTHER_CODE,
     })
 
 
 @login_required
+@replica_reads
 def ticket_audit_csv(request, pk: int):
     ticket = get_object_or_404(Ticket, pk=pk)
     if not (ticket.created_by_id == request.user.id or is_staffish(request.user)):
@@ -0,0 +1,317 @@
+# tickets/webhooks.py
+"""
+Webhook verso sistemi esterni (WebhookSubscription), alimentati dagli stessi punti di audit.py.
+
+- Outbox: `enqueue()` scrive una riga WebhookDelivery per sottoscrittore nella stessa
+  transazione del cambiamento (un solo INSERT). La richiesta HTTP dell'utente non fa
+  mai I/O verso l'esterno; se la transazione va in rollback l'evento sparisce con lei.
+- Consegna: `manage.py deliver_webhooks` prende le righe pronte con un lease
+  (FOR UPDATE SKIP LOCKED, più worker in parallelo), le raggruppa per sottoscrittore e
+  invia un POST per batch su una connessione keep-alive per endpoint, riusata tra i giri.
+- Firma: header X-ATIcketing-Signature = "sha256=" + HMAC-SHA256(secret, "<timestamp>.<body>"),
+  con X-ATIcketing-Timestamp; il ricevente rifiuta timestamp troppo vecchi (replay).
+- Errori (rete, timeout, risposta non 2xx): nuovo tentativo con backoff esponenziale e
+  jitter; dopo WEBHOOKS_MAX_ATTEMPTS la consegna diventa FAILED.
+- Sottoscrizione disattivata: le sue consegne PENDING diventano subito FAILED (`fail_inactive()`,
+  dal signal e dal giro di pulizia del worker), invece di restare in coda per sempre.
+- `stub_server()`: ricevente di prova (manage.py webhook_stub_server e test).
+"""
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import random
+import ssl
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from . import taxonomy
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTIONS_KEY = 'webhooks:subscriptions'
+SUBSCRIPTIONS_TTL = 60  # secondi; invalidata anche dai signal (vedi signals.py)
+
+SIGNATURE_HEADER = 'X-ATIcketing-Signature'
+TIMESTAMP_HEADER = 'X-ATIcketing-Timestamp'
+USER_AGENT = 'ATIcketing-Webhooks/1'
+LEASE = timedelta(minutes=2)  # righe prese da un worker: invisibili agli altri fino a scadenza
+BACKOFF_BASE = 10             # secondi: 10, 20, 40, ... fino a BACKOFF_MAX
+BACKOFF_MAX = 3600
+ERROR_CHARS = 300
+INACTIVE_ERROR = 'Sottoscrizione disattivata'
+
+
+def max_attempts():
+    return getattr(settings, 'WEBHOOKS_MAX_ATTEMPTS', 10)
+
+
+# --- Accodamento (dentro la transazione della richiesta) ---
+
+def invalidate_subscriptions():
+    cache.delete(SUBSCRIPTIONS_KEY)
+
+
+def _subscriptions():
+    subs = cache.get(SUBSCRIPTIONS_KEY)
+    if subs is None:
+        from .models import WebhookSubscription
+        subs = [
+            (s.pk, s.events, s.department_id)
+            for s in WebhookSubscription.objects.filter(is_active=True).only('id', 'events', 'department_id')
+        ]
+        cache.set(SUBSCRIPTIONS_KEY, subs, SUBSCRIPTIONS_TTL)
+    return subs
+
+
+def ticket_payload(ticket, **extra):
+    return {
+        'id': ticket.pk,
+        'protocol': ticket.protocol,
+        'title': ticket.title,
+        'department': taxonomy.dep_code_by_id().get(ticket.department_id),
+        'category': ticket.category or '',
+        'priority': ticket.priority,
+        'status': ticket.status,
+        'assignee_id': ticket.assignee_id,
+        'created_by_id': ticket.created_by_id,
+        'created_at': ticket.created_at,
+        'updated_at': ticket.updated_at,
+        **extra,
+    }
+
+
+def enqueue(event, items):
+    """items: [(ticket, extra)] → una consegna per (ticket, sottoscrittore interessato), un solo INSERT."""
+    subs = _subscriptions()
+    if not subs:
+        return 0
+    from .models import WebhookDelivery
+
+    rows = []
+    for ticket, extra in items:
+        payload = None
+        for sub_id, events, department_id in subs:
+            if (events and event not in events) or department_id not in (None, ticket.department_id):
+                continue
+            if payload is None:
+                payload = ticket_payload(ticket, **extra)
+            rows.append(WebhookDelivery(subscription_id=sub_id, event=event, payload=payload))
+    WebhookDelivery.objects.bulk_create(rows)
+    return len(rows)
+
+
+def enqueue_ticket(event, ticket, **extra):
+    return enqueue(event, [(ticket, extra)])
+
+
+# --- Firma ---
+
+def sign(secret, timestamp, body):
+    mac = hmac.new(secret.encode('utf-8'), f"{timestamp}.".encode('ascii') + body, hashlib.sha256)
+    return 'sha256=' + mac.hexdigest()
+
+
+def verify(secret, timestamp, body, signature, tolerance=300, now=None):
+    """Per i riceventi (e lo stub server): firma valida e timestamp entro `tolerance` secondi."""
+    try:
+        age = abs((now or time.time()) - int(timestamp))
+    except (TypeError, ValueError):
+        return False
+    return age <= tolerance and hmac.compare_digest(sign(secret, timestamp, body), signature or '')
+
+
+# --- Consegna (worker) ---
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class Endpoint:
+    """Connessione HTTP/1.1 keep-alive verso un sottoscrittore. Usata da un solo thread per volta."""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.url = url
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        self.timeout = timeout
+        self.conn = None
+
+    def _connect(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                               context=ssl.create_default_context())
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def post(self, body, headers):
+        """Ritorna lo status HTTP; solleva OSError/HTTPException sugli errori di rete."""
+        # una connessione riusata può essere stata chiusa dal server: un secondo tentativo su una nuova
+        for reused in (self.conn is not None, False):
+            if self.conn is None:
+                self.conn = self._connect()
+            try:
+                self.conn.request('POST', self.path, body=body, headers=headers)
+                resp = self.conn.getresponse()
+                resp.read()  # va letta tutta per riusare la connessione
+                if resp.will_close:
+                    self.close()
+                return resp.status
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if not reused:
+                    raise
+            except Exception:
+                self.close()
+                raise
+
+
+def build_body(deliveries):
+    return json.dumps({
+        'deliveries': [
+            {'id': d.pk, 'event': d.event, 'created_at': d.created_at, 'data': d.payload}
+            for d in deliveries
+        ],
+    }, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def send_batch(endpoint, subscription, deliveries):
+    """Un POST con più eventi. Ritorna '' se consegnato, altrimenti il messaggio d'errore."""
+    body = build_body(deliveries)
+    timestamp = str(int(time.time()))
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': USER_AGENT,
+        TIMESTAMP_HEADER: timestamp,
+        SIGNATURE_HEADER: sign(subscription.secret, timestamp, body),
+        'X-ATIcketing-Deliveries': ','.join(str(d.pk) for d in deliveries),
+    }
+    try:
+        status = endpoint.post(body, headers)
+    except (OSError, http.client.HTTPException) as exc:
+        return f"{type(exc).__name__}: {exc}"[:ERROR_CHARS]
+    return '' if 200 <= status < 300 else f"HTTP {status}"
+
+
+def claim(limit, now=None):
+    """Consegne pronte, prese in lease: {subscription: [delivery, ...]} in ordine di creazione."""
+    from .models import WebhookDelivery
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(WebhookDelivery.objects
+                   .select_for_update(skip_locked=True)
+                   .filter(status='PENDING', next_attempt_at__lte=now, subscription__is_active=True)
+                   .order_by('next_attempt_at', 'id')
+                   .values_list('id', flat=True)[:limit])
+        if not ids:
+            return {}
+        WebhookDelivery.objects.filter(pk__in=ids).update(next_attempt_at=now + LEASE)
+    groups = defaultdict(list)
+    for d in WebhookDelivery.objects.filter(pk__in=ids).select_related('subscription').order_by('id'):
+        groups[d.subscription].append(d)
+    return groups
+
+
+def record_results(sent, failed, now=None):
+    """sent: [delivery]; failed: [(delivery, errore)] → un UPDATE per i riusciti, uno per i falliti."""
+    from .models import WebhookDelivery
+
+    now = now or timezone.now()
+    if sent:
+        for d in sent:
+            d.status, d.attempts, d.sent_at, d.last_error = 'SENT', d.attempts + 1, now, ''
+        WebhookDelivery.objects.bulk_update(sent, ['status', 'attempts', 'sent_at', 'last_error'])
+    if failed:
+        rows = []
+        for d, error in failed:
+            d.attempts += 1
+            d.last_error = error
+            if d.attempts >= max_attempts():
+                d.status = 'FAILED'
+            else:
+                d.next_attempt_at = now + backoff(d.attempts)
+            rows.append(d)
+        WebhookDelivery.objects.bulk_update(rows, ['status', 'attempts', 'next_attempt_at', 'last_error'])
+        logger.warning("Webhook: %s consegne non riuscite (%s)", len(rows), failed[0][1])
+
+
+def fail_inactive(subscription_id=None):
+    """Consegne PENDING di sottoscrizioni disattivate → FAILED (claim() non le prende mai). Ritorna quante."""
+    from .models import WebhookDelivery
+
+    qs = WebhookDelivery.objects.filter(status='PENDING', subscription__is_active=False)
+    if subscription_id is not None:
+        qs = qs.filter(subscription_id=subscription_id)
+    return qs.update(status='FAILED', last_error=INACTIVE_ERROR)
+
+
+def purge_sent(days, now=None):
+    from .models import WebhookDelivery
+
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    deleted, _ = WebhookDelivery.objects.filter(status='SENT', sent_at__lt=cutoff).delete()
+    return deleted
+
+
+# --- Ricevente di prova (sviluppo e test) ---
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not verify(server.secret, self.headers.get(TIMESTAMP_HEADER), body, self.headers.get(SIGNATURE_HEADER)):
+            return self._reply(401)
+        if random.random() < server.fail_rate:
+            return self._reply(503)
+        events = json.loads(body)['deliveries']
+        with server.lock:
+            server.stats['requests'] += 1
+            server.stats['events'] += len(events)
+            server.stats['connections'].add(self.client_address)
+        if server.on_batch is not None:
+            server.on_batch(events, self.client_address)
+        self._reply(204)
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def stub_server(secret, port=0, fail_rate=0.0, on_batch=None):
+    """
+    Server HTTP che verifica la firma (401 se errata) e risponde 503 a una quota `fail_rate` delle richieste.
+    `server.stats`: richieste e eventi accettati, connessioni (indirizzi client) usate. Porta 0 = libera.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), _StubHandler)
+    server.secret = secret
+    server.fail_rate = fail_rate
+    server.on_batch = on_batch
+    server.lock = threading.Lock()
+    server.stats = {'requests': 0, 'events': 0, 'connections': set()}
+    return server